@@ -0,0 +1,80 @@
+"""
+Shared Cache
+Pluggable cache backends used by tool result caching, chat message bodies
+and defect analysis lookups, so work done by one worker process (or host)
+is reused by the others
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+import functools
+import os
+import threading
+import config
+from .base import CacheBackend, CacheError, cache_key
+from .memory_backend import MemoryBackend
+from .sqlite_backend import SQLiteBackend
+from .redis_backend import RedisBackend
+
+__all__ = [
+    "CacheBackend",
+    "CacheError",
+    "cache_key",
+    "MemoryBackend",
+    "SQLiteBackend",
+    "RedisBackend",
+    "get_cache",
+    "cached"
+]
+
+_caches: Dict[Tuple[str, str], CacheBackend] = {}
+_caches_lock = threading.Lock()
+
+def get_cache() -> CacheBackend:
+    """
+    Process-wide backend selected by config.CACHE_BACKEND
+
+    "sqlite" (config.CACHE_PATH, shared by processes on one host), "redis"
+    (config.CACHE_REDIS_URL, shared across hosts) or "memory" (this process only).
+    """
+    kind = config.CACHE_BACKEND
+    if kind == "sqlite":
+        target = os.path.abspath(config.CACHE_PATH)
+    elif kind == "redis":
+        target = config.CACHE_REDIS_URL
+    elif kind == "memory":
+        target = ""
+    else:
+        raise ValueError(f"Unknown cache backend: {kind}")
+    with _caches_lock:
+        if (kind, target) not in _caches:
+            if kind == "sqlite":
+                _caches[kind, target] = SQLiteBackend(target)
+            elif kind == "redis":
+                _caches[kind, target] = RedisBackend(target)
+            else:
+                _caches[kind, target] = MemoryBackend()
+        return _caches[kind, target]
+
+def cached(namespace: str, ttl: Optional[float] = None,
+           keep: Optional[Callable[[str], bool]] = None,
+           variant: Optional[Callable[[], Any]] = None) -> Callable:
+    """
+    Cache a text-returning function in the shared backend by its arguments
+
+    Only successful results are stored: a call that raises, returns empty
+    text or a result rejected by `keep` is recomputed next time.
+
+    Args:
+        namespace: Key namespace (see cache_key)
+        ttl: Entry lifetime in seconds (defaults to config.CACHE_TTL)
+        keep: Predicate a result must satisfy to be stored
+        variant: Called per call for extra key parts besides the arguments
+            (e.g. llm.routing_signature, the settings choosing the model)
+    """
+    def decorator(fn: Callable[..., str]) -> Callable[..., str]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> str:
+            parts = (fn.__qualname__, args, kwargs) + ((variant(),) if variant else ())
+            key = cache_key(namespace, *parts)
+            return get_cache().get_or_set(key, lambda: fn(*args, **kwargs), ttl, keep)
+        return wrapper
+    return decorator
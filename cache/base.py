@@ -0,0 +1,138 @@
+"""
+Cache Backend Interface
+Key hashing, value encoding and hit/miss accounting shared by all backends
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+import hashlib
+import json
+import threading
+import time
+import zlib
+import config
+from metrics import metrics
+
+_RAW, _COMPRESSED = b"r", b"z"
+
+class CacheError(Exception):
+    """A cache backend could not serve a request"""
+
+def cache_key(namespace: str, *parts: Any) -> str:
+    """
+    Build a backend-independent cache key
+
+    The parts are serialized as canonical JSON and hashed, so the same
+    inputs map to the same key in every process and on every host.
+
+    Args:
+        namespace: What is cached (e.g. "web_result", "defect_analysis")
+        parts: Values identifying the entry (JSON-serializable)
+
+    Returns:
+        "<prefix>:<namespace>:<sha256 prefix>"
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:40]
+    return f"{config.CACHE_KEY_PREFIX}:{namespace}:{digest}"
+
+def _namespace(key: str) -> str:
+    """Namespace of a key built by cache_key (metrics label)"""
+    parts = key.rsplit(":", 2)
+    return parts[-2] if len(parts) == 3 else "other"
+
+class CacheBackend(ABC):
+    """
+    String cache shared by the tools and the web UI
+    Backend failures never propagate: a failing get is a miss and a failing
+    set is dropped, both counted in cache.errors
+    """
+
+    name = "base"
+
+    def __init__(self, default_ttl: Optional[float] = None):
+        """
+        Initialize the backend
+
+        Args:
+            default_ttl: Seconds an entry lives when set() gets no ttl
+                (defaults to config.CACHE_TTL; 0 keeps entries until evicted)
+        """
+        self.default_ttl = config.CACHE_TTL if default_ttl is None else default_ttl
+        self._counts = {"hits": 0, "misses": 0, "errors": 0}
+        self._counts_lock = threading.Lock()
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[bytes]:
+        """Stored bytes of a live entry, or None"""
+
+    @abstractmethod
+    def _set(self, key: str, data: bytes, ttl: float):
+        """Store bytes (ttl 0: no expiry)"""
+
+    @abstractmethod
+    def _delete(self, key: str):
+        """Remove an entry if present"""
+
+    def close(self):
+        """Release connections"""
+
+    def _count(self, outcome: str, key: str):
+        with self._counts_lock:
+            self._counts[outcome] += 1
+        metrics.increment(f"cache.{outcome}", backend=self.name, namespace=_namespace(key))
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached text, or None on a miss"""
+        start = time.perf_counter()
+        try:
+            data = self._get(key)
+        except CacheError:
+            self._count("errors", key)
+            data = None
+        metrics.observe("cache.get_seconds", time.perf_counter() - start, backend=self.name)
+        if data is None:
+            self._count("misses", key)
+            return None
+        self._count("hits", key)
+        marker, body = data[:1], data[1:]
+        return (zlib.decompress(body) if marker == _COMPRESSED else body).decode("utf-8")
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Store text (compressed above config.CACHE_COMPRESS_BYTES)"""
+        raw = value.encode("utf-8")
+        data = (_COMPRESSED + zlib.compress(raw, 6) if len(raw) >= config.CACHE_COMPRESS_BYTES
+                else _RAW + raw)
+        try:
+            self._set(key, data, self.default_ttl if ttl is None else ttl)
+        except CacheError:
+            self._count("errors", key)
+
+    def delete(self, key: str):
+        """Remove an entry"""
+        try:
+            self._delete(key)
+        except CacheError:
+            self._count("errors", key)
+
+    def get_or_set(self, key: str, compute: Callable[[], str], ttl: Optional[float] = None,
+                   keep: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Cached text, computing it on a miss
+
+        A computed value is stored only if it is non-empty text accepted by
+        `keep`; exceptions from `compute` propagate and nothing is stored
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if isinstance(value, str) and value and (keep is None or keep(value)):
+                self.set(key, value, ttl)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Hits, misses, errors and hit rate of this backend instance"""
+        with self._counts_lock:
+            counts = dict(self._counts)
+        lookups = counts["hits"] + counts["misses"]
+        return {"backend": self.name, **counts,
+                "hit_rate": counts["hits"] / lookups if lookups else None}
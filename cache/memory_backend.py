@@ -0,0 +1,52 @@
+"""
+In-Process Cache Backend
+LRU dictionary; only the process that filled it benefits (single-worker setups)
+"""
+from collections import OrderedDict
+from typing import Optional, Tuple
+import threading
+import time
+import config
+from .base import CacheBackend
+
+class MemoryBackend(CacheBackend):
+    """Bounded LRU cache held in process memory"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: Optional[int] = None, default_ttl: Optional[float] = None):
+        """
+        Initialize the backend
+
+        Args:
+            max_entries: Entries kept before the least recently used is dropped
+                (defaults to config.CACHE_MAX_ENTRIES)
+            default_ttl: See CacheBackend
+        """
+        super().__init__(default_ttl)
+        self.max_entries = max_entries or config.CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def _set(self, key: str, data: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl if ttl else 0.0, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
@@ -0,0 +1,144 @@
+"""
+Redis Cache Backend
+Minimal RESP client (GET/SET PX/DEL) for a cache shared by workers on
+several hosts; speaks to Redis or any server implementing those commands
+"""
+from typing import Any, List, Optional
+from urllib.parse import unquote, urlsplit
+import socket
+import threading
+import config
+from .base import CacheBackend, CacheError
+
+class _Connection:
+    """One socket to the server with a buffered reader"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def command(self, *args: Any) -> Any:
+        """Send one command and read its reply"""
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(parts))
+        return self._reply()
+
+    def _reply(self) -> Any:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by cache server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise CacheError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(body)
+            return None if count < 0 else [self._reply() for _ in range(count)]
+        raise CacheError(f"Unexpected reply from cache server: {line!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+class RedisBackend(CacheBackend):
+    """
+    Cache on a Redis-protocol server
+    Connections are pooled per backend; a connection that fails is dropped
+    and the request counts as a cache error (the caller computes the value)
+    """
+
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None, timeout: Optional[float] = None,
+                 default_ttl: Optional[float] = None):
+        """
+        Initialize the backend (connections are opened on first use)
+
+        Args:
+            url: redis://[:password@]host[:port][/db] (defaults to config.CACHE_REDIS_URL)
+            timeout: Connect/read timeout in seconds (defaults to config.CACHE_REDIS_TIMEOUT)
+            default_ttl: See CacheBackend
+        """
+        super().__init__(default_ttl)
+        parsed = urlsplit(url or config.CACHE_REDIS_URL)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported cache URL: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.strip("/") or 0)
+        self.timeout = config.CACHE_REDIS_TIMEOUT if timeout is None else timeout
+        self._idle: List[_Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> _Connection:
+        """Open an authenticated connection; a failed setup closes it and raises CacheError"""
+        try:
+            connection = _Connection(self.host, self.port, self.timeout)
+        except OSError as e:
+            raise CacheError(f"Cache server {self.host}:{self.port}: {e}") from e
+        try:
+            if self.password:
+                credentials = [self.username, self.password] if self.username else [self.password]
+                connection.command("AUTH", *credentials)
+            if self.db:
+                connection.command("SELECT", self.db)
+        except (CacheError, OSError, ValueError) as e:
+            connection.close()
+            raise CacheError(f"Cache server {self.host}:{self.port}: {e}") from e
+        return connection
+
+    def _command(self, *args: Any) -> Any:
+        """Run a command on a pooled connection"""
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._connect()
+        try:
+            result = connection.command(*args)
+        except CacheError:
+            # Error reply: the connection is still in sync
+            with self._lock:
+                self._idle.append(connection)
+            raise
+        except (OSError, ValueError) as e:
+            connection.close()
+            raise CacheError(f"Cache server {self.host}:{self.port}: {e}") from e
+        with self._lock:
+            self._idle.append(connection)
+        return result
+
+    def _get(self, key: str) -> Optional[bytes]:
+        return self._command("GET", key)
+
+    def _set(self, key: str, data: bytes, ttl: float):
+        if ttl:
+            self._command("SET", key, data, "PX", int(ttl * 1000))
+        else:
+            self._command("SET", key, data)
+
+    def _delete(self, key: str):
+        self._command("DEL", key)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
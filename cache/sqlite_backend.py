@@ -0,0 +1,96 @@
+"""
+SQLite Cache Backend
+WAL-mode database file shared by all worker processes on one host
+"""
+from typing import Optional
+import os
+import sqlite3
+import threading
+import time
+import config
+from .base import CacheBackend, CacheError
+
+class SQLiteBackend(CacheBackend):
+    """
+    Cache in a local SQLite database
+    WAL mode lets readers in other processes proceed while one process
+    writes; expired and surplus entries are purged every `purge_every` writes
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 default_ttl: Optional[float] = None, purge_every: int = 256):
+        """
+        Initialize (and create if needed) the cache database
+
+        Args:
+            path: Database file (defaults to config.CACHE_PATH)
+            max_entries: Entries kept before the oldest are purged
+                (defaults to config.CACHE_MAX_ENTRIES)
+            default_ttl: See CacheBackend
+            purge_every: Writes between purges
+        """
+        super().__init__(default_ttl)
+        self.path = path or config.CACHE_PATH
+        self.max_entries = max_entries or config.CACHE_MAX_ENTRIES
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                stored_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_stored ON cache_entries(stored_at);
+        """)
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[bytes]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value FROM cache_entries WHERE key = ? "
+                    "AND (expires_at = 0 OR expires_at > ?)", (key, time.time())).fetchone()
+        except sqlite3.Error as e:
+            raise CacheError(str(e)) from e
+        return row[0] if row else None
+
+    def _set(self, key: str, data: bytes, ttl: float):
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, stored_at) "
+                    "VALUES (?, ?, ?, ?)", (key, data, now + ttl if ttl else 0.0, now))
+                self._writes += 1
+                if self._writes % self.purge_every == 0:
+                    self._purge(now)
+        except sqlite3.Error as e:
+            raise CacheError(str(e)) from e
+
+    def _purge(self, now: float):
+        """Drop expired entries and the oldest ones beyond max_entries (lock held)"""
+        self._conn.execute(
+            "DELETE FROM cache_entries WHERE expires_at != 0 AND expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_entries "
+            "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def _delete(self, key: str):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            raise CacheError(str(e)) from e
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
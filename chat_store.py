@@ -0,0 +1,176 @@
+"""
+Shared Chat Message Storage for the Test Engineer Intelligent Assistant
+Message bodies are stored once per process by content hash (compressed when
+large); sessions only hold references, which are accounted per session and
+released when a session goes idle. With a shared cache, bodies are also
+written there, so any worker can resolve a key
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import hashlib
+import threading
+import time
+import zlib
+import config
+from cache import CacheBackend, cache_key
+from metrics import metrics
+
+@dataclass
+class StoredBody:
+    """One message body and how it is kept"""
+    data: bytes
+    compressed: bool
+    size: int
+    refs: int = 0
+
+    @property
+    def text(self) -> str:
+        """Decoded message text"""
+        return (zlib.decompress(self.data) if self.compressed else self.data).decode("utf-8")
+
+class MessageStore:
+    """
+    Content-addressed message body store shared by all sessions
+    Identical bodies (e.g. the same suite generated in two sessions) are kept
+    once; a body is freed when no session references it any more
+    """
+
+    def __init__(self, compress_threshold: Optional[int] = None,
+                 idle_seconds: Optional[float] = None, cache: Optional[CacheBackend] = None):
+        """
+        Initialize the store
+
+        Args:
+            compress_threshold: Bodies of at least this many bytes are zlib-compressed
+                (defaults to config.WEB_CHAT_COMPRESS_BYTES)
+            idle_seconds: Sessions unseen for this long are evicted
+                (defaults to config.WEB_SESSION_IDLE_SECONDS)
+            cache: Shared cache new bodies are written to and missing bodies read from
+        """
+        self.compress_threshold = (config.WEB_CHAT_COMPRESS_BYTES
+                                   if compress_threshold is None else compress_threshold)
+        self.idle_seconds = config.WEB_SESSION_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.cache = cache
+        self._bodies: Dict[str, StoredBody] = {}
+        self._sessions: Dict[str, Counter] = {}
+        self._seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def put(self, session_id: str, text: str) -> str:
+        """
+        Store a message body for a session
+
+        Returns:
+            Key of the body
+        """
+        raw = text.encode("utf-8")
+        key = hashlib.sha256(raw).hexdigest()[:32]
+        with self._lock:
+            body = self._bodies.get(key)
+            created = body is None
+            if created:
+                compressed = len(raw) >= self.compress_threshold
+                body = self._bodies[key] = StoredBody(
+                    zlib.compress(raw, 6) if compressed else raw, compressed, len(raw))
+            else:
+                metrics.increment("chat_store.shared_bodies")
+            body.refs += 1
+            self._sessions.setdefault(session_id, Counter())[key] += 1
+            self._seen[session_id] = time.time()
+        if created and self.cache is not None:
+            self.cache.set(cache_key("chat_body", key), text)
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        """Text of a stored body (None if it was evicted here and is not in the shared cache)"""
+        body = self._bodies.get(key)
+        if body is not None:
+            return body.text
+        return self.cache.get(cache_key("chat_body", key)) if self.cache is not None else None
+
+    def size(self, key: str) -> int:
+        """Uncompressed size of a stored body in bytes"""
+        body = self._bodies.get(key)
+        return body.size if body is not None else 0
+
+    def preview(self, key: str, limit: int) -> str:
+        """Beginning of a body, cut at a line break where possible"""
+        text = self.get(key) or ""
+        if len(text) <= limit:
+            return text
+        cut = text.rfind("\n", 0, limit)
+        return text[:cut if cut > limit // 2 else limit].rstrip() + "\n…"
+
+    def restore(self, session_id: str, keys: List[str]) -> bool:
+        """
+        Make sure the session holds all of the given bodies
+
+        Bodies the session no longer holds here (it went idle, or it is
+        served by another worker now) are taken back from the shared cache.
+
+        Returns:
+            False if some body is gone everywhere
+        """
+        missing = Counter(keys) - (self._sessions.get(session_id) or Counter())
+        texts = {key: self.get(key) for key in missing}
+        if any(text is None for text in texts.values()):
+            return False
+        for key, count in missing.items():
+            for _ in range(count):
+                self.put(session_id, texts[key])
+        if missing:
+            metrics.increment("chat_store.restored_bodies", sum(missing.values()))
+        return True
+
+    def touch(self, session_id: str):
+        """Mark a session as active"""
+        self._seen[session_id] = time.time()
+
+    def release(self, session_id: str):
+        """Drop all references of a session (freeing bodies nobody else uses)"""
+        with self._lock:
+            held = self._sessions.pop(session_id, None) or Counter()
+            self._seen.pop(session_id, None)
+            for key, count in held.items():
+                body = self._bodies[key]
+                body.refs -= count
+                if body.refs <= 0:
+                    del self._bodies[key]
+
+    def evict_idle(self, idle_seconds: Optional[float] = None) -> List[str]:
+        """
+        Release sessions that have not been seen for a while
+
+        Returns:
+            Ids of the evicted sessions
+        """
+        cutoff = time.time() - (self.idle_seconds if idle_seconds is None else idle_seconds)
+        idle = [session_id for session_id, seen in list(self._seen.items()) if seen < cutoff]
+        for session_id in idle:
+            self.release(session_id)
+        if idle:
+            metrics.increment("chat_store.evicted_sessions", len(idle))
+        return idle
+
+    def session_usage(self, session_id: str) -> Dict[str, int]:
+        """Messages and bytes referenced by a session"""
+        with self._lock:
+            held = self._sessions.get(session_id) or Counter()
+            bodies = [(self._bodies[key], count) for key, count in held.items()]
+        return {
+            "messages": sum(count for _, count in bodies),
+            "bytes": sum(body.size * count for body, count in bodies),
+            "stored_bytes": sum(len(body.data) for body, _ in bodies),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Totals over all sessions"""
+        with self._lock:
+            bodies = list(self._bodies.values())
+            return {
+                "sessions": len(self._sessions),
+                "bodies": len(bodies),
+                "bytes": sum(body.size * body.refs for body in bodies),
+                "stored_bytes": sum(len(body.data) for body in bodies),
+            }
@@ -12,9 +12,19 @@ OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.chatanywhere.tech/v1
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 
-# Validate required environment variables
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable is required")
+# Record/replay of provider traffic: "record" appends every request/response (streamed
+# chunks and timing included) to LLM_CASSETTE_PATH; "replay" answers from it without
+# the network, with the recorded latency ("original") or a fixed number of seconds
+# before each response ("0": only our own overhead remains). The default cassette is
+# tracked in the repository so the test scripts replay it when no key is configured
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "")
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "tests/cassettes/default.jsonl")
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "original")
+
+# OPENAI_API_KEY is required when a chat model is built (llm.get_chat_model), so
+# commands that never call the provider run without it; replaying needs no provider access
+if not OPENAI_API_KEY and LLM_CASSETTE_MODE == "replay":
+    OPENAI_API_KEY = "sk-replay"
 
 # Test case generation settings
 TEST_CASE_FORMATS = {
@@ -46,3 +56,154 @@ API_TEST_SCENARIOS = [
     "error_handling",
     "authentication_testing"
 ]
+
+# Seconds a single generated API test may run before it is reported as an error
+API_TEST_TIMEOUT = float(os.getenv("API_TEST_TIMEOUT", "30"))
+
+# Scenarios the local rule engine derives per API coverage type
+API_COVERAGE_SCENARIOS = {
+    "basic": ["positive_scenarios", "negative_scenarios", "authentication_testing"],
+    "comprehensive": API_TEST_SCENARIOS,
+    "security": ["negative_scenarios", "error_handling", "authentication_testing"]
+}
+
+# Categories generated concurrently for "exhaustive" functional coverage,
+# each with its own disjoint block of test_id numbers
+FUNCTIONAL_TEST_CATEGORIES = {
+    "positive": "Positive scenarios (normal flow)",
+    "negative": "Negative scenarios (error conditions)",
+    "edge_case": "Edge cases (boundary conditions)",
+    "data_validation": "Data validation scenarios",
+    "ui": "User interface scenarios (if applicable)"
+}
+FUNCTIONAL_TEST_ID_BLOCK = 100
+
+# Output token budgets per tool and coverage_level/analysis_type/coverage_type;
+# responses cut off at the budget are continued up to MAX_CONTINUATIONS times
+OUTPUT_TOKEN_BUDGETS = {
+    "functional_test_generator": {"basic": 2048, "comprehensive": 4096, "exhaustive": 4096},
+    "defect_analyzer": {"quick": 512, "comprehensive": 3072, "root_cause": 2048},
+    "api_test_generator": {"basic": 3072, "comprehensive": 6144, "security": 4096},
+    "defect_clustering": {"labels": 2048}
+}
+DEFAULT_OUTPUT_TOKEN_BUDGET = 4096
+MAX_CONTINUATIONS = int(os.getenv("MAX_CONTINUATIONS", "3"))
+
+# Historical defect index used for near-duplicate lookup before calling the LLM
+DEFECT_HISTORY_ENABLED = os.getenv("DEFECT_HISTORY_ENABLED", "true").lower() == "true"
+DEFECT_INDEX_PATH = os.getenv("DEFECT_INDEX_PATH", "data/defect_index.db")
+DEFECT_DUPLICATE_THRESHOLD = float(os.getenv("DEFECT_DUPLICATE_THRESHOLD", "0.85"))
+
+# Bulk defect triage
+TRIAGE_CONCURRENCY = int(os.getenv("TRIAGE_CONCURRENCY", "8"))
+
+# Log reduction applied to defect_data/context before prompting (tokens per field)
+DEFECT_PROMPT_TOKEN_BUDGET = int(os.getenv("DEFECT_PROMPT_TOKEN_BUDGET", "6000"))
+DEFECT_CONTEXT_TOKEN_BUDGET = int(os.getenv("DEFECT_CONTEXT_TOKEN_BUDGET", "2000"))
+
+# Local classifier answering confident "quick" defect analyses without the LLM
+DEFECT_CLASSIFIER_ENABLED = os.getenv("DEFECT_CLASSIFIER_ENABLED", "true").lower() == "true"
+DEFECT_CLASSIFIER_PATH = os.getenv("DEFECT_CLASSIFIER_PATH", "data/defect_classifier.npz")
+DEFECT_CLASSIFIER_THRESHOLD = float(os.getenv("DEFECT_CLASSIFIER_THRESHOLD", "0.9"))
+
+# Offline defect clustering and trend reports
+DEFECT_CLUSTER_COUNT = int(os.getenv("DEFECT_CLUSTER_COUNT", "20"))
+DEFECT_TREND_WINDOW_DAYS = int(os.getenv("DEFECT_TREND_WINDOW_DAYS", "14"))
+
+# Persistent, searchable store of generated artifacts
+ARTIFACT_STORE_ENABLED = os.getenv("ARTIFACT_STORE_ENABLED", "true").lower() == "true"
+ARTIFACT_STORE_PATH = os.getenv("ARTIFACT_STORE_PATH", "data/artifacts.db")
+
+# Requirement-to-test traceability (TF-IDF cosine similarity thresholds)
+TRACE_STRONG_THRESHOLD = float(os.getenv("TRACE_STRONG_THRESHOLD", "0.25"))
+TRACE_WEAK_THRESHOLD = float(os.getenv("TRACE_WEAK_THRESHOLD", "0.1"))
+
+# Near-duplicate test case removal (estimated Jaccard similarity of word bigrams;
+# cases whose numbers or expected result differ are never merged)
+TEST_DEDUP_THRESHOLD = float(os.getenv("TEST_DEDUP_THRESHOLD", "0.85"))
+
+# Document ingestion: maximum tokens of document text per tool call, and how many
+# chunks of a large document are generated concurrently
+INGEST_CHUNK_TOKENS = int(os.getenv("INGEST_CHUNK_TOKENS", "6000"))
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "4"))
+
+# Web UI: tool results are cached (in the shared cache) per input parameters for this
+# many seconds
+WEB_RESULT_CACHE_TTL = int(os.getenv("WEB_RESULT_CACHE_TTL", "3600"))
+
+# Web UI background jobs: generations running at once (shared by all sessions),
+# how long finished jobs are kept, and how often the job panel refreshes
+WEB_JOB_WORKERS = int(os.getenv("WEB_JOB_WORKERS", "8"))
+WEB_JOB_RETENTION = int(os.getenv("WEB_JOB_RETENTION", "3600"))
+WEB_JOB_POLL_SECONDS = float(os.getenv("WEB_JOB_POLL_SECONDS", "1.0"))
+
+# Web UI chat history: turns per page, AI messages longer than this many characters
+# are collapsed, bodies of at least this many bytes are stored compressed, and
+# sessions idle for this many seconds release their history
+WEB_CHAT_PAGE_SIZE = int(os.getenv("WEB_CHAT_PAGE_SIZE", "10"))
+WEB_CHAT_COLLAPSE_CHARS = int(os.getenv("WEB_CHAT_COLLAPSE_CHARS", "1500"))
+WEB_CHAT_COMPRESS_BYTES = int(os.getenv("WEB_CHAT_COMPRESS_BYTES", "2048"))
+WEB_SESSION_IDLE_SECONDS = int(os.getenv("WEB_SESSION_IDLE_SECONDS", "1800"))
+
+# LLM scheduling: provider calls in flight at once per process and endpoint, slots batch
+# work (bulk triage, ...) may not use, and tenant weights ("alice=2,ci=0.5"; default 1)
+LLM_SCHEDULER_ENABLED = os.getenv("LLM_SCHEDULER_ENABLED", "true").lower() == "true"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_INTERACTIVE_RESERVED = int(os.getenv("LLM_INTERACTIVE_RESERVED", "4"))
+LLM_TENANT_WEIGHTS = os.getenv("LLM_TENANT_WEIGHTS", "")
+
+# Identical chat completions in flight at the same time share one provider call
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "true").lower() == "true"
+
+# Hedged requests: when a chat completion has no first byte after the given percentile
+# of recent first-byte latencies (at least LLM_HEDGE_MIN_DELAY seconds), a duplicate is
+# sent (to LLM_HEDGE_API_BASE if set) and the first answer wins; LLM_HEDGE_BUDGET caps
+# hedges to that share of requests
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2.0"))
+LLM_HEDGE_INITIAL_DELAY = float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "15.0"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.05"))
+LLM_HEDGE_API_BASE = os.getenv("LLM_HEDGE_API_BASE", "")
+LLM_HEDGE_API_KEY = os.getenv("LLM_HEDGE_API_KEY", "")
+
+# LLM endpoint pool: OpenAI-compatible endpoints "base_url|api_key" separated by commas
+# (empty: OPENAI_API_BASE with OPENAI_API_KEY). Requests go to the endpoint with the
+# fewest in flight; LLM_BREAKER_FAILURES consecutive failures open an endpoint's circuit
+# for LLM_BREAKER_COOLDOWN seconds
+LLM_ENDPOINTS = os.getenv("LLM_ENDPOINTS", "")
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Model routing: each (tool, coverage_level/analysis_type) runs on a model tier; cheap
+# steps use the fast tier, demanding ones the strong tier. LLM_ROUTE_OVERRIDES changes
+# tiers without code ("defect_analyzer.quick=strong,api_test_generator=fast"); fast routes
+# with prompts above LLM_ROUTE_ESCALATE_TOKENS are escalated to the strong tier
+LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "true").lower() == "true"
+LLM_MODEL_TIERS = {
+    "fast": os.getenv("OPENAI_FAST_MODEL", "gpt-4o-mini"),
+    "strong": OPENAI_MODEL
+}
+LLM_ROUTES = {
+    "agent": {"tool_selection": "fast"},
+    "functional_test_generator": {"basic": "fast", "comprehensive": "strong", "exhaustive": "strong"},
+    "defect_analyzer": {"quick": "fast", "comprehensive": "strong", "root_cause": "strong"},
+    "api_test_generator": {"basic": "fast", "comprehensive": "strong", "security": "strong"},
+    "defect_clustering": {"labels": "fast"},
+    "code_repair": {"default": "fast"}
+}
+LLM_ROUTE_OVERRIDES = os.getenv("LLM_ROUTE_OVERRIDES", "")
+LLM_ROUTE_ESCALATE_TOKENS = int(os.getenv("LLM_ROUTE_ESCALATE_TOKENS", "6000"))
+
+# Shared cache for tool results, chat message bodies and defect analyses: "sqlite"
+# (WAL database shared by the worker processes of one host), "redis" (Redis-protocol
+# server shared by several hosts) or "memory" (this process only). Values of at least
+# CACHE_COMPRESS_BYTES are zlib-compressed; keys start with CACHE_KEY_PREFIX
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+CACHE_PATH = os.getenv("CACHE_PATH", "data/cache.db")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5"))
+CACHE_TTL = int(os.getenv("CACHE_TTL", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_COMPRESS_BYTES = int(os.getenv("CACHE_COMPRESS_BYTES", "2048"))
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "tea:v1")
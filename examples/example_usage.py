@@ -1,6 +1,10 @@
 """
 Example usage of the Test Engineer Intelligent Assistant
 Demonstrates various capabilities and use cases
+
+Set LLM_CASSETTE_MODE=record to save the provider traffic of a run and
+LLM_CASSETTE_MODE=replay (optionally LLM_CASSETTE_LATENCY=0) to rerun it
+offline, e.g. to profile the assistant's own overhead.
 """
 import sys
 import os
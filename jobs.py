@@ -0,0 +1,159 @@
+"""
+Background Jobs for the Test Engineer Intelligent Assistant
+Process-wide executor that runs generations outside the request that started
+them, keeps their streamed partial output and holds results until collected
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+import threading
+import time
+import uuid
+import config
+from llm import scheduling, stream_to
+from metrics import metrics
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+@dataclass
+class Job:
+    """One background generation and its progress"""
+    job_id: str
+    owner: str
+    kind: str
+    title: str
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    options: Dict[str, Any] = field(default_factory=dict)
+    _pieces: List[str] = field(default_factory=list, repr=False)
+    _future: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has stopped (successfully or not)"""
+        return self.status in FINISHED
+
+    @property
+    def partial(self) -> str:
+        """Output streamed so far"""
+        return "".join(self._pieces)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds spent running (so far)"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def append(self, text: str):
+        """Stream sink: add a piece of partial output"""
+        self._pieces.append(text)
+
+class JobManager:
+    """
+    Background job executor shared by all sessions of a process
+    Jobs are owned by a session id; finished jobs are kept for the
+    retention period so results survive reruns and page switches
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, retention: Optional[float] = None):
+        """
+        Initialize the manager
+
+        Args:
+            max_workers: Jobs running at the same time (defaults to config.WEB_JOB_WORKERS)
+            retention: Seconds a finished job is kept (defaults to config.WEB_JOB_RETENTION)
+        """
+        self.retention = config.WEB_JOB_RETENTION if retention is None else retention
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.WEB_JOB_WORKERS, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, kind: str, title: str, fn: Callable[..., Any],
+               *args, options: Optional[Dict[str, Any]] = None, **kwargs) -> Job:
+        """
+        Queue a generation
+
+        Args:
+            owner: Session id the job belongs to
+            kind: Job type shown in the panel (e.g. the page it came from)
+            title: Short description of the input
+            fn: Callable producing the result; completions it makes are streamed
+                into the job's partial output
+            options: Display options kept with the job (e.g. output format)
+
+        Returns:
+            The queued job
+        """
+        job = Job(uuid.uuid4().hex[:12], owner, kind, title, options=options or {})
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+        job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        metrics.increment("web_jobs.submitted", kind=kind)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]):
+        """Execute a job on a worker thread"""
+        job.started_at = time.time()
+        job.status = RUNNING
+        metrics.observe("web_jobs.queue_seconds", job.started_at - job.submitted_at, kind=job.kind)
+        status = FAILED
+        try:
+            with stream_to(job.append), scheduling(tenant=job.owner):
+                job.result = fn(*args, **kwargs)
+            status = DONE
+        except Exception as e:
+            job.error = str(e)
+            metrics.increment("web_jobs.failed", kind=job.kind)
+        finally:
+            # finished_at is set before the final status is published, so
+            # _prune never sees a finished job without it
+            job.finished_at = time.time()
+            job.status = status
+            metrics.observe("web_jobs.seconds", job.elapsed, kind=job.kind)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job"""
+        return self._jobs.get(job_id)
+
+    def jobs(self, owner: str) -> List[Job]:
+        """Jobs of a session, newest first"""
+        with self._lock:
+            self._prune()
+            owned = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(owned, key=lambda job: job.submitted_at, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        job = self._jobs.get(job_id)
+        if job is None or job._future is None or not job._future.cancel():
+            return False
+        job.finished_at = time.time()
+        job.status = CANCELLED
+        return True
+
+    def dismiss(self, job_id: str):
+        """Forget a finished job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def _prune(self):
+        """Drop finished jobs past the retention period (lock held)"""
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
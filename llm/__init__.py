@@ -0,0 +1,23 @@
+"""
+LLM Access Layer
+Shared chat model construction and completion helpers used by the agent and tools
+"""
+from .client import get_chat_model
+from .completion import complete, output_budget, stream_to
+from .routing import Route, select_route, route_stats, track_models, routing_signature
+from .scheduler import get_scheduler, scheduling, propagate
+
+__all__ = [
+    "get_chat_model",
+    "complete",
+    "output_budget",
+    "stream_to",
+    "Route",
+    "select_route",
+    "route_stats",
+    "track_models",
+    "routing_signature",
+    "get_scheduler",
+    "scheduling",
+    "propagate"
+]
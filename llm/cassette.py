@@ -0,0 +1,237 @@
+"""
+Record/Replay Cassettes
+Transport that records provider traffic (streamed chunks and their timing
+included) into cassette files and replays it offline, so runs are
+deterministic and the cost of our own code can be measured without the
+provider's latency
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import httpx
+import config
+from metrics import metrics
+
+RECORD, REPLAY = "record", "replay"
+
+# Response headers not written to cassettes
+_DROPPED_HEADERS = {"set-cookie", "authorization"}
+
+def cassette_key(request: httpx.Request) -> str:
+    """
+    Cassette key of a request
+
+    Hash of the method, URL path and JSON body with sorted keys. Host and
+    headers are left out: endpoints and API keys differ between the
+    recording and the replaying environment.
+    """
+    try:
+        body = json.dumps(json.loads(request.content), sort_keys=True,
+                          separators=(",", ":"), ensure_ascii=False)
+    except ValueError:
+        body = request.content.decode("utf-8", "replace")
+    return hashlib.sha256(f"{request.method} {request.url.path}\n{body}".encode("utf-8")).hexdigest()
+
+@dataclass
+class Interaction:
+    """One recorded request and its response"""
+    key: str
+    method: str
+    path: str
+    status: int
+    headers: List[Tuple[str, str]]
+    headers_seconds: float
+    chunks: List[Tuple[float, bytes]] = field(default_factory=list)
+    request: Optional[str] = None
+
+    def to_json(self) -> str:
+        chunks = []
+        for at, data in self.chunks:
+            try:
+                chunks.append({"at": round(at, 4), "text": data.decode("utf-8")})
+            except UnicodeDecodeError:
+                chunks.append({"at": round(at, 4), "base64": base64.b64encode(data).decode()})
+        return json.dumps({"key": self.key, "method": self.method, "path": self.path,
+                           "request": self.request, "status": self.status,
+                           "headers": self.headers, "headers_seconds": round(self.headers_seconds, 4),
+                           "chunks": chunks}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str) -> "Interaction":
+        data = json.loads(line)
+        chunks = [(chunk["at"], chunk["text"].encode("utf-8") if "text" in chunk
+                   else base64.b64decode(chunk["base64"])) for chunk in data["chunks"]]
+        return cls(data["key"], data["method"], data["path"], data["status"],
+                   [tuple(header) for header in data["headers"]], data["headers_seconds"],
+                   chunks, data.get("request"))
+
+class Cassette:
+    """
+    JSON-lines file of interactions
+    Identical requests recorded several times are replayed in recorded
+    order; once exhausted, the last response is repeated
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._interactions: Dict[str, List[Interaction]] = defaultdict(list)
+        self._served: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        interaction = Interaction.from_json(line)
+                        self._interactions[interaction.key].append(interaction)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._interactions.values())
+
+    def add(self, interaction: Interaction):
+        """Append an interaction to the file"""
+        line = interaction.to_json() + "\n"
+        with self._lock:
+            self._interactions[interaction.key].append(interaction)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def next(self, key: str) -> Optional[Interaction]:
+        """Next recorded response for a request key"""
+        with self._lock:
+            entries = self._interactions.get(key)
+            if not entries:
+                return None
+            index = min(self._served[key], len(entries) - 1)
+            self._served[key] += 1
+            return entries[index]
+
+class _RecordingStream(httpx.SyncByteStream):
+    """Response body that passes chunks through and records them with their arrival time"""
+
+    def __init__(self, stream: httpx.SyncByteStream, started: float, on_complete):
+        self._stream = stream
+        self._started = started
+        self._on_complete = on_complete
+        self._chunks: List[Tuple[float, bytes]] = []
+        self._exhausted = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._chunks.append((time.perf_counter() - self._started, chunk))
+            yield chunk
+        self._exhausted = True
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._on_complete is not None:
+                on_complete, self._on_complete = self._on_complete, None
+                if self._exhausted:
+                    on_complete(self._chunks)
+                else:
+                    # Abandoned bodies (e.g. a hedging loser) would replay truncated
+                    metrics.increment("llm.cassette.incomplete")
+
+class _ReplayStream(httpx.SyncByteStream):
+    """Recorded response body, delivered with the given delay before each chunk"""
+
+    def __init__(self, chunks: List[Tuple[float, bytes]]):
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[bytes]:
+        for delay, data in self._chunks:
+            if delay > 0:
+                time.sleep(delay)
+            yield data
+
+class CassetteTransport(httpx.BaseTransport):
+    """
+    Record provider traffic into a cassette, or replay it without the network
+
+    In record mode requests go to the wrapped transport and every completed
+    response is appended to the cassette. In replay mode responses come from
+    the cassette only; an unrecorded request gets a 404 error response.
+    Replay latency is "original" (recorded time to headers and between
+    chunks), or a fixed number of seconds before the headers with chunks
+    delivered back to back ("0" measures our own overhead only).
+    """
+
+    def __init__(self, transport: Optional[httpx.BaseTransport] = None, mode: Optional[str] = None,
+                 path: Optional[str] = None, latency: Optional[str] = None):
+        """
+        Initialize the transport
+
+        Args:
+            transport: Transport used for recording (unused when replaying)
+            mode: "record" or "replay" (defaults to config.LLM_CASSETTE_MODE)
+            path: Cassette file (defaults to config.LLM_CASSETTE_PATH)
+            latency: Replay latency (defaults to config.LLM_CASSETTE_LATENCY)
+        """
+        self.transport = transport
+        self.mode = mode or config.LLM_CASSETTE_MODE
+        if self.mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {self.mode}")
+        if self.mode == RECORD and transport is None:
+            raise ValueError("Recording needs a transport to record from")
+        latency = str(config.LLM_CASSETTE_LATENCY if latency is None else latency)
+        self.fixed_latency = None if latency == "original" else float(latency)
+        self.cassette = Cassette(path or config.LLM_CASSETTE_PATH)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = cassette_key(request)
+        if self.mode == REPLAY:
+            return self._replay(key, request)
+
+        # Uncompressed bodies keep cassettes readable (SSE/JSON text)
+        request.headers["accept-encoding"] = "identity"
+        started = time.perf_counter()
+        response = self.transport.handle_request(request)
+        headers_seconds = time.perf_counter() - started
+        headers = [(name, value) for name, value in response.headers.multi_items()
+                   if name.lower() not in _DROPPED_HEADERS]
+
+        def record(chunks: List[Tuple[float, bytes]]):
+            self.cassette.add(Interaction(
+                key, request.method, request.url.path, response.status_code, headers,
+                headers_seconds, chunks, request.content.decode("utf-8", "replace")))
+            metrics.increment("llm.cassette.recorded")
+
+        if response.is_closed:
+            record([(headers_seconds, response.content)])
+        else:
+            response.stream = _RecordingStream(response.stream, started, record)
+        return response
+
+    def _replay(self, key: str, request: httpx.Request) -> httpx.Response:
+        interaction = self.cassette.next(key)
+        if interaction is None:
+            metrics.increment("llm.cassette.misses")
+            return httpx.Response(404, json={"error": {
+                "message": f"No recorded response for {request.method} {request.url.path} "
+                           f"(key {key[:12]}) in cassette {self.cassette.path}",
+                "type": "cassette_miss"}}, request=request)
+        metrics.increment("llm.cassette.replayed")
+
+        if self.fixed_latency is None:
+            time.sleep(interaction.headers_seconds)
+            previous, chunks = interaction.headers_seconds, []
+            for at, data in interaction.chunks:
+                chunks.append((at - previous, data))
+                previous = at
+        else:
+            time.sleep(self.fixed_latency)
+            chunks = [(0.0, data) for _, data in interaction.chunks]
+        return httpx.Response(interaction.status, headers=interaction.headers,
+                              stream=_ReplayStream(chunks), request=request)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
@@ -0,0 +1,71 @@
+"""
+Chat Model Factory
+Single place where chat model clients are configured
+"""
+from typing import Optional
+import threading
+import httpx
+from langchain_openai import ChatOpenAI
+from openai import DefaultHttpxClient
+import config
+from .cassette import CassetteTransport
+from .routing import Route, RouteMetrics
+from .transport import BalancingTransport, CoalescingTransport, HedgingTransport, SchedulingTransport
+
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+def get_http_client() -> httpx.Client:
+    """
+    Process-wide HTTP client shared by all chat models
+
+    Requests are coalesced with identical in-flight requests
+    (config.LLM_COALESCE_ENABLED), admitted through the fair-share
+    scheduler (config.LLM_SCHEDULER_ENABLED), hedged when slow
+    (config.LLM_HEDGE_ENABLED) and spread over the endpoint pool
+    (config.LLM_ENDPOINTS), in that order. With config.LLM_CASSETTE_MODE set,
+    the network itself is recorded to or replayed from a cassette.
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            network: httpx.BaseTransport = httpx.HTTPTransport()
+            if config.LLM_CASSETTE_MODE:
+                network = CassetteTransport(network)
+            transport: httpx.BaseTransport = BalancingTransport(network)
+            if config.LLM_HEDGE_ENABLED:
+                transport = HedgingTransport(transport)
+            if config.LLM_SCHEDULER_ENABLED:
+                transport = SchedulingTransport(transport)
+            if config.LLM_COALESCE_ENABLED:
+                transport = CoalescingTransport(transport)
+            _http_client = DefaultHttpxClient(transport=transport)
+        return _http_client
+
+def get_chat_model(temperature: float, max_tokens: Optional[int] = None,
+                   model: Optional[str] = None, route: Optional[Route] = None) -> ChatOpenAI:
+    """
+    Build a chat model client
+
+    Args:
+        temperature: Sampling temperature
+        max_tokens: Output token budget (None uses the provider default)
+        model: Model name (defaults to the route's model, then config.OPENAI_MODEL)
+        route: Routing decision (see select_route); its calls are recorded
+            under the route's name
+
+    Returns:
+        Configured ChatOpenAI instance
+    """
+    if not config.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY environment variable is required")
+    return ChatOpenAI(
+        base_url=config.OPENAI_API_BASE,
+        api_key=config.OPENAI_API_KEY,
+        model=model or (route.model if route else config.OPENAI_MODEL),
+        temperature=temperature,
+        max_tokens=max_tokens,
+        http_client=get_http_client(),
+        metadata={"route": route.name} if route else None,
+        callbacks=[RouteMetrics(route)] if route else None
+    )
@@ -0,0 +1,195 @@
+"""
+Budgeted Completions
+Runs a prompt under an explicit output-token budget and transparently
+continues responses that stop at the length limit
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+from langchain_core.messages import AIMessage, HumanMessage
+import json
+import config
+from metrics import metrics
+
+CONTINUE_PROMPT = (
+    "Your previous response was cut off at the output length limit. Continue EXACTLY "
+    "from the last character you wrote. Do not repeat any earlier text, do not restart "
+    "the document, and do not add commentary or code fences."
+)
+
+_stream_sink: ContextVar[Optional[Callable[[str], None]]] = ContextVar("llm_stream_sink", default=None)
+
+@contextmanager
+def stream_to(sink: Callable[[str], None]):
+    """
+    Stream completions made in this context to a sink
+
+    While active, complete() streams from the model and passes every text
+    piece to the sink as it arrives (e.g. to show partial output of a
+    background job). The sink is context-local: it follows the calling
+    thread, not worker threads it starts.
+    """
+    token = _stream_sink.set(sink)
+    try:
+        yield
+    finally:
+        _stream_sink.reset(token)
+
+def _invoke(llm: Any, messages: List[Any]) -> Any:
+    """Invoke the model, streaming into the active sink if there is one"""
+    sink = _stream_sink.get()
+    if sink is None:
+        return llm.invoke(messages)
+    response = None
+    for chunk in llm.stream(messages):
+        if chunk.content:
+            sink(chunk.content)
+        response = chunk if response is None else response + chunk
+    return response if response is not None else AIMessage(content="")
+
+def output_budget(tool: str, level: str) -> int:
+    """
+    Output-token budget for a tool and its coverage_level/analysis_type
+
+    Args:
+        tool: Tool name (e.g. functional_test_generator)
+        level: coverage_level, analysis_type or coverage_type
+
+    Returns:
+        Maximum output tokens for a single completion
+    """
+    budgets = config.OUTPUT_TOKEN_BUDGETS.get(tool, {})
+    return budgets.get(level, config.DEFAULT_OUTPUT_TOKEN_BUDGET)
+
+def finish_reason(response: Any) -> Optional[str]:
+    """Provider finish reason of a chat response"""
+    metadata = getattr(response, "response_metadata", None) or {}
+    return metadata.get("finish_reason")
+
+def stitch(text: str, continuation: str, max_overlap: int = 200) -> str:
+    """
+    Join a truncated response and its continuation
+
+    Strips a code fence re-opened by the continuation and removes text the
+    model repeated from the end of the previous piece.
+    """
+    piece = continuation
+    if text.count("```") % 2 == 1 and piece.lstrip().startswith("```"):
+        piece = piece.lstrip()
+        piece = piece[piece.find("\n") + 1:] if "\n" in piece else ""
+
+    limit = min(max_overlap, len(text), len(piece))
+    for size in range(limit, 0, -1):
+        if text.endswith(piece[:size]) and (size > 8 or piece[:size].strip() == ""):
+            piece = piece[size:]
+            break
+    return text + piece
+
+def close_json(text: str) -> str:
+    """
+    Turn a truncated JSON document into a valid one
+
+    Cuts back to the last complete element and closes any open arrays/objects.
+    Returns the text unchanged if it already parses or contains no JSON.
+    """
+    start = min([i for i in (text.find("{"), text.find("[")) if i != -1], default=-1)
+    if start == -1:
+        return text
+    try:
+        json.loads(text[start:])
+        return text
+    except ValueError:
+        pass
+
+    stack: List[str] = []
+    in_string = escaped = False
+    cut, cut_stack = None, []
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            cut, cut_stack = index + 1, list(stack)
+            if not stack:
+                break
+        elif char == ",":
+            cut, cut_stack = index, list(stack)
+
+    if cut is None:
+        return text
+    return text[:cut].rstrip().rstrip(",") + "".join(reversed(cut_stack))
+
+def contains_json(text: str) -> bool:
+    """Whether the text holds a complete JSON document (from its first "{" or "[")"""
+    start = min([i for i in (text.find("{"), text.find("[")) if i != -1], default=-1)
+    if start == -1:
+        return False
+    try:
+        json.JSONDecoder().raw_decode(text[start:])
+        return True
+    except ValueError:
+        return False
+
+def complete(llm: Any, prompt: str, tool: str, expect_json: bool = False,
+             max_continuations: Optional[int] = None) -> str:
+    """
+    Invoke a chat model, continuing from the exact cut point on truncation
+
+    Args:
+        llm: Chat model (should carry the tool's max_tokens budget)
+        prompt: Formatted prompt
+        tool: Tool name used for metrics labels
+        expect_json: Whether the output must be a valid JSON document
+        max_continuations: Continuation limit (defaults to config.MAX_CONTINUATIONS)
+
+    Returns:
+        Full response text
+    """
+    limit = config.MAX_CONTINUATIONS if max_continuations is None else max_continuations
+    response = _invoke(llm, [HumanMessage(content=prompt)])
+    text = response.content
+    metrics.increment("llm.completions", tool=tool)
+
+    if finish_reason(response) == "length":
+        metrics.increment("llm.truncated_completions", tool=tool)
+
+    continuations = 0
+    while finish_reason(response) == "length" and continuations < limit:
+        response = _invoke(llm, [
+            HumanMessage(content=prompt),
+            AIMessage(content=text),
+            HumanMessage(content=CONTINUE_PROMPT)
+        ])
+        text = stitch(text, response.content)
+        continuations += 1
+        metrics.increment("llm.continuations", tool=tool)
+
+    truncated = finish_reason(response) == "length"
+    if truncated:
+        metrics.increment("llm.unrecovered_truncations", tool=tool)
+        if expect_json:
+            text = close_json(text)
+            if text.count("```") % 2 == 1:
+                text += "\n```"
+
+    # Quality signals of the route the model was built for (see select_route)
+    route = (getattr(llm, "metadata", None) or {}).get("route")
+    if route:
+        metrics.increment("llm.route.completions", route=route)
+        if truncated:
+            metrics.increment("llm.route.truncated", route=route)
+        elif expect_json and not contains_json(text):
+            metrics.increment("llm.route.invalid_json", route=route)
+    return text
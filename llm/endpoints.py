@@ -0,0 +1,180 @@
+"""
+LLM Endpoint Pool
+OpenAI-compatible endpoints (base URL + API key) with per-endpoint load and
+health tracking, circuit breakers and least-outstanding-requests selection
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import itertools
+import threading
+import time
+from urllib.parse import urlsplit
+import config
+from metrics import metrics
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+def parse_endpoints(spec: str) -> List[tuple]:
+    """
+    Parse "https://a/v1|sk-1, https://b/v1|sk-2" into (base_url, api_key) pairs
+
+    An entry without "|key" uses config.OPENAI_API_KEY.
+    """
+    endpoints = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        base_url, _, api_key = item.partition("|")
+        endpoints.append((base_url.strip().rstrip("/"), api_key.strip() or config.OPENAI_API_KEY))
+    return endpoints
+
+@dataclass
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    Opens after `threshold` failures in a row; after `cooldown` seconds one
+    trial request is let through (half-open) and its outcome closes or
+    re-opens the circuit
+    """
+    threshold: int
+    cooldown: float
+    state: str = CLOSED
+    failures: int = 0
+    opened_at: float = 0.0
+    trial_running: bool = False
+
+    def available(self, now: float) -> bool:
+        """Whether a request may be sent now"""
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.trial_running = False
+        if self.state == HALF_OPEN:
+            return not self.trial_running
+        return self.state == CLOSED
+
+    def on_send(self):
+        if self.state == HALF_OPEN:
+            self.trial_running = True
+
+    def on_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.trial_running = False
+
+    def on_failure(self, now: float) -> bool:
+        """Record a failure; returns True if the circuit opened"""
+        self.failures += 1
+        self.trial_running = False
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            opened = self.state != OPEN
+            self.state = OPEN
+            self.opened_at = now
+            return opened
+        return False
+
+@dataclass
+class Endpoint:
+    """One base URL + API key"""
+    name: str
+    base_url: str
+    api_key: str
+    breaker: CircuitBreaker
+    outstanding: int = 0
+    requests: int = 0
+    failures: int = 0
+
+class EndpointPool:
+    """
+    Pool of interchangeable endpoints
+    pick() returns the available endpoint with the fewest requests in
+    flight (ties rotate); endpoints whose circuit is open are skipped
+    """
+
+    def __init__(self, endpoints: Optional[List[tuple]] = None,
+                 failure_threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        """
+        Initialize the pool
+
+        Args:
+            endpoints: (base_url, api_key) pairs (defaults to config.LLM_ENDPOINTS, or the
+                single OPENAI_API_BASE/OPENAI_API_KEY endpoint)
+            failure_threshold: Consecutive failures that open a circuit
+                (defaults to config.LLM_BREAKER_FAILURES)
+            cooldown: Seconds an open circuit waits before a trial request
+                (defaults to config.LLM_BREAKER_COOLDOWN)
+        """
+        if endpoints is None:
+            endpoints = (parse_endpoints(config.LLM_ENDPOINTS)
+                         or [(config.OPENAI_API_BASE.rstrip("/"), config.OPENAI_API_KEY)])
+        threshold = config.LLM_BREAKER_FAILURES if failure_threshold is None else failure_threshold
+        cooldown = config.LLM_BREAKER_COOLDOWN if cooldown is None else cooldown
+        self.endpoints = [
+            Endpoint(f"{urlsplit(base_url).netloc}#{index}", base_url, api_key,
+                     CircuitBreaker(threshold, cooldown))
+            for index, (base_url, api_key) in enumerate(endpoints)
+        ]
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def pick(self, exclude: Optional[set] = None) -> Optional[Endpoint]:
+        """
+        Reserve the least-loaded available endpoint
+
+        Args:
+            exclude: Names of endpoints not to use (already tried)
+
+        Returns:
+            Endpoint (its outstanding count is incremented) or None if none is available
+        """
+        now = time.time()
+        exclude = exclude or set()
+        with self._lock:
+            offset = next(self._rotation)
+            count = len(self.endpoints)
+            candidates = [self.endpoints[(offset + i) % count] for i in range(count)]
+            candidates = [endpoint for endpoint in candidates
+                          if endpoint.name not in exclude and endpoint.breaker.available(now)]
+            if not candidates:
+                return None
+            endpoint = min(candidates, key=lambda candidate: candidate.outstanding)
+            endpoint.breaker.on_send()
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        metrics.increment("llm.endpoint.requests", endpoint=endpoint.name)
+        return endpoint
+
+    def done(self, endpoint: Endpoint):
+        """A request to the endpoint finished (its body was closed)"""
+        with self._lock:
+            endpoint.outstanding -= 1
+
+    def record(self, endpoint: Endpoint, success: bool):
+        """Feed a request outcome into the endpoint's circuit breaker"""
+        with self._lock:
+            if success:
+                endpoint.breaker.on_success()
+                return
+            endpoint.failures += 1
+            opened = endpoint.breaker.on_failure(time.time())
+        metrics.increment("llm.endpoint.failures", endpoint=endpoint.name)
+        if opened:
+            metrics.increment("llm.endpoint.circuit_opened", endpoint=endpoint.name)
+
+    def stats(self) -> List[Dict[str, object]]:
+        """Load and health of every endpoint"""
+        with self._lock:
+            return [{"endpoint": endpoint.name, "state": endpoint.breaker.state,
+                     "outstanding": endpoint.outstanding, "requests": endpoint.requests,
+                     "failures": endpoint.failures} for endpoint in self.endpoints]
+
+_pool: Optional[EndpointPool] = None
+_pool_lock = threading.Lock()
+
+def get_endpoint_pool() -> EndpointPool:
+    """Process-wide endpoint pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = EndpointPool()
+        return _pool
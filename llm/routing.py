@@ -0,0 +1,170 @@
+"""
+Model Routing
+Maps a task (tool, coverage_level/analysis_type, input size) to a model tier
+so cheap tasks run on a fast model and demanding ones on the strong model,
+and records per-route latency, token usage and output quality
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+import config
+from metrics import metrics
+
+FAST, STRONG = "fast", "strong"
+
+@dataclass(frozen=True)
+class Route:
+    """Model chosen for a task"""
+    name: str
+    tier: str
+    model: str
+
+_models_used: ContextVar[Optional[List[str]]] = ContextVar("llm_models_used", default=None)
+
+@contextmanager
+def track_models() -> Iterator[List[str]]:
+    """
+    Collect the models routes chosen inside the block run on (in first-use
+    order), including routes chosen in worker threads wrapped with propagate
+    """
+    models: List[str] = []
+    token = _models_used.set(models)
+    try:
+        yield models
+    finally:
+        _models_used.reset(token)
+
+def routing_signature() -> Dict[str, Any]:
+    """
+    Settings that decide which model a route runs on; cache keys of model
+    output include it so a model change is not served older models' output
+    """
+    return {"enabled": config.LLM_ROUTING_ENABLED, "default": config.OPENAI_MODEL,
+            "tiers": config.LLM_MODEL_TIERS, "routes": config.LLM_ROUTES,
+            "overrides": config.LLM_ROUTE_OVERRIDES,
+            "escalate_tokens": config.LLM_ROUTE_ESCALATE_TOKENS}
+
+def parse_overrides(spec: str) -> Dict[str, str]:
+    """Parse "defect_analyzer.quick=strong,api_test_generator=fast" into route overrides"""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, tier = item.partition("=")
+        overrides[route.strip()] = tier.strip()
+    return overrides
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size (~4 characters per token), enough for tier decisions"""
+    return len(text) // 4
+
+def select_route(tool: str, level: str = "default", prompt: str = "") -> Route:
+    """
+    Choose the model for a task
+
+    The tier comes from config.LLM_ROUTES[tool][level] (a tool-wide
+    "default" entry applies to unlisted levels), overridden by
+    config.LLM_ROUTE_OVERRIDES ("tool.level" before "tool"). A fast route
+    whose prompt exceeds config.LLM_ROUTE_ESCALATE_TOKENS is escalated to
+    the strong tier: small models lose accuracy on long inputs.
+
+    Args:
+        tool: Tool name (e.g. defect_analyzer, or "agent")
+        level: coverage_level, analysis_type, coverage_type or step name
+        prompt: Formatted prompt, used for the input-size rule
+
+    Returns:
+        Route with its name ("tool.level"), tier and model
+    """
+    name = f"{tool}.{level}"
+    if not config.LLM_ROUTING_ENABLED:
+        return _tracked(Route(name, STRONG, config.OPENAI_MODEL))
+
+    routes = config.LLM_ROUTES.get(tool, {})
+    tier = routes.get(level, routes.get("default", STRONG))
+    overrides = parse_overrides(config.LLM_ROUTE_OVERRIDES)
+    tier = overrides.get(name, overrides.get(tool, tier))
+    if tier not in config.LLM_MODEL_TIERS:
+        raise ValueError(f"Unknown model tier for {name}: {tier}")
+    if tier == FAST and estimate_tokens(prompt) > config.LLM_ROUTE_ESCALATE_TOKENS:
+        tier = STRONG
+        metrics.increment("llm.route.escalations", route=name)
+    return _tracked(Route(name, tier, config.LLM_MODEL_TIERS[tier]))
+
+def _tracked(route: Route) -> Route:
+    """Add a chosen route's model to the enclosing track_models block"""
+    models = _models_used.get()
+    if models is not None and route.model not in models:
+        models.append(route.model)
+    return route
+
+_routes_seen: set = set()
+_routes_lock = threading.Lock()
+
+class RouteMetrics(BaseCallbackHandler):
+    """Chat model callback recording latency, token usage and errors per route"""
+
+    def __init__(self, route: Route):
+        self.route = route
+        self._started: Dict[UUID, float] = {}
+        with _routes_lock:
+            _routes_seen.add(route.name)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], *,
+                            run_id: UUID, **kwargs: Any):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        started = self._started.pop(run_id, None)
+        route = self.route.name
+        metrics.increment("llm.route.calls", route=route)
+        metrics.increment("llm.model.calls", model=self.route.model)
+        if started is not None:
+            metrics.observe("llm.route.seconds", time.perf_counter() - started, route=route)
+        usage = self._usage(response)
+        if usage:
+            metrics.observe("llm.route.input_tokens", usage.get("input_tokens", 0), route=route)
+            metrics.observe("llm.route.output_tokens", usage.get("output_tokens", 0), route=route)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._started.pop(run_id, None)
+        metrics.increment("llm.route.errors", route=self.route.name)
+
+    @staticmethod
+    def _usage(response: Any) -> Optional[Dict[str, int]]:
+        """Token usage of a chat result (usage metadata, or the provider's token_usage)"""
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    return usage
+        token_usage = (response.llm_output or {}).get("token_usage")
+        if token_usage:
+            return {"input_tokens": token_usage.get("prompt_tokens", 0),
+                    "output_tokens": token_usage.get("completion_tokens", 0)}
+        return None
+
+def route_stats() -> List[Dict[str, Any]]:
+    """Per-route call count, latency, token usage and quality (share of completions not truncated or invalid)"""
+    with _routes_lock:
+        routes = sorted(_routes_seen)
+    observations = metrics.snapshot()["observations"]
+    stats = []
+    for route in routes:
+        output_tokens = observations.get(f"llm.route.output_tokens{{route={route}}}")
+        completions = metrics.counter("llm.route.completions", route=route)
+        degraded = (metrics.counter("llm.route.truncated", route=route)
+                    + metrics.counter("llm.route.invalid_json", route=route))
+        stats.append({
+            "route": route,
+            "calls": metrics.counter("llm.route.calls", route=route),
+            "errors": metrics.counter("llm.route.errors", route=route),
+            "p50_seconds": metrics.percentile("llm.route.seconds", 50, route=route),
+            "p95_seconds": metrics.percentile("llm.route.seconds", 95, route=route),
+            "mean_output_tokens": output_tokens["mean"] if output_tokens else None,
+            "quality": 1 - degraded / completions if completions else None
+        })
+    return stats
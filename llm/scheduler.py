@@ -0,0 +1,208 @@
+"""
+Fair-Share LLM Scheduling
+Admits provider calls through a shared concurrency limit: interactive calls
+go before batch calls (and keep reserved slots), and within a priority class
+tenants are served by weighted fair queuing
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import functools
+import heapq
+import itertools
+import threading
+import time
+import config
+from metrics import metrics
+from .endpoints import get_endpoint_pool
+from .routing import _models_used
+
+INTERACTIVE, BATCH = "interactive", "batch"
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+
+_identity: ContextVar[Tuple[str, str]] = ContextVar("llm_identity", default=("default", INTERACTIVE))
+
+def current_identity() -> Tuple[str, str]:
+    """(tenant, priority) LLM calls made in this context are scheduled as"""
+    return _identity.get()
+
+@contextmanager
+def scheduling(tenant: Optional[str] = None, priority: Optional[str] = None):
+    """
+    Schedule LLM calls made in this context for a tenant and priority class
+
+    Args:
+        tenant: User/tenant whose share the calls use (default: unchanged)
+        priority: "interactive" or "batch" (default: unchanged)
+    """
+    current_tenant, current_priority = _identity.get()
+    priority = priority or current_priority
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _identity.set((tenant or current_tenant, priority))
+    try:
+        yield
+    finally:
+        _identity.reset(token)
+
+def propagate(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a function so it runs under the caller's scheduling identity (for
+    worker threads); models its routes choose are tracked for the caller
+    (see routing.track_models)
+    """
+    tenant, priority = _identity.get()
+    models = _models_used.get()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _models_used.set(models)
+        try:
+            with scheduling(tenant, priority):
+                return fn(*args, **kwargs)
+        finally:
+            _models_used.reset(token)
+    return wrapper
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "alice=2,ci=0.5" into tenant weights"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        tenant, _, weight = item.partition("=")
+        weights[tenant.strip()] = float(weight)
+    return weights
+
+@dataclass(order=True)
+class _Ticket:
+    """A call waiting for a slot"""
+    rank: int
+    finish: float
+    seq: int
+    tenant: str = field(compare=False)
+    priority: str = field(compare=False)
+    enqueued: float = field(compare=False, default_factory=time.perf_counter)
+    granted: threading.Event = field(compare=False, default_factory=threading.Event)
+
+class FairScheduler:
+    """
+    Admission control for provider calls
+
+    At most `concurrency` calls run at once. Batch calls may only use
+    `concurrency - reserved` slots, so an interactive call never waits behind
+    a long batch call. Waiting calls are ordered by priority class, then by
+    weighted-fair-queuing virtual finish time: each tenant advances its own
+    virtual clock by cost / weight per call, so a tenant with a thousand
+    queued calls and a tenant with one alternate instead of queueing FIFO.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, reserved: Optional[int] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize the scheduler
+
+        Args:
+            concurrency: Calls in flight at once (defaults to config.LLM_MAX_CONCURRENCY)
+            reserved: Slots batch calls may not use (defaults to config.LLM_INTERACTIVE_RESERVED)
+            weights: Tenant weights (defaults to config.LLM_TENANT_WEIGHTS; unknown tenants weigh 1)
+        """
+        self.concurrency = concurrency or config.LLM_MAX_CONCURRENCY
+        reserved = config.LLM_INTERACTIVE_RESERVED if reserved is None else reserved
+        self.batch_limit = max(1, self.concurrency - reserved)
+        self.weights = parse_weights(config.LLM_TENANT_WEIGHTS) if weights is None else weights
+        self._lock = threading.Lock()
+        self._waiting: List[_Ticket] = []
+        self._running = {INTERACTIVE: 0, BATCH: 0}
+        self._virtual_time = 0.0
+        self._finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+
+    def acquire(self, tenant: Optional[str] = None, priority: Optional[str] = None,
+                cost: float = 1.0, timeout: Optional[float] = None) -> str:
+        """
+        Wait for a slot
+
+        Args:
+            tenant: Tenant (defaults to the context's identity)
+            priority: Priority class (defaults to the context's identity)
+            cost: Relative cost of the call
+            timeout: Seconds to wait before raising TimeoutError
+
+        Returns:
+            Priority class to pass to release()
+        """
+        default_tenant, default_priority = _identity.get()
+        tenant, priority = tenant or default_tenant, priority or default_priority
+        with self._lock:
+            if len(self._finish) > 4096:
+                self._finish = {name: value for name, value in self._finish.items()
+                                if value > self._virtual_time}
+            start = max(self._virtual_time, self._finish.get(tenant, 0.0))
+            finish = start + cost / self.weights.get(tenant, 1.0)
+            self._finish[tenant] = finish
+            ticket = _Ticket(PRIORITIES[priority], finish, next(self._seq), tenant, priority)
+            heapq.heappush(self._waiting, ticket)
+            metrics.observe("llm.queue_depth", len(self._waiting), priority=priority)
+            self._dispatch()
+        if not ticket.granted.wait(timeout):
+            with self._lock:
+                if not ticket.granted.is_set():
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    metrics.increment("llm.queue_timeouts", priority=priority)
+                    raise TimeoutError(f"No LLM slot for {tenant} within {timeout}s")
+        wait_seconds = time.perf_counter() - ticket.enqueued
+        metrics.observe("llm.queue_wait_seconds", wait_seconds, priority=priority)
+        metrics.observe("llm.tenant_queue_wait_seconds", wait_seconds, tenant=tenant)
+        return priority
+
+    def release(self, priority: str):
+        """Give a slot back"""
+        with self._lock:
+            self._running[priority] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, tenant: Optional[str] = None, priority: Optional[str] = None,
+             cost: float = 1.0):
+        """Hold a slot for the duration of a block"""
+        granted = self.acquire(tenant, priority, cost)
+        try:
+            yield
+        finally:
+            self.release(granted)
+
+    def _dispatch(self):
+        """Grant slots to waiting calls in order (lock held)"""
+        while self._waiting:
+            ticket = self._waiting[0]
+            running = sum(self._running.values())
+            if running >= self.concurrency:
+                return
+            if ticket.priority == BATCH and self._running[BATCH] >= self.batch_limit:
+                return
+            heapq.heappop(self._waiting)
+            self._virtual_time = max(self._virtual_time, ticket.finish)
+            self._running[ticket.priority] += 1
+            ticket.granted.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current queue and slot usage"""
+        with self._lock:
+            waiting = {name: 0 for name in PRIORITIES}
+            for ticket in self._waiting:
+                waiting[ticket.priority] += 1
+            return {"concurrency": self.concurrency, "batch_limit": self.batch_limit,
+                    "running": dict(self._running), "waiting": waiting}
+
+_scheduler: Optional[FairScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> FairScheduler:
+    """Process-wide scheduler (config.LLM_MAX_CONCURRENCY slots per pool endpoint)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            # Capacity grows with the endpoint pool
+            _scheduler = FairScheduler(concurrency=config.LLM_MAX_CONCURRENCY * len(get_endpoint_pool()))
+        return _scheduler
@@ -0,0 +1,604 @@
+"""
+HTTP Transports for Chat Model Clients
+httpx transports layered under the OpenAI client, so every provider call made
+by the agent and the tools passes through the same process-wide policies
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import socket
+import threading
+import time
+import httpx
+import config
+from metrics import metrics
+from .endpoints import Endpoint, EndpointPool, get_endpoint_pool
+from .scheduler import FairScheduler, get_scheduler
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that runs a callback once it is closed"""
+
+    def __init__(self, stream: httpx.SyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._on_close is not None:
+                on_close, self._on_close = self._on_close, None
+                on_close()
+
+class SchedulingTransport(httpx.BaseTransport):
+    """
+    Admit each request through the fair-share scheduler
+    The slot is held until the response body is closed, so streamed
+    completions count against the limit for their whole duration
+    """
+
+    def __init__(self, transport: httpx.BaseTransport,
+                 scheduler: Optional[FairScheduler] = None):
+        """
+        Initialize the transport
+
+        Args:
+            transport: Transport that performs the request
+            scheduler: Scheduler (defaults to the process-wide one)
+        """
+        self.transport = transport
+        self.scheduler = scheduler
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        scheduler = self.scheduler or get_scheduler()
+        priority = scheduler.acquire()
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            scheduler.release(priority)
+            raise
+        if response.is_closed:
+            scheduler.release(priority)
+        else:
+            response.stream = _ReleasingStream(response.stream, lambda: scheduler.release(priority))
+        return response
+
+    def close(self):
+        self.transport.close()
+
+def _normalize_text(text: str) -> str:
+    """Unify line endings and drop trailing whitespace; indentation and inner spacing are kept"""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).rstrip()
+
+def request_key(request: httpx.Request) -> Optional[str]:
+    """
+    Coalescing key of a chat completion request
+
+    Hash of the URL and the JSON body with sorted keys and normalized message
+    text (model, sampling parameters and the stream flag included). Only line
+    endings and trailing whitespace are normalized: indentation is meaningful
+    in code prompts. None for anything that is not a chat completion.
+    """
+    if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+        return None
+    try:
+        body = json.loads(request.content)
+    except ValueError:
+        return None
+    for message in body.get("messages") or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            message["content"] = _normalize_text(content)
+        elif isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and isinstance(part.get("text"), str):
+                    part["text"] = _normalize_text(part["text"])
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{request.url}\n{canonical}".encode("utf-8")).hexdigest()
+
+class _Flight:
+    """One in-flight request whose response is shared by its followers"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.response: Optional[httpx.Response] = None
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+    def publish(self, response: httpx.Response):
+        with self.cond:
+            self.response = response
+            self.cond.notify_all()
+
+    def add(self, chunk: bytes):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def wait_response(self) -> httpx.Response:
+        with self.cond:
+            while self.response is None and self.error is None:
+                self.cond.wait()
+            if self.response is None:
+                raise self.error
+            return self.response
+
+class _FollowerStream(httpx.SyncByteStream):
+    """Replays the leader's body as it arrives"""
+
+    def __init__(self, flight: _Flight):
+        self._flight = flight
+
+    def __iter__(self) -> Iterator[bytes]:
+        index = 0
+        flight = self._flight
+        while True:
+            with flight.cond:
+                while index >= len(flight.chunks) and not flight.done:
+                    flight.cond.wait()
+                if index < len(flight.chunks):
+                    chunk = flight.chunks[index]
+                    index += 1
+                elif flight.error is not None:
+                    raise flight.error
+                else:
+                    return
+            yield chunk
+
+class _LeaderStream(httpx.SyncByteStream):
+    """Leader's body, copied to the flight as it is read"""
+
+    def __init__(self, stream: httpx.SyncByteStream, flight: _Flight, on_done):
+        self._stream = stream
+        self._chunks = iter(stream)
+        self._flight = flight
+        self._on_done = on_done
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            for chunk in self._chunks:
+                self._flight.add(chunk)
+                yield chunk
+        except Exception as e:
+            self._complete(e)
+            raise
+        self._complete()
+
+    def _detach(self):
+        """Stop new requests from joining this flight"""
+        if self._on_done is not None:
+            on_done, self._on_done = self._on_done, None
+            on_done()
+
+    def _complete(self, error: Optional[BaseException] = None):
+        self._detach()
+        if not self._flight.done:
+            self._flight.finish(error)
+
+    def _drain(self):
+        """Read the rest of the body for the followers after the leader stopped early"""
+        try:
+            for chunk in self._chunks:
+                self._flight.add(chunk)
+            self._complete()
+        except Exception as e:
+            self._complete(e)
+        finally:
+            self._stream.close()
+
+    def close(self):
+        if not self._flight.done:
+            self._detach()
+            if self._flight.followers:
+                threading.Thread(target=self._drain, daemon=True).start()
+                return
+            self._complete(httpx.StreamClosed())
+        self._stream.close()
+
+class CoalescingTransport(httpx.BaseTransport):
+    """
+    Singleflight for chat completions
+    Concurrent requests with the same key (see request_key) wait on the first
+    one and receive a copy of its response, streamed chunk by chunk as it
+    arrives; only the first request reaches the provider (and the scheduler)
+    """
+
+    def __init__(self, transport: httpx.BaseTransport):
+        """
+        Initialize the transport
+
+        Args:
+            transport: Transport that performs the leader's request
+        """
+        self.transport = transport
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        if key is None:
+            return self.transport.handle_request(request)
+        metrics.increment("llm.singleflight.requests")
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+        if not leader:
+            metrics.increment("llm.singleflight.coalesced")
+            response = flight.wait_response()
+            return httpx.Response(response.status_code, headers=response.headers,
+                                  stream=_FollowerStream(flight), request=request)
+
+        def done():
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException as e:
+            done()
+            flight.finish(e)
+            raise
+        if response.is_closed:
+            flight.add(response.content)
+            done()
+            flight.publish(response)
+            flight.finish()
+            return response
+        response.stream = _LeaderStream(response.stream, flight, done)
+        flight.publish(response)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+class _PrefetchedStream(httpx.SyncByteStream):
+    """Body whose first chunk was already read"""
+
+    def __init__(self, stream: httpx.SyncByteStream, first: bytes, rest: Iterator[bytes]):
+        self._stream = stream
+        self._first = first
+        self._rest = rest
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._first:
+            yield self._first
+        yield from self._rest
+
+    def close(self):
+        self._stream.close()
+
+class _AttemptAborted(Exception):
+    """Raised in a hedging attempt that lost the race"""
+
+    def __init__(self, elapsed: float):
+        super().__init__(f"Hedging attempt aborted after {elapsed:.2f}s")
+        self.elapsed = elapsed
+
+class _Attempt:
+    """Abort handle of one hedging attempt"""
+
+    def __init__(self):
+        self.aborted = False
+        self._response: Optional[httpx.Response] = None
+        self._lock = threading.Lock()
+
+    def started(self, response: httpx.Response) -> bool:
+        """Register the attempt's response; False if it was aborted meanwhile"""
+        with self._lock:
+            self._response = response
+            return not self.aborted
+
+    def abort(self):
+        """
+        Stop the attempt: one still waiting for its headers is closed when
+        they arrive; one waiting for its first chunk has its connection shut
+        down, which ends the blocked read at once
+        """
+        with self._lock:
+            self.aborted = True
+            response = self._response
+        network_stream = response.extensions.get("network_stream") if response is not None else None
+        sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+class HedgeBudget:
+    """Token bucket: every request earns `ratio` hedges, up to `burst` saved"""
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def take(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+class HedgingTransport(httpx.BaseTransport):
+    """
+    Hedged chat completions
+    When a request has not produced its first body byte (the first token for
+    streamed completions) within the hedge delay, a duplicate is sent -- to
+    the secondary endpoint if one is configured -- and whichever attempt
+    answers first is used; the other one is cancelled or aborted. The delay is a percentile
+    of recently observed first-byte latencies, tracked separately for streamed
+    and non-streamed requests, and a token bucket caps hedges to a share of
+    all requests.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, percentile: Optional[float] = None,
+                 min_delay: Optional[float] = None, initial_delay: Optional[float] = None,
+                 budget: Optional[float] = None, secondary_base: Optional[str] = None,
+                 secondary_key: Optional[str] = None, primary_base: Optional[str] = None,
+                 window: int = 512):
+        """
+        Initialize the transport
+
+        Args:
+            transport: Transport performing both attempts
+            percentile: First-byte latency percentile used as hedge delay
+                (defaults to config.LLM_HEDGE_PERCENTILE)
+            min_delay: Lower bound of the hedge delay in seconds (config.LLM_HEDGE_MIN_DELAY)
+            initial_delay: Delay used until enough latencies were observed
+                (config.LLM_HEDGE_INITIAL_DELAY)
+            budget: Hedges allowed per request (config.LLM_HEDGE_BUDGET)
+            secondary_base: Base URL hedges are sent to (config.LLM_HEDGE_API_BASE;
+                empty means the primary endpoint)
+            secondary_key: API key for the secondary endpoint (config.LLM_HEDGE_API_KEY)
+            primary_base: Base URL replaced by secondary_base (config.OPENAI_API_BASE)
+            window: Latencies kept per request kind
+        """
+        self.transport = transport
+        self.percentile = config.LLM_HEDGE_PERCENTILE if percentile is None else percentile
+        self.min_delay = config.LLM_HEDGE_MIN_DELAY if min_delay is None else min_delay
+        self.initial_delay = config.LLM_HEDGE_INITIAL_DELAY if initial_delay is None else initial_delay
+        self.budget = HedgeBudget(config.LLM_HEDGE_BUDGET if budget is None else budget)
+        self.secondary_base = (config.LLM_HEDGE_API_BASE if secondary_base is None
+                               else secondary_base).rstrip("/")
+        self.secondary_key = config.LLM_HEDGE_API_KEY if secondary_key is None else secondary_key
+        self.primary_base = (config.OPENAI_API_BASE if primary_base is None else primary_base).rstrip("/")
+        self._latencies = {kind: deque(maxlen=window) for kind in ("stream", "complete")}
+        self._executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="hedge")
+
+    def delay(self, kind: str) -> float:
+        """Current hedge delay for streamed ("stream") or plain ("complete") requests"""
+        values = sorted(self._latencies[kind])
+        if len(values) < 20:
+            return self.initial_delay
+        index = min(len(values) - 1, int(round(self.percentile / 100 * (len(values) - 1))))
+        return max(self.min_delay, values[index])
+
+    def _attempt(self, request: httpx.Request, attempt: _Attempt) -> Tuple[httpx.Response, float]:
+        """Send a request and wait for its first body chunk (unless the attempt is aborted)"""
+        start = time.perf_counter()
+        response = self.transport.handle_request(request)
+        if not attempt.started(response):
+            response.close()
+            raise _AttemptAborted(time.perf_counter() - start)
+        if not response.is_closed:
+            try:
+                rest = iter(response.stream)
+                first = next(rest, b"")
+            except BaseException as e:
+                response.close()
+                if attempt.aborted:
+                    raise _AttemptAborted(time.perf_counter() - start) from e
+                raise
+            if attempt.aborted:
+                response.close()
+                raise _AttemptAborted(time.perf_counter() - start)
+            response.stream = _PrefetchedStream(response.stream, first, rest)
+        return response, time.perf_counter() - start
+
+    def _secondary(self, request: httpx.Request) -> httpx.Request:
+        """Copy of a request for the hedge attempt"""
+        url = str(request.url)
+        if self.secondary_base and url.startswith(self.primary_base):
+            url = self.secondary_base + url[len(self.primary_base):]
+        headers = [(name, value) for name, value in request.headers.multi_items()
+                   if name.lower() != "host"]
+        if self.secondary_base and self.secondary_key:
+            headers = [(name, value) for name, value in headers if name.lower() != "authorization"]
+            headers.append(("Authorization", f"Bearer {self.secondary_key}"))
+        return httpx.Request(request.method, url, headers=headers, content=request.content,
+                             extensions=request.extensions)
+
+    @staticmethod
+    def _discard(future: Future, attempt: _Attempt, kind: str):
+        """Cancel the losing attempt, or abort it and close its response if it still returns one"""
+        if future.cancel():
+            return
+        attempt.abort()
+        metrics.increment("llm.hedge.aborted", kind=kind)
+
+        def close(done: Future):
+            if done.exception() is None:
+                done.result()[0].close()
+        future.add_done_callback(close)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+            return self.transport.handle_request(request)
+        try:
+            kind = "stream" if json.loads(request.content).get("stream") else "complete"
+        except ValueError:
+            kind = "complete"
+        self.budget.earn()
+        metrics.increment("llm.hedge.requests", kind=kind)
+        handles: Dict[Future, _Attempt] = {}
+
+        def submit(attempt_request: httpx.Request) -> Future:
+            handle = _Attempt()
+            future = self._executor.submit(self._attempt, attempt_request, handle)
+            handles[future] = handle
+            return future
+
+        primary = submit(request)
+
+        def record(future: Future):
+            # Only primary attempts are recorded, so hedging does not skew the delay;
+            # an aborted primary took at least as long as it ran
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None:
+                latency = future.result()[1]
+            elif isinstance(error, _AttemptAborted):
+                latency = error.elapsed
+            else:
+                return
+            self._latencies[kind].append(latency)
+            metrics.observe("llm.first_byte_seconds", latency, kind=kind)
+        primary.add_done_callback(record)
+        done, _ = wait([primary], timeout=self.delay(kind))
+        attempts = [primary]
+        if not done:
+            if self.budget.take():
+                metrics.increment("llm.hedge.fired", kind=kind)
+                attempts.append(submit(self._secondary(request)))
+            else:
+                metrics.increment("llm.hedge.budget_exhausted", kind=kind)
+
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for other in pending:
+                    self._discard(other, handles[other], kind)
+                response = future.result()[0]
+                if future is not primary:
+                    metrics.increment("llm.hedge.won", kind=kind)
+                for other in done - {future}:
+                    if other.exception() is None:
+                        other.result()[0].close()
+                return response
+        raise error
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.transport.close()
+
+# Responses that count as an endpoint failure and are retried on another endpoint
+FAILOVER_STATUS = {401, 403, 408, 429, 500, 502, 503, 504}
+
+class BalancingTransport(httpx.BaseTransport):
+    """
+    Spread requests over the endpoint pool
+    Requests addressed to the configured base URL are sent to the least-loaded
+    healthy endpoint (URL prefix and API key rewritten). Connection errors and
+    failover statuses feed the endpoint's circuit breaker and the request is
+    retried on another endpoint; an endpoint's load is released when the
+    response body is closed
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, pool: Optional[EndpointPool] = None,
+                 primary_base: Optional[str] = None):
+        """
+        Initialize the transport
+
+        Args:
+            transport: Transport performing the request
+            pool: Endpoint pool (defaults to the process-wide one)
+            primary_base: Base URL the OpenAI clients are configured with
+                (defaults to config.OPENAI_API_BASE)
+        """
+        self.transport = transport
+        self.pool = pool
+        self.primary_base = (config.OPENAI_API_BASE if primary_base is None else primary_base).rstrip("/")
+
+    def _rewrite(self, request: httpx.Request, endpoint: Endpoint) -> httpx.Request:
+        """Copy of a request addressed to an endpoint"""
+        url = endpoint.base_url + str(request.url)[len(self.primary_base):]
+        headers = [(name, value) for name, value in request.headers.multi_items()
+                   if name.lower() not in ("host", "authorization")]
+        headers.append(("Authorization", f"Bearer {endpoint.api_key}"))
+        return httpx.Request(request.method, url, headers=headers, content=request.content,
+                             extensions=request.extensions)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not str(request.url).startswith(self.primary_base):
+            return self.transport.handle_request(request)
+        pool = self.pool or get_endpoint_pool()
+        tried = set()
+        last_response: Optional[httpx.Response] = None
+        last_error: Optional[Exception] = None
+        while True:
+            endpoint = pool.pick(tried)
+            if endpoint is None:
+                break
+            tried.add(endpoint.name)
+            if last_response is not None:
+                last_response.close()
+                last_response = None
+                metrics.increment("llm.endpoint.failovers")
+            start = time.perf_counter()
+            try:
+                response = self.transport.handle_request(self._rewrite(request, endpoint))
+            except httpx.TransportError as e:
+                pool.done(endpoint)
+                pool.record(endpoint, False)
+                last_error = e
+                metrics.increment("llm.endpoint.failovers")
+                continue
+            metrics.observe("llm.endpoint.response_seconds", time.perf_counter() - start,
+                            endpoint=endpoint.name)
+            if response.is_closed:
+                pool.done(endpoint)
+            else:
+                response.stream = _ReleasingStream(response.stream,
+                                                   lambda endpoint=endpoint: pool.done(endpoint))
+            success = response.status_code not in FAILOVER_STATUS
+            pool.record(endpoint, success)
+            if success:
+                return response
+            last_response = response
+        if last_response is not None:
+            return last_response
+        if last_error is not None:
+            raise last_error
+        raise httpx.ConnectError("No LLM endpoint available: all circuits are open", request=request)
+
+    def stats(self) -> List[Dict[str, object]]:
+        """Load and health of the endpoints"""
+        return (self.pool or get_endpoint_pool()).stats()
+
+    def close(self):
+        self.transport.close()
+
+def coalescing_rate() -> Optional[float]:
+    """Share of chat completion requests served by another in-flight request"""
+    return metrics.ratio("llm.singleflight.coalesced", "llm.singleflight.requests")
@@ -5,7 +5,6 @@ Entry point for the Test Engineer AI Assistant MVP
 import json
 import sys
 from typing import Dict, Any
-from test_engineer_agent import TestEngineerAgent
 
 class TestEngineerAssistant:
     """Main application class for the Test Engineer Assistant"""
@@ -14,6 +13,8 @@ class TestEngineerAssistant:
         """Initialize the assistant"""
         print("🤖 Initializing Test Engineer Intelligent Assistant...")
         try:
+            # Imported here so the offline subcommands run without provider access
+            from test_engineer_agent import TestEngineerAgent
             self.agent = TestEngineerAgent()
             print("✅ Assistant initialized successfully!")
         except Exception as e:
@@ -32,6 +33,7 @@ class TestEngineerAssistant:
         print("  4. Create testing strategy")
         print("  5. Generate comprehensive test suite")
         print("  6. Free-form testing assistance")
+        print("  '@FILE [request]' to work on a Markdown/DOCX/PDF/HTML/OpenAPI document")
         print("  'quit' or 'exit' to stop")
         print("="*60)
         
@@ -46,6 +48,10 @@ class TestEngineerAssistant:
                 if user_input.strip() == "":
                     continue
                 
+                if user_input.startswith("@"):
+                    self.process_document(user_input[1:])
+                    continue
+                
                 print("\n🔄 Processing your request...")
                 response = self.agent.process_request(user_input)
                 print(f"\n📋 Response:\n{response}")
@@ -56,6 +62,21 @@ class TestEngineerAssistant:
             except Exception as e:
                 print(f"\n❌ Error: {e}")
     
+    def process_document(self, command: str):
+        """Ingest a document and run the request on each of its chunks"""
+        from tools.document_ingest import ingest
+        
+        path, _, request = command.strip().partition(" ")
+        document = ingest(path)
+        chunks = document.chunks()
+        print(f"\n📄 {document.source} ({document.format}), {len(chunks)} chunk(s):")
+        print(document.outline())
+        request = request.strip() or "Generate comprehensive functional test cases for these requirements:"
+        for number, chunk in enumerate(chunks, 1):
+            print(f"\n🔄 Processing chunk {number}/{len(chunks)}...")
+            response = self.agent.process_request(f"{request}\n\n{chunk}")
+            print(f"\n📋 Response:\n{response}")
+    
     def run_demo_scenarios(self):
         """Run demonstration scenarios"""
         print("\n🎯 Running Demo Scenarios...")
@@ -114,8 +135,341 @@ class TestEngineerAssistant:
             
             input("\nPress Enter to continue to next demo...")
 
+def run_api_tests(args):
+    """Execute generated API test code against a service or the local mock server"""
+    import argparse
+    from tools import APITestExecutor
+
+    parser = argparse.ArgumentParser(prog="python main.py --run-api-tests")
+    parser.add_argument("generated", nargs="+", help="Generated test files (.py or .md)")
+    parser.add_argument("--spec", help="OpenAPI spec driving the local mock server")
+    parser.add_argument("--base-url", help="Run against this service instead of the mock server")
+    parser.add_argument("--junit", default="api_test_report.xml", help="JUnit XML report path")
+    parser.add_argument("--workers", type=int, help="Number of worker processes")
+    parser.add_argument("--timeout", type=float, help="Seconds per test before it is reported as an error")
+    options = parser.parse_args(args)
+
+    generated = [open(path, encoding="utf-8").read() for path in options.generated]
+    spec = open(options.spec, encoding="utf-8").read() if options.spec else None
+
+    executor = APITestExecutor(base_url=options.base_url, max_workers=options.workers,
+                               timeout=options.timeout)
+    report = executor.run(generated, api_specification=spec, junit_path=options.junit)
+
+    summary = report.summary()
+    print(f"🎯 Target: {summary['base_url']}")
+    for result in report.results:
+        icon = {"passed": "✅", "skipped": "⏭️"}.get(result.status, "❌")
+        print(f"{icon} {result.module}::{result.name} ({result.duration * 1000:.0f} ms) {result.message}")
+    print(f"\n📊 {summary['passed']}/{summary['total']} passed, {summary['failed']} failed, "
+          f"{summary['errors']} errors, {summary['skipped']} skipped in {summary['wall_time']}s")
+    print(f"📄 JUnit report written to {options.junit}")
+    return summary["failed"] == 0 and summary["errors"] == 0
+
+def triage_defects(args):
+    """Bulk-triage a CSV/JSONL defect export with resumable checkpoints"""
+    import argparse
+    from tools import BulkDefectTriage
+
+    parser = argparse.ArgumentParser(prog="python main.py --triage")
+    parser.add_argument("input", help="Defect export (.csv or .jsonl)")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, help="Concurrent quick analyses")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: OUTPUT.checkpoint)")
+    options = parser.parse_args(args)
+
+    def progress(summary):
+        print(f"🔄 {summary.processed} analysed, {summary.errors} errors, "
+              f"{summary.skipped} skipped")
+
+    triage = BulkDefectTriage(max_concurrency=options.concurrency)
+    summary = triage.run(options.input, options.output, options.checkpoint, progress=progress)
+    if summary.resumed_from:
+        print(f"♻️ Resumed from record {summary.resumed_from}")
+    print(f"✅ Triage finished in {summary.elapsed:.1f}s: {summary.processed} analysed, "
+          f"{summary.errors} errors. Results: {options.output}")
+    return summary.errors == 0
+
+def _labelled_defects(options):
+    """Labelled examples from --data exports and, optionally, the defect index"""
+    from tools.defect_classifier import load_labelled_defects, labelled_from_index
+    from tools.defect_index import DefectIndex
+
+    examples = []
+    for path in options.data:
+        examples.extend(load_labelled_defects(path))
+    if options.from_index:
+        index = DefectIndex(options.index)
+        examples.extend(labelled_from_index(index))
+        index.close()
+    return examples
+
+def train_classifier(args):
+    """Train the local quick-analysis classifier offline"""
+    import argparse
+    import random
+    import config
+    from tools.defect_classifier import DefectClassifier
+
+    parser = argparse.ArgumentParser(prog="python main.py --train-classifier")
+    parser.add_argument("data", nargs="*", help="Labelled defect exports (.csv or .jsonl)")
+    parser.add_argument("--from-index", action="store_true",
+                        help="Also train on quick analyses stored in the defect index")
+    parser.add_argument("--index", help="Defect index database (default: DEFECT_INDEX_PATH)")
+    parser.add_argument("--model", default=config.DEFECT_CLASSIFIER_PATH, help="Model output path")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction held out for evaluation")
+    parser.add_argument("--epochs", type=int, default=10, help="Training epochs")
+    options = parser.parse_args(args)
+
+    examples = _labelled_defects(options)
+    if len(examples) < 10:
+        print(f"❌ Need at least 10 labelled defects, found {len(examples)}")
+        return False
+    random.Random(0).shuffle(examples)
+    split = int(len(examples) * (1 - options.holdout))
+    train, held_out = examples[:split], examples[split:]
+
+    model = DefectClassifier().fit(*map(list, zip(*train)), epochs=options.epochs)
+    model.save(options.model)
+    print(f"✅ Trained on {len(train)} defects, model written to {options.model}")
+    if held_out:
+        _print_evaluation(model.evaluate(*map(list, zip(*held_out))))
+    return True
+
+def evaluate_classifier(args):
+    """Evaluate the local quick-analysis classifier on labelled data"""
+    import argparse
+    import config
+    from tools.defect_classifier import DefectClassifier
+
+    parser = argparse.ArgumentParser(prog="python main.py --eval-classifier")
+    parser.add_argument("data", nargs="*", help="Labelled defect exports (.csv or .jsonl)")
+    parser.add_argument("--from-index", action="store_true",
+                        help="Also evaluate on quick analyses stored in the defect index")
+    parser.add_argument("--index", help="Defect index database (default: DEFECT_INDEX_PATH)")
+    parser.add_argument("--model", default=config.DEFECT_CLASSIFIER_PATH, help="Model path")
+    parser.add_argument("--threshold", type=float, help="Confidence threshold to report coverage at")
+    options = parser.parse_args(args)
+
+    examples = _labelled_defects(options)
+    if not examples:
+        print("❌ No labelled defects found")
+        return False
+    model = DefectClassifier.load(options.model)
+    _print_evaluation(model.evaluate(*map(list, zip(*examples)), threshold=options.threshold))
+    return True
+
+def _print_evaluation(report):
+    """Print a classifier evaluation report"""
+    print(f"📊 {report['samples']} defects: category accuracy {report['category_accuracy']:.1%}, "
+          f"severity accuracy {report['severity_accuracy']:.1%}")
+    print(f"🎯 At threshold {report['threshold']}: {report['coverage']:.1%} answered locally "
+          f"with {report['confident_accuracy']:.1%} accuracy")
+
+def cluster_defects(args):
+    """Cluster a defect history and write a trend report"""
+    import argparse
+    from tools.defect_clustering import (DefectClusterer, default_llm_factory,
+                                         defects_from_export, defects_from_index, write_report)
+    from tools.defect_index import DefectIndex
+
+    parser = argparse.ArgumentParser(prog="python main.py --cluster-defects")
+    parser.add_argument("--input", help="Defect export (.csv or .jsonl) instead of the defect index")
+    parser.add_argument("--index", help="Defect index database (default: DEFECT_INDEX_PATH)")
+    parser.add_argument("--clusters", type=int, help="Number of clusters")
+    parser.add_argument("--window-days", type=int, help="Length of the recent trend window")
+    parser.add_argument("--output", default="defect_trends.md", help="Report path (.md or .json)")
+    parser.add_argument("--no-labels", action="store_true", help="Skip LLM cluster labels")
+    options = parser.parse_args(args)
+
+    clusterer = DefectClusterer(n_clusters=options.clusters,
+                                llm_factory=None if options.no_labels else default_llm_factory)
+    if options.input:
+        report = clusterer.cluster(defects_from_export(options.input), options.window_days)
+    else:
+        index = DefectIndex(options.index)
+        report = clusterer.cluster(defects_from_index(index), options.window_days)
+        index.close()
+
+    write_report(report, options.output)
+    print(f"✅ {report.total} defects in {len(report.clusters)} clusters "
+          f"({report.llm_calls} LLM calls, {report.elapsed:.1f}s). Report: {options.output}")
+    for cluster in report.clusters[:5]:
+        print(f"  {cluster.trend:>8}  {cluster.recent:>5} recent  {cluster.label}")
+    return True
+
+def search_artifacts(args):
+    """Search previously generated artifacts"""
+    import argparse
+    from datetime import datetime
+    from tools.artifact_store import get_artifact_store
+
+    parser = argparse.ArgumentParser(prog="python main.py --search-artifacts")
+    parser.add_argument("query", nargs="*", help="Words to search for (omit to list recent artifacts)")
+    parser.add_argument("--tool", help="Only artifacts of this tool")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of results")
+    parser.add_argument("--show", type=int, metavar="ID", help="Print the artifact with this id")
+    options = parser.parse_args(args)
+
+    store = get_artifact_store()
+    if options.show is not None:
+        artifact = store.get(options.show)
+        if artifact is None:
+            print(f"❌ No artifact with id {options.show}")
+            return False
+        print(f"# Artifact {artifact.artifact_id} ({artifact.tool}, {artifact.output_format}, "
+              f"{artifact.coverage}, {artifact.model})\n")
+        print(artifact.content)
+        return True
+
+    hits = store.search(" ".join(options.query), tool=options.tool, limit=options.limit)
+    if not hits:
+        print("🔍 No matching artifacts")
+    for hit in hits:
+        created = datetime.fromtimestamp(hit.created_at).strftime("%Y-%m-%d %H:%M")
+        print(f"[{hit.artifact_id}] {created} {hit.tool} ({hit.output_format or '-'}, "
+              f"{hit.coverage or '-'})")
+        print(f"     {' '.join(hit.snippet.split())}")
+    return True
+
+def coverage_matrix(args):
+    """Print or write the requirement-to-test coverage matrix"""
+    import argparse
+    import json
+    from tools.traceability import TraceabilityEngine
+
+    parser = argparse.ArgumentParser(prog="python main.py --coverage")
+    parser.add_argument("requirements", help="Requirement document")
+    parser.add_argument("tests", help="Generated test suite (standard JSON format)")
+    parser.add_argument("--output", help="Write the matrix to this path (.md or .json)")
+    options = parser.parse_args(args)
+
+    with open(options.requirements, "r", encoding="utf-8") as f:
+        requirements = f.read()
+    with open(options.tests, "r", encoding="utf-8") as f:
+        tests = f.read()
+    matrix = TraceabilityEngine().coverage(requirements, tests)
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            if options.output.endswith(".json"):
+                json.dump(matrix.to_dict(), f, indent=2, ensure_ascii=False)
+            else:
+                f.write(matrix.to_markdown())
+        summary = matrix.summary()
+        print(f"✅ Coverage {summary['coverage']:.1%} ({summary['weak']} weak, "
+              f"{summary['uncovered']} uncovered). Matrix: {options.output}")
+    else:
+        print(matrix.to_markdown())
+    return True
+
+def deduplicate_tests(args):
+    """Remove near-duplicate test cases from one or more suites"""
+    import argparse
+    import json
+    from tools.case_dedup import CaseDeduplicator
+    from tools.llm_output import extract_test_cases
+
+    parser = argparse.ArgumentParser(prog="python main.py --dedup")
+    parser.add_argument("inputs", nargs="+", help="Test suites (standard JSON format) to merge")
+    parser.add_argument("--output", default="deduplicated_tests.json", help="Deduplicated suite path")
+    parser.add_argument("--report", help="Merge report path (.md or .json)")
+    parser.add_argument("--threshold", type=float, help="Similarity threshold (default: TEST_DEDUP_THRESHOLD)")
+    options = parser.parse_args(args)
+
+    cases = []
+    for path in options.inputs:
+        with open(path, "r", encoding="utf-8") as f:
+            cases.extend(extract_test_cases(f.read()))
+    if not cases:
+        print("❌ No test cases found")
+        return False
+
+    result = CaseDeduplicator(threshold=options.threshold).deduplicate(cases)
+    with open(options.output, "w", encoding="utf-8") as f:
+        json.dump({"test_cases": result.test_cases}, f, indent=2, ensure_ascii=False)
+    if options.report:
+        with open(options.report, "w", encoding="utf-8") as f:
+            if options.report.endswith(".json"):
+                json.dump(result.to_dict(), f, indent=2, ensure_ascii=False)
+            else:
+                f.write(result.to_markdown())
+    print(f"✅ {result.original} test cases → {len(result.test_cases)} "
+          f"({result.removed} near-duplicates merged in {result.elapsed:.2f}s). "
+          f"Suite: {options.output}")
+    return True
+
+def ingest_document(args):
+    """Ingest a requirement/spec document and optionally generate tests from it"""
+    import argparse
+    from tools import APITestGenerator, FunctionalTestGenerator
+    from tools.document_ingest import FORMATS, ingest
+
+    parser = argparse.ArgumentParser(prog="python main.py --ingest")
+    parser.add_argument("document", help="Markdown/text, HTML, DOCX, PDF or OpenAPI file")
+    parser.add_argument("--format", choices=FORMATS, help="Document format (detected by default)")
+    parser.add_argument("--section", action="append", help="Only use sections whose heading contains this text")
+    parser.add_argument("--tool", choices=["functional", "api"], help="Generate tests from the document")
+    parser.add_argument("--test-format", default="standard", help="Functional test format")
+    parser.add_argument("--coverage", default="comprehensive", help="Coverage level/type")
+    parser.add_argument("--budget", type=int, help="Tokens per chunk (default: INGEST_CHUNK_TOKENS)")
+    parser.add_argument("--output", help="Write the result (or the normalized Markdown) here")
+    options = parser.parse_args(args)
+
+    document = ingest(options.document, format=options.format)
+    chunks = document.chunks(options.budget, options.section)
+    print(f"📄 {document.source} ({document.format}): {len(chunks)} chunk(s)")
+    print(document.outline())
+
+    if options.tool and not chunks:
+        if options.section:
+            print(f"❌ No section matched: {', '.join(options.section)}")
+        else:
+            print("❌ The document has no text to generate tests from")
+        return False
+    if options.tool == "functional":
+        result = FunctionalTestGenerator().generate_from_chunks(
+            chunks, options.test_format, options.coverage)
+    elif options.tool == "api":
+        generator = APITestGenerator()
+        if document.spec is not None and not options.section:
+            with open(options.document, "r", encoding="utf-8") as f:
+                result = generator._run(f.read(), coverage_type=options.coverage)
+        else:
+            result = "\n\n".join(generator._run(chunk, coverage_type=options.coverage)
+                                  for chunk in chunks)
+    else:
+        result = document.to_markdown(options.section)
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            f.write(result)
+        print(f"✅ Written to {options.output}")
+    elif options.tool:
+        print(result)
+    return True
+
 def main():
     """Main entry point"""
+    if len(sys.argv) > 1 and sys.argv[1] == "--run-api-tests":
+        sys.exit(0 if run_api_tests(sys.argv[2:]) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == "--triage":
+        sys.exit(0 if triage_defects(sys.argv[2:]) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == "--train-classifier":
+        sys.exit(0 if train_classifier(sys.argv[2:]) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == "--eval-classifier":
+        sys.exit(0 if evaluate_classifier(sys.argv[2:]) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == "--cluster-defects":
+        sys.exit(0 if cluster_defects(sys.argv[2:]) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == "--search-artifacts":
+        sys.exit(0 if search_artifacts(sys.argv[2:]) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == "--coverage":
+        sys.exit(0 if coverage_matrix(sys.argv[2:]) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == "--dedup":
+        sys.exit(0 if deduplicate_tests(sys.argv[2:]) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == "--ingest":
+        sys.exit(0 if ingest_document(sys.argv[2:]) else 1)
+
     print("🚀 Starting Test Engineer Intelligent Assistant MVP")
     
     # Initialize assistant
@@ -128,7 +482,10 @@ def main():
         elif sys.argv[1] == "--interactive":
             assistant.run_interactive_mode()
         else:
-            print("Usage: python main.py [--demo|--interactive]")
+            print("Usage: python main.py [--demo|--interactive|--run-api-tests FILE ...|"
+                  "--triage INPUT OUTPUT|--train-classifier DATA ...|--eval-classifier DATA ...|"
+                  "--cluster-defects|--search-artifacts QUERY|--coverage REQUIREMENTS TESTS|"
+                  "--dedup SUITE ...|--ingest DOCUMENT ...]")
     else:
         # Default to interactive mode
         assistant.run_interactive_mode()
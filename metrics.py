@@ -0,0 +1,111 @@
+"""
+Metrics registry for the Test Engineer Intelligent Assistant
+Thread-safe counters and latency/size observations kept in process memory
+"""
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+import threading
+import time
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    """Build a Prometheus-style series key"""
+    if not labels:
+        return name
+    rendered = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+class Metrics:
+    """
+    In-process metrics registry
+    Counters accumulate forever; observations keep a bounded window for percentiles
+    """
+
+    def __init__(self, window: int = 2048):
+        """
+        Initialize the registry
+
+        Args:
+            window: Number of recent observations kept per series
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._observations: Dict[str, deque] = {}
+        self._totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Add to a counter"""
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record an observation (latency, size, ...)"""
+        key = _key(name, labels)
+        with self._lock:
+            series = self._observations.get(key)
+            if series is None:
+                series = self._observations[key] = deque(maxlen=self.window)
+            series.append(value)
+            totals = self._totals[key]
+            totals[0] += 1
+            totals[1] += value
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the wall-clock duration of a block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name: str, **labels) -> float:
+        """Current value of a counter"""
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0.0)
+
+    def percentile(self, name: str, q: float, **labels) -> Optional[float]:
+        """Percentile (0-100) over the recent observation window"""
+        with self._lock:
+            series = self._observations.get(_key(name, labels))
+            values = sorted(series) if series else []
+        if not values:
+            return None
+        index = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+        return values[index]
+
+    def ratio(self, numerator: str, denominator: str, **labels) -> Optional[float]:
+        """Ratio of two counters, None when the denominator is zero"""
+        total = self.counter(denominator, **labels)
+        return self.counter(numerator, **labels) / total if total else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All counters plus count/mean/p50/p95/p99 for every observed series"""
+        with self._lock:
+            counters = dict(self._counters)
+            observations = {key: sorted(values) for key, values in self._observations.items()}
+            totals = {key: list(value) for key, value in self._totals.items()}
+
+        summaries = {}
+        for key, values in observations.items():
+            count, total = totals[key]
+            pick = lambda q: values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+            summaries[key] = {
+                "count": count,
+                "mean": total / count if count else 0.0,
+                "p50": pick(50),
+                "p95": pick(95),
+                "p99": pick(99),
+            }
+        return {"counters": counters, "observations": summaries}
+
+    def reset(self):
+        """Drop all recorded data"""
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+            self._totals.clear()
+
+# Process-wide registry shared by all tools
+metrics = Metrics()
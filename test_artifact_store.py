@@ -0,0 +1,98 @@
+"""
+Test script for the persistent generated-artifact store
+"""
+import sys
+import os
+import json
+import tempfile
+
+def test_artifact_search():
+    """Test saving generations and finding them through the full-text index"""
+    print("🔍 Testing artifact store search...")
+
+    try:
+        import time
+        from tools.artifact_store import ArtifactStore, prompt_hash
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = ArtifactStore(os.path.join(directory, "artifacts.db"))
+            suite = json.dumps({"test_cases": [
+                {"test_id": "TC_001", "test_name": "Account lockout after failed logins",
+                 "steps": ["Enter a wrong password three times"], "expected_result": "Account is locked"}
+            ]})
+            login_id = store.save("functional_test_generator", suite,
+                                  "Users log in with email and password", "standard", "basic",
+                                  parameters={"priority_focus": "high"})
+            gherkin = ("Feature: Checkout\n  Scenario: Pay with a saved card\n"
+                       "    Given a cart with one item\n    When the user pays with a saved card\n"
+                       "    Then the order is confirmed\n")
+            store.save("functional_test_generator", gherkin, "Checkout with saved cards", "gherkin")
+            store.save("api_test_generator", "```python\ndef test_get_user_returns_200():\n    pass\n```",
+                       "GET /users/{id}", "python", "basic")
+            for i in range(500):
+                store.save("agent", f"Answer {i}", f"Unrelated question number {i} about reporting")
+
+            start = time.perf_counter()
+            hits = store.search("lockout")
+            elapsed = time.perf_counter() - start
+            if [hit.artifact_id for hit in hits] != [login_id]:
+                print(f"❌ Expected the lockout suite, got {hits}")
+                return False
+            print(f"✅ Found by test name in {elapsed * 1000:.2f} ms")
+
+            if not store.search("saved card", tool="functional_test_generator"):
+                print("❌ Gherkin steps were not indexed")
+                return False
+            if not store.search("get user returns"):
+                print("❌ Python test names were not indexed")
+                return False
+            if store.search("lockout", tool="api_test_generator"):
+                print("❌ Tool filter was ignored")
+                return False
+
+            digest = prompt_hash("functional_test_generator", "Users log in with  email and password",
+                                 {"output_format": "standard", "coverage": "basic",
+                                  "priority_focus": "high"})
+            artifact = store.find_by_prompt(digest)
+            if artifact is None or artifact.artifact_id != login_id:
+                print("❌ Identical request was not found by prompt hash")
+                return False
+            store.close()
+
+        print("✅ Artifacts searchable by requirements, test names and steps")
+        return True
+    except Exception as e:
+        print(f"❌ Artifact store error: {e}")
+        return False
+
+def main():
+    """Run all tests"""
+    print("🚀 Artifact Store - Offline Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Artifact Search Test", test_artifact_search)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        print(f"\n{'='*20} {test_name} {'='*20}")
+        try:
+            if test_func():
+                passed += 1
+                print(f"✅ {test_name} PASSED")
+            else:
+                print(f"❌ {test_name} FAILED")
+        except Exception as e:
+            print(f"❌ {test_name} FAILED with exception: {e}")
+
+    print(f"\n{'='*60}")
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,301 @@
+"""
+Test script for the shared cache backends (runs offline; the Redis backend
+talks to a local RESP stand-in server)
+"""
+import sys
+import os
+import tempfile
+
+class StandInRedis:
+    """Threaded TCP server answering PING/AUTH/SELECT/GET/SET [PX|EX]/DEL over RESP"""
+
+    def __init__(self, password=None):
+        import socketserver
+        import threading
+        import time
+
+        store = self.store = {}
+        lock = threading.Lock()
+
+        class Handler(socketserver.StreamRequestHandler):
+            def read_command(self):
+                header = self.rfile.readline()
+                if not header.startswith(b"*"):
+                    return None
+                args = []
+                for _ in range(int(header[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                return args
+
+            def handle(self):
+                authenticated = password is None
+                while True:
+                    args = self.read_command()
+                    if args is None:
+                        return
+                    name = args[0].upper()
+                    if name == b"AUTH":
+                        authenticated = args[-1].decode() == password
+                        self.wfile.write(b"+OK\r\n" if authenticated else b"-WRONGPASS\r\n")
+                    elif not authenticated:
+                        self.wfile.write(b"-NOAUTH Authentication required\r\n")
+                    elif name in (b"PING", b"SELECT"):
+                        self.wfile.write(b"+OK\r\n")
+                    elif name == b"SET":
+                        expires = 0.0
+                        if len(args) == 5:
+                            scale = 1000 if args[3].upper() == b"PX" else 1
+                            expires = time.time() + int(args[4]) / scale
+                        with lock:
+                            store[args[1]] = (args[2], expires)
+                        self.wfile.write(b"+OK\r\n")
+                    elif name == b"GET":
+                        with lock:
+                            value, expires = store.get(args[1], (None, 0.0))
+                        if value is None or (expires and expires <= time.time()):
+                            self.wfile.write(b"$-1\r\n")
+                        else:
+                            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+                    elif name == b"DEL":
+                        with lock:
+                            removed = store.pop(args[1], None) is not None
+                        self.wfile.write(b":%d\r\n" % removed)
+                    else:
+                        self.wfile.write(b"-ERR unknown command\r\n")
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def test_key_hashing():
+    """Test that cache keys are stable across processes and argument order"""
+    print("🔑 Testing cache key hashing...")
+
+    try:
+        import subprocess
+        from cache import cache_key
+
+        key = cache_key("web_result", "login", {"level": "basic", "format": "standard"})
+        reordered = cache_key("web_result", "login", {"format": "standard", "level": "basic"})
+        other = subprocess.run(
+            [sys.executable, "-c", "from cache import cache_key; "
+             "print(cache_key('web_result', 'login', {'level': 'basic', 'format': 'standard'}))"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            env={**os.environ, "PYTHONHASHSEED": "123"}).stdout.strip()
+
+        print(f"✅ Key: {key}")
+        if key != reordered or key != other:
+            print("❌ Keys differ between argument orders or processes")
+            return False
+        if cache_key("web_result", "login", {"level": "exhaustive"}) == key:
+            print("❌ Different inputs produced the same key")
+            return False
+        if not key.startswith("tea:v1:web_result:"):
+            print("❌ Key is missing its prefix and namespace")
+            return False
+        return True
+    except Exception as e:
+        print(f"❌ Key hashing error: {e}")
+        return False
+
+def test_sqlite_shared_across_processes():
+    """Test that the SQLite backend is shared by processes on one host"""
+    print("\n🗄️ Testing SQLite backend across processes...")
+
+    try:
+        import subprocess
+        import time
+        from cache import SQLiteBackend, cache_key
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.db")
+            backend = SQLiteBackend(path)
+            key = cache_key("web_result", "suite")
+            large = "test case\n" * 1000
+            script = ("import sys; from cache import SQLiteBackend, cache_key; "
+                      "SQLiteBackend(sys.argv[1]).set(cache_key('web_result', 'suite'), sys.argv[2])")
+            if backend.get(key) is not None:
+                print("❌ Empty cache returned a value")
+                return False
+            subprocess.run([sys.executable, "-c", script, path, large], check=True,
+                           cwd=os.path.dirname(os.path.abspath(__file__)))
+
+            if backend.get(key) != large:
+                print("❌ Entry written by another process was not visible")
+                return False
+            backend.set(cache_key("web_result", "short"), "x", ttl=0.05)
+            time.sleep(0.1)
+            if backend.get(cache_key("web_result", "short")) is not None:
+                print("❌ Expired entry was returned")
+                return False
+
+            stats = backend.stats()
+            backend.close()
+        print(f"✅ Entry written by a worker process was read here; stats {stats}")
+        if stats["hits"] != 1 or stats["misses"] != 2 or stats["hit_rate"] != 1 / 3:
+            print("❌ Hit/miss accounting is wrong")
+            return False
+        return True
+    except Exception as e:
+        print(f"❌ SQLite backend error: {e}")
+        return False
+
+def test_redis_backend():
+    """Test the Redis-protocol backend against a local stand-in server"""
+    print("\n🌐 Testing Redis backend...")
+
+    server = StandInRedis(password="secret")
+    try:
+        import time
+        from cache import RedisBackend, cache_key
+        from metrics import metrics
+
+        url = f"redis://:secret@127.0.0.1:{server.port}/1"
+        host_a, host_b = RedisBackend(url), RedisBackend(url)
+        key = cache_key("defect_analysis", "timeout", "quick")
+
+        host_a.set(key, '{"severity": "high"}')
+        if host_b.get(key) != '{"severity": "high"}':
+            print("❌ Entry set on one host was not visible on another")
+            return False
+        host_a.set(cache_key("defect_analysis", "flaky"), "value", ttl=0.05)
+        time.sleep(0.1)
+        if host_b.get(cache_key("defect_analysis", "flaky")) is not None:
+            print("❌ Expired entry was returned")
+            return False
+        host_b.delete(key)
+        if host_a.get(key) is not None:
+            print("❌ Deleted entry was returned")
+            return False
+        print(f"✅ Two clients share entries; stats {host_b.stats()}")
+
+        errors_before = metrics.counter("cache.errors", backend="redis", namespace="defect_analysis")
+        wrong_password = RedisBackend(f"redis://:wrong@127.0.0.1:{server.port}/1")
+        if wrong_password.get(key) is not None or wrong_password.get(key) is not None:
+            print("❌ Rejected credentials returned a value")
+            return False
+        if wrong_password._idle:
+            print(f"❌ Connections that failed to authenticate were pooled: {wrong_password._idle}")
+            return False
+        unauthenticated = RedisBackend(f"redis://127.0.0.1:{server.port}/0")
+        server.stop()
+        down = RedisBackend(f"redis://127.0.0.1:{server.port}/0", timeout=0.2)
+        if unauthenticated.get(key) is not None or down.get(key) is not None:
+            print("❌ Failing backend returned a value")
+            return False
+        down.set(key, "dropped")
+        errors = metrics.counter("cache.errors", backend="redis", namespace="defect_analysis")
+        if errors - errors_before != 5:
+            print(f"❌ Backend failures were not counted: {errors - errors_before}")
+            return False
+        print("✅ Server errors and outages degrade to misses")
+        for backend in (host_a, host_b, wrong_password, unauthenticated, down):
+            backend.close()
+        return True
+    except Exception as e:
+        print(f"❌ Redis backend error: {e}")
+        return False
+    finally:
+        server.stop()
+
+def test_cached_results():
+    """Test that cached() reuses results through the configured backend"""
+    print("\n♻️ Testing cached tool results...")
+
+    import config
+    saved = (config.CACHE_BACKEND, config.CACHE_PATH)
+    try:
+        from cache import cached, get_cache
+
+        with tempfile.TemporaryDirectory() as directory:
+            config.CACHE_BACKEND = "sqlite"
+            config.CACHE_PATH = os.path.join(directory, "cache.db")
+            calls = []
+
+            @cached("web_result")
+            def generate(requirements, coverage_level="basic"):
+                calls.append(requirements)
+                return f"tests for {requirements}"
+
+            @cached("web_result", keep=lambda text: not text.startswith("Error"))
+            def answer(prompt):
+                calls.append(prompt)
+                if len(calls) == 3:
+                    raise RuntimeError("provider unavailable")
+                return "Error processing request" if len(calls) == 4 else f"answer to {prompt}"
+
+            first = generate("login", coverage_level="basic")
+            second = generate("login", coverage_level="basic")
+            generate("login", coverage_level="exhaustive")
+            stats = get_cache().stats()
+
+            try:
+                answer("strategy")
+                print("❌ Failure was not raised")
+                return False
+            except RuntimeError:
+                pass
+            rejected = answer("strategy")
+            answered = answer("strategy")
+            repeated = answer("strategy")
+            get_cache().close()
+
+        print(f"✅ Stats: {stats}")
+        if first != second or len(calls) != 5:
+            print(f"❌ Expected 5 computations, got {len(calls)}")
+            return False
+        if stats["backend"] != "sqlite" or stats["hits"] != 1:
+            print("❌ Result was not served by the configured backend")
+            return False
+        if rejected != "Error processing request" or not answered == repeated == "answer to strategy":
+            print("❌ Failed or rejected results were cached")
+            return False
+        print("✅ Failed and rejected results were recomputed, not cached")
+        return True
+    except Exception as e:
+        print(f"❌ Cached results error: {e}")
+        return False
+    finally:
+        config.CACHE_BACKEND, config.CACHE_PATH = saved
+
+def main():
+    """Run all tests"""
+    print("🚀 Shared Cache Backends - Offline Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Key Hashing Test", test_key_hashing),
+        ("SQLite Backend Test", test_sqlite_shared_across_processes),
+        ("Redis Backend Test", test_redis_backend),
+        ("Cached Results Test", test_cached_results)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        print(f"\n{'='*20} {test_name} {'='*20}")
+        try:
+            if test_func():
+                passed += 1
+                print(f"✅ {test_name} PASSED")
+            else:
+                print(f"❌ {test_name} FAILED")
+        except Exception as e:
+            print(f"❌ {test_name} FAILED with exception: {e}")
+
+    print(f"\n{'='*60}")
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,350 @@
+"""
+Test script for the offline defect analysis helpers
+"""
+import sys
+import os
+import tempfile
+
+SAMPLE_DEFECT = """
+Issue: Application response time is extremely slow (>10 seconds) when loading user dashboard
+Environment: Production web application
+Symptoms: dashboard takes 10-15 seconds to load, database queries are timing out,
+high CPU usage on application server, memory usage gradually increasing
+Error logs show: "Connection pool exhausted" and "Query timeout after 30 seconds"
+Recent changes: Added new reporting feature last week
+"""
+
+def test_defect_index_lookup():
+    """Test near-duplicate lookup in the historical defect index"""
+    print("🔍 Testing historical defect index...")
+
+    try:
+        from tools.defect_index import DefectIndex
+
+        with tempfile.TemporaryDirectory() as directory:
+            index = DefectIndex(os.path.join(directory, "defects.db"), threshold=0.6)
+            index.add(SAMPLE_DEFECT, "quick", '{"severity": "high"}')
+            index.add("Login button does nothing on Safari 16 after clicking twice", "quick",
+                      '{"severity": "medium"}')
+
+            reworded = SAMPLE_DEFECT.replace("last week", "last Tuesday, reported again by ops")
+            match = index.lookup(reworded, "quick")
+            if match is None or match.result != '{"severity": "high"}':
+                print("❌ Near-duplicate was not found")
+                return False
+            print(f"✅ Near-duplicate found with similarity {match.similarity:.2f}")
+
+            if index.lookup(reworded, "comprehensive") is not None:
+                print("❌ Analysis type filter was ignored")
+                return False
+            index.add("Checkout fails with HTTP 500 when the cart has 100 items", "quick",
+                      '{"severity": "critical"}', context="Release 2.3 on Postgres 15")
+            checkout = "Checkout fails with HTTP 500 when the cart has 100 items!"
+            if index.lookup(checkout, "quick", context="Release 2.3 on Postgres 15") is None:
+                print("❌ Near-duplicate with the same context was not found")
+                return False
+            if index.lookup(checkout, "quick", context="Release 2.4 on MySQL 8") is not None \
+                    or index.lookup(checkout, "quick", context="") is not None:
+                print("❌ Analysis made with a different context was reused")
+                return False
+            if index.lookup("Export to CSV drops unicode characters", "quick") is not None:
+                print("❌ Unrelated defect matched")
+                return False
+            index.close()
+
+        print("✅ Index lookups behave correctly")
+        return True
+    except Exception as e:
+        print(f"❌ Defect index error: {e}")
+        return False
+
+def test_bulk_triage_resume():
+    """Test that bulk triage resumes after a crash without repeating records"""
+    print("\n📦 Testing resumable bulk triage...")
+
+    try:
+        import json
+        from tools.defect_triage import BulkDefectTriage
+
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = os.path.join(directory, "defects.jsonl")
+            output_path = os.path.join(directory, "triage.jsonl")
+            with open(input_path, "w", encoding="utf-8") as handle:
+                for i in range(60):
+                    handle.write(json.dumps({"id": f"BUG-{i}", "title": f"Defect {i}"}) + "\n")
+
+            calls = []
+
+            def crashing_analyze(defect_data, context):
+                calls.append(defect_data)
+                if len(calls) == 30:
+                    raise KeyboardInterrupt("simulated crash")
+                return '{"severity": "low"}'
+
+            try:
+                BulkDefectTriage(crashing_analyze, max_concurrency=1, checkpoint_every=5) \
+                    .run(input_path, output_path)
+            except KeyboardInterrupt:
+                print("✅ Simulated crash after 29 records")
+
+            resumed = []
+            summary = BulkDefectTriage(lambda d, c: resumed.append(d) or "{}",
+                                       max_concurrency=4).run(input_path, output_path)
+
+            with open(output_path, encoding="utf-8") as handle:
+                indices = [json.loads(line)["record_index"] for line in handle]
+
+        if sorted(indices) != list(range(60)):
+            print("❌ Output does not contain every record exactly once")
+            return False
+        if len(resumed) != 31 or summary.resumed_from != 29:
+            print(f"❌ Resume re-ran {len(resumed)} records from {summary.resumed_from}")
+            return False
+        print("✅ Resumed at record 29 and finished the remaining 31")
+
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = os.path.join(directory, "defects.jsonl")
+            other_path = os.path.join(directory, "other.jsonl")
+            output_path = os.path.join(directory, "triage.jsonl")
+            for path in (input_path, other_path):
+                with open(path, "w", encoding="utf-8") as handle:
+                    for i in range(20):
+                        handle.write(json.dumps({"id": f"BUG-{i}", "title": f"Defect {i}"}) + "\n")
+
+            def flaky_analyze(defect_data, context):
+                if defect_data in ("Title: Defect 3", "Title: Defect 12"):
+                    raise TimeoutError("provider timeout")
+                return "{}"
+
+            first = BulkDefectTriage(flaky_analyze, max_concurrency=2, checkpoint_every=4) \
+                .run(input_path, output_path)
+            retried = []
+            second = BulkDefectTriage(lambda d, c: retried.append(d) or "{}",
+                                      max_concurrency=2).run(input_path, output_path)
+            other = []
+            BulkDefectTriage(lambda d, c: other.append(d) or "{}",
+                             max_concurrency=2).run(other_path, output_path)
+
+        if first.errors != 2 or sorted(retried) != ["Title: Defect 12", "Title: Defect 3"]:
+            print(f"❌ Failed records were not retried: {retried}")
+            return False
+        if second.resumed_from != 3 or len(other) != 20:
+            print(f"❌ Output of another input was treated as done: {len(other)} records run")
+            return False
+        print("✅ Failed records retried; another input's output was not reused")
+        return True
+    except Exception as e:
+        print(f"❌ Bulk triage error: {e}")
+        return False
+
+def test_log_reduction():
+    """Test that pasted logs collapse into templates and unique traces"""
+    print("\n🧹 Testing log reduction...")
+
+    try:
+        from tools.log_reducer import LogReducer
+
+        lines = []
+        for i in range(20000):
+            lines.append(f"2024-05-01 10:{i % 60:02d}:00 INFO request id={i} served in {i % 97}ms")
+            if i % 2000 == 0:
+                lines.append(f"2024-05-01 10:00:00 ERROR pool exhausted after {i} requests")
+                lines.extend([
+                    "Traceback (most recent call last):",
+                    '  File "app/db.py", line 42, in acquire',
+                    "    conn = pool.get(timeout=30)",
+                    "TimeoutError: pool exhausted",
+                ])
+        lines.append("2024-05-01 11:00:00 FATAL shutting down")
+        reduced = LogReducer(token_budget=1500).reduce("\n".join(lines))
+
+        if reduced.reduced_tokens > 1500 or reduced.original_tokens < 100 * reduced.reduced_tokens:
+            print(f"❌ Reduced {reduced.original_tokens} -> {reduced.reduced_tokens} tokens")
+            return False
+        if reduced.unique_traces != 1 or "[x10, first at line" not in reduced.text:
+            print("❌ Identical stack traces were not deduplicated")
+            return False
+        if "ERROR pool exhausted" not in reduced.text or "FATAL shutting down" not in reduced.text:
+            print("❌ Error-level lines were dropped")
+            return False
+        print(f"✅ {reduced.original_tokens} -> {reduced.reduced_tokens} tokens, "
+              f"{reduced.templates} templates")
+
+        short = "Login button does nothing on Safari"
+        if LogReducer().reduce(short).text != short:
+            print("❌ Short description was modified")
+            return False
+        report = "\n".join(f"Step {i}: open page {i} and click 'Save'" for i in range(1, 45))
+        if LogReducer(token_budget=1500).reduce(report).text != report:
+            print("❌ Multi-line report within the budget was rewritten")
+            return False
+
+        print("✅ Logs reduced within budget")
+        return True
+    except Exception as e:
+        print(f"❌ Log reduction error: {e}")
+        return False
+
+def _synthetic_labelled_defects(count, seed=0):
+    """Labelled defects whose wording carries their category and severity"""
+    import random
+    rng = random.Random(seed)
+    phrases = {
+        "functional_defects": ["wrong total calculated", "button does not submit", "validation rejects valid input"],
+        "performance_issues": ["page load takes seconds", "query timeout under load", "high cpu usage"],
+        "security_vulnerabilities": ["sql injection possible", "token not validated", "xss in comment field"],
+        "usability_problems": ["confusing error message", "label text is unclear", "hard to find settings"],
+        "compatibility_issues": ["broken on safari", "layout breaks on android", "fails on windows"],
+    }
+    severities = {"critical": "production down for all users", "high": "major feature blocked",
+                  "medium": "workaround available", "low": "cosmetic minor annoyance"}
+    modules = ["checkout", "dashboard", "login", "reports", "profile", "search"]
+    examples = []
+    for _ in range(count):
+        category = rng.choice(list(phrases))
+        severity = rng.choice(list(severities))
+        text = (f"{rng.choice(modules)} module: {rng.choice(phrases[category])}, "
+                f"{severities[severity]} (build {rng.randint(100, 999)})")
+        examples.append((text, category, severity))
+    return examples
+
+def test_local_classifier():
+    """Test that the local classifier answers confident quick analyses without the LLM"""
+    print("\n🧠 Testing local defect classifier...")
+
+    try:
+        import json
+        import time
+        from tools.defect_classifier import DefectClassifier, set_defect_classifier
+        from tools.defect_analyzer import DefectAnalyzer
+
+        train = _synthetic_labelled_defects(600)
+        held_out = _synthetic_labelled_defects(200, seed=1)
+        model = DefectClassifier(n_features=2 ** 16).fit(*map(list, zip(*train)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "classifier.npz")
+            model.save(path)
+            model = DefectClassifier.load(path)
+
+        report = model.evaluate(*map(list, zip(*held_out)), threshold=0.8)
+        if report["category_accuracy"] < 0.95 or report["confident_accuracy"] < 0.95:
+            print(f"❌ Poor held-out accuracy: {report}")
+            return False
+        print(f"✅ Held-out accuracy {report['category_accuracy']:.1%} / "
+              f"{report['severity_accuracy']:.1%}, coverage {report['coverage']:.1%}")
+
+        start = time.perf_counter()
+        for text, _, _ in held_out:
+            model.predict(text)
+        per_call = (time.perf_counter() - start) / len(held_out)
+        print(f"✅ {per_call * 1e6:.0f} µs per prediction")
+
+        set_defect_classifier(model)
+        try:
+            text, category, severity = held_out[0]
+            result = json.loads(DefectAnalyzer()._run(text, "quick", use_history=False))
+        finally:
+            set_defect_classifier(None)
+        if result.get("source") != "local_classifier" or result["severity"] != severity:
+            print(f"❌ Quick analysis was not answered locally: {result}")
+            return False
+
+        print("✅ Confident quick analysis answered locally")
+        return True
+    except Exception as e:
+        print(f"❌ Local classifier error: {e}")
+        return False
+
+def test_defect_clustering():
+    """Test that clustering surfaces the dominant recent root cause with few LLM calls"""
+    print("\n🗂️ Testing defect clustering and trends...")
+
+    try:
+        import json
+        import random
+        import re
+        from langchain_core.messages import AIMessage
+        from tools.defect_clustering import DefectClusterer
+
+        themes = {
+            "pool": "database connection pool exhausted query timeout dashboard slow",
+            "login": "login fails invalid session token expired redirect loop",
+            "safari": "layout broken on safari flexbox rendering misaligned buttons",
+            "export": "csv export drops unicode characters encoding garbled",
+        }
+        rng = random.Random(0)
+        now = 1_700_000_000
+        defects = []
+        for i in range(4000):
+            theme = rng.choice(list(themes))
+            words = themes[theme].split()
+            rng.shuffle(words)
+            days = 14 if theme == "pool" else 56
+            defects.append({"text": f"BUG-{i}: {' '.join(words[:6])} build {rng.randint(1, 999)}",
+                            "created_at": now - rng.random() * days * 86400})
+
+        calls = []
+
+        class StubLabeller:
+            def invoke(self, messages):
+                ids = re.findall(r"Cluster (\d+) \(", messages[0].content)
+                calls.append(ids)
+                labels = [{"cluster_id": int(i), "label": f"Root cause {i}"} for i in ids]
+                return AIMessage(content=json.dumps({"clusters": labels}),
+                                 response_metadata={"finish_reason": "stop"})
+
+        report = DefectClusterer(n_clusters=4, llm_factory=StubLabeller).cluster(defects, now=now)
+
+        top = report.clusters[0]
+        if "pool" not in top.top_terms or top.trend != "new":
+            print(f"❌ Dominant recent cluster not first: {top.top_terms} ({top.trend})")
+            return False
+        if len(calls) != 1 or not top.label.startswith("Root cause"):
+            print(f"❌ Expected one batched labelling call, got {len(calls)}")
+            return False
+        if "| 1 | Root cause" not in report.to_markdown():
+            print("❌ Trend report is missing the cluster table")
+            return False
+
+        print(f"✅ {report.total} defects clustered in {report.elapsed:.2f}s with 1 LLM call")
+        return True
+    except Exception as e:
+        print(f"❌ Defect clustering error: {e}")
+        return False
+
+def main():
+    """Run all tests"""
+    print("🚀 Defect Analysis Helpers - Offline Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Defect Index Test", test_defect_index_lookup),
+        ("Bulk Triage Test", test_bulk_triage_resume),
+        ("Log Reduction Test", test_log_reduction),
+        ("Local Classifier Test", test_local_classifier),
+        ("Defect Clustering Test", test_defect_clustering)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        print(f"\n{'='*20} {test_name} {'='*20}")
+        try:
+            if test_func():
+                passed += 1
+                print(f"✅ {test_name} PASSED")
+            else:
+                print(f"❌ {test_name} FAILED")
+        except Exception as e:
+            print(f"❌ {test_name} FAILED with exception: {e}")
+
+    print(f"\n{'='*60}")
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,192 @@
+"""
+Test script for document ingestion (section trees, normalization and chunking)
+"""
+import sys
+import io
+import os
+import tempfile
+import zipfile
+
+_W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+def _docx_bytes():
+    """Minimal Word document with a heading, a paragraph and a list item"""
+    document = f"""<?xml version="1.0"?><w:document {_W}><w:body>
+<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t>Reports</w:t></w:r></w:p>
+<w:p><w:r><w:t>Reports are generated</w:t></w:r><w:r><w:tab/><w:t>daily.</w:t></w:r></w:p>
+<w:p><w:pPr><w:numPr><w:ilvl w:val="0"/></w:numPr></w:pPr><w:r><w:t>Users can export reports</w:t></w:r></w:p>
+<w:p><w:pPr><w:pStyle w:val="2"/></w:pPr><w:r><w:t>Scheduling</w:t></w:r></w:p>
+<w:p><w:r><w:t>Reports run at 2am</w:t></w:r></w:p>
+</w:body></w:document>"""
+    styles = f"""<?xml version="1.0"?><w:styles {_W}>
+<w:style w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>
+<w:style w:styleId="2"><w:name w:val="标题 2"/></w:style></w:styles>"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", document)
+        archive.writestr("word/styles.xml", styles)
+    buffer.seek(0)
+    return buffer
+
+def test_document_formats():
+    """Test that each format becomes the same kind of normalized section tree"""
+    print("📄 Testing document formats...")
+
+    try:
+        from tools.document_ingest import ingest
+        from tools.requirement_diff import parse_requirements
+
+        markdown = """Product Spec
+============
+
+Intro paragraph about the product
+that wraps onto a second line.
+
+## Login
+- Users log in with   email and password
+- Account is locked after 5 failed attempts
+
+Page 3 of 10
+
+Contents
+Introduction ........ 3
+"""
+        html = """<html><head><script>var a = 1;</script></head><body>
+<nav><a href="/">Home</a></nav><h1>Orders</h1><p>Orders can be   exported.</p>
+<ul><li>Export as CSV</li><li>Export as <b>PDF</b></li></ul>
+<footer>&copy; 2024 ACME</footer></body></html>"""
+        openapi = """openapi: 3.0.0
+info: {title: Pet API, version: "1.0"}
+paths:
+  /pets/{id}:
+    get:
+      tags: [pets]
+      summary: Get a pet
+      parameters:
+        - {name: id, in: path, required: true, schema: {type: integer}}
+      responses:
+        "404": {description: Not found}
+"""
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {}
+            for name, content in [("spec.md", markdown), ("page.html", html), ("api.yaml", openapi)]:
+                paths[name] = os.path.join(directory, name)
+                with open(paths[name], "w", encoding="utf-8") as f:
+                    f.write(content)
+            documents = {name: ingest(path) for name, path in paths.items()}
+        documents["report.docx"] = ingest(_docx_bytes(), name="report.docx")
+
+        expected = {
+            "spec.md": "# Product Spec\nIntro paragraph about the product that wraps onto a second line."
+                       "\n\n## Login\n- Users log in with email and password"
+                       "\n- Account is locked after 5 failed attempts",
+            "page.html": "# Orders\nOrders can be exported.\n- Export as CSV\n- Export as PDF",
+            "api.yaml": "# Pet API 1.0\n\n## pets\n\n### GET /pets/{id} - Get a pet"
+                        "\n- Parameter id (path, integer, required)\n- Response 404: Not found",
+            "report.docx": "# Reports\nReports are generated daily.\n- Users can export reports"
+                           "\n\n## Scheduling\nReports run at 2am",
+        }
+        for name, document in documents.items():
+            if document.to_markdown() != expected[name]:
+                print(f"❌ Unexpected {name} rendering:\n{document.to_markdown()}")
+                return False
+            print(f"✅ {name} ({document.format}): {document.outline().splitlines()[0]}")
+
+        if documents["api.yaml"].spec is None:
+            print("❌ OpenAPI spec was not kept for the rule engine")
+            return False
+        items = parse_requirements(documents["spec.md"].to_markdown())
+        if [item.section for item in items][-1] != "Product Spec > Login":
+            print("❌ Section headings did not carry over into requirement items")
+            return False
+
+        return True
+    except Exception as e:
+        print(f"❌ Document format error: {e}")
+        return False
+
+def test_document_chunks():
+    """Test splitting a large document into budgeted chunks that keep heading paths"""
+    print("\n✂️ Testing document chunking...")
+
+    try:
+        from tools.document_ingest import ingest
+        from tools.log_reducer import count_tokens
+
+        sections = []
+        for chapter in range(1, 41):
+            sections.append(f"# Chapter {chapter}\n\n## Rules {chapter}")
+            sections.extend(f"- Rule {chapter}.{rule}: the system shall validate field {rule} "
+                            f"of form {chapter} before saving" for rule in range(1, 26))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "large.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(sections))
+            document = ingest(path)
+
+        chunks = document.chunks(token_budget=500)
+        largest = max(count_tokens(chunk) for chunk in chunks)
+        print(f"✅ {len(chunks)} chunks, largest ~{largest} tokens")
+        if largest > 500:
+            print("❌ A chunk exceeds the token budget")
+            return False
+        if not all(chunk.startswith("# Chapter ") and " > Rules " in chunk.splitlines()[0]
+                   for chunk in chunks):
+            print("❌ Chunks lost their heading path")
+            return False
+        rules = sum(chunk.count("\n- Rule ") for chunk in chunks)
+        if rules != 40 * 25:
+            print(f"❌ Expected every rule exactly once, got {rules}")
+            return False
+        selected = document.chunks(token_budget=500, titles=["Chapter 7"])
+        if not selected or any("Chapter 7 >" not in chunk for chunk in selected):
+            print("❌ Section selection returned other chapters")
+            return False
+        if document.chunks(token_budget=500, titles=["Appendix"]) != []:
+            print("❌ A heading that matches no section returned chunks")
+            return False
+        from tools import FunctionalTestGenerator
+        try:
+            FunctionalTestGenerator().generate_from_chunks([])
+            print("❌ Generating from no chunks did not raise")
+            return False
+        except ValueError as e:
+            print(f"✅ No matching section: {e}")
+
+        return True
+    except Exception as e:
+        print(f"❌ Chunking error: {e}")
+        return False
+
+def main():
+    """Run all tests"""
+    print("🚀 Document Ingestion - Offline Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Document Formats Test", test_document_formats),
+        ("Document Chunks Test", test_document_chunks)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        print(f"\n{'='*20} {test_name} {'='*20}")
+        try:
+            if test_func():
+                passed += 1
+                print(f"✅ {test_name} PASSED")
+            else:
+                print(f"❌ {test_name} FAILED")
+        except Exception as e:
+            print(f"❌ {test_name} FAILED with exception: {e}")
+
+    print(f"\n{'='*60}")
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
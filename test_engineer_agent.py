@@ -4,12 +4,13 @@ Main agent that coordinates and plans testing tasks using available tools
 """
 from typing import List, Dict, Any, Optional
 from langchain.agents import AgentExecutor, create_openai_tools_agent
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.memory import ConversationBufferMemory
 from langchain_core.messages import BaseMessage
 import config
+from llm import get_chat_model, select_route
 from tools import FunctionalTestGenerator, DefectAnalyzer, APITestGenerator
+from tools.artifact_store import record_artifact
 
 class TestEngineerAgent:
     """
@@ -19,12 +20,10 @@ class TestEngineerAgent:
 
     def __init__(self):
         """Initialize the Test Engineer Agent"""
-        self.llm = ChatOpenAI(
-            base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            model=config.OPENAI_MODEL,
-            temperature=0.1
-        )
+        # Tool selection and summarising tool output are cheap steps; the tools
+        # route their own generations
+        self.route = select_route("agent", "tool_selection")
+        self.llm = get_chat_model(temperature=0.1, route=self.route)
 
         # Initialize tools
         self.tools = [
@@ -49,11 +48,11 @@ class TestEngineerAgent:
             prompt=self.prompt
         )
 
-        # Create agent executor
+        # Create agent executor; it holds no conversation state, so one instance
+        # can serve many conversations (memory is applied in process_request)
         self.agent_executor = AgentExecutor(
             agent=self.agent,
             tools=self.tools,
-            memory=self.memory,
             verbose=True,
             handle_parsing_errors=True,
             max_iterations=5
@@ -98,22 +97,39 @@ Be proactive in suggesting additional testing scenarios that might be valuable.
             MessagesPlaceholder(variable_name="agent_scratchpad")
         ])
 
-    def process_request(self, user_input: str) -> str:
+    def process_request(self, user_input: str,
+                        chat_history: Optional[List[BaseMessage]] = None) -> str:
         """
         Process user request and coordinate appropriate tools
 
         Args:
             user_input: User's testing request or requirements
+            chat_history: Conversation to answer in; when given, the agent's own
+                memory is neither read nor updated (the caller keeps the
+                conversation, e.g. one per web session sharing this agent)
 
         Returns:
             Comprehensive response with testing artifacts and recommendations
         """
         try:
-            result = self.agent_executor.invoke({"input": user_input})
-            return result["output"]
+            return self.answer(user_input, chat_history)
         except Exception as e:
             return f"Error processing request: {str(e)}"
 
+    def answer(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None) -> str:
+        """
+        Same as process_request, but failures raise instead of being returned
+        as the answer (for callers that cache or store answers)
+        """
+        own_memory = chat_history is None
+        if own_memory:
+            chat_history = list(self.memory.load_memory_variables({})["chat_history"])
+        result = self.agent_executor.invoke({"input": user_input, "chat_history": chat_history})
+        if own_memory:
+            self.memory.save_context({"input": user_input}, {"output": result["output"]})
+        record_artifact("agent", result["output"], user_input, model=self.route.model)
+        return result["output"]
+
     def plan_testing_strategy(self, requirements: str, project_context: str = "") -> Dict[str, Any]:
         """
         Create a comprehensive testing strategy plan
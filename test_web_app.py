@@ -3,6 +3,28 @@
 """
 import sys
 import os
+import tempfile
+import time
+import config
+
+# 未配置OPENAI_API_KEY时回放仓库中录制的模型流量（tests/cassettes）
+if not config.OPENAI_API_KEY:
+    config.LLM_CASSETTE_MODE, config.OPENAI_API_KEY = "replay", "sk-replay"
+
+# 共享缓存使用临时数据库，多次运行之间不会互相命中
+config.CACHE_BACKEND = "sqlite"
+config.CACHE_PATH = os.path.join(tempfile.mkdtemp(), "cache.db")
+
+def _wait_for_jobs(app, timeout=30):
+    """重跑页面直到后台任务全部结束"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        labels = [expander.label for expander in app.expander]
+        if not any(label.startswith(("⏳", "🔄")) for label in labels):
+            return app
+        time.sleep(0.1)
+        app.run()
+    raise TimeoutError("后台任务未在限定时间内结束")
 
 def test_web_app_imports():
     """测试Web应用的导入"""
@@ -42,6 +64,307 @@ def test_agent_initialization():
         print(f"❌ 智能体初始化失败: {e}")
         return False
 
+def test_shared_agent_core():
+    """测试共享智能体核心：显式对话历史不读写智能体自身的记忆"""
+    print("\n🔗 测试共享智能体核心...")
+    
+    try:
+        import config
+        from langchain_core.messages import HumanMessage
+        from test_engineer_agent import TestEngineerAgent
+        
+        class RecordingExecutor:
+            def __init__(self):
+                self.inputs = []
+            
+            def invoke(self, inputs):
+                self.inputs.append(inputs)
+                return {"output": f"answer {len(self.inputs)}"}
+        
+        agent = TestEngineerAgent()
+        agent.agent_executor = RecordingExecutor()
+        previous = config.ARTIFACT_STORE_ENABLED
+        config.ARTIFACT_STORE_ENABLED = False
+        try:
+            history = [HumanMessage(content="earlier question")]
+            agent.process_request("session question", chat_history=history)
+            if agent.memory.load_memory_variables({})["chat_history"]:
+                print("❌ 会话对话写入了共享记忆")
+                return False
+            if agent.agent_executor.inputs[0]["chat_history"] != history:
+                print("❌ 会话对话未传给智能体")
+                return False
+            agent.process_request("cli question")
+            agent.process_request("follow-up")
+        finally:
+            config.ARTIFACT_STORE_ENABLED = previous
+        
+        if len(agent.agent_executor.inputs[2]["chat_history"]) != 2:
+            print("❌ 命令行模式的记忆未保留上一轮对话")
+            return False
+        print("✅ 会话对话与共享记忆相互隔离")
+        
+        class FailingExecutor:
+            def invoke(self, inputs):
+                raise RuntimeError("provider unavailable")
+        
+        agent.agent_executor = FailingExecutor()
+        if not agent.process_request("question", chat_history=[]).startswith("Error processing request"):
+            print("❌ 对话请求失败时未返回错误信息")
+            return False
+        try:
+            agent.answer("question", chat_history=[])
+            print("❌ 可缓存的请求失败时未抛出异常")
+            return False
+        except RuntimeError:
+            pass
+        print("✅ 可缓存的请求失败时抛出异常，不会缓存错误信息")
+        return True
+    except Exception as e:
+        print(f"❌ 共享智能体核心测试失败: {e}")
+        return False
+
+def test_result_caching():
+    """测试Web界面按输入参数缓存工具结果，且会话状态只保存对话"""
+    print("\n🗄️ 测试结果缓存...")
+    
+    try:
+        from streamlit.testing.v1 import AppTest
+        from tools import FunctionalTestGenerator
+        
+        calls = []
+        original = FunctionalTestGenerator._run
+        
+        def counting_run(self, requirements, *args, **kwargs):
+            calls.append(requirements)
+            return '{"test_cases": []}'
+        
+        FunctionalTestGenerator._run = counting_run
+        try:
+            app = AppTest.from_file("web_app.py", default_timeout=60).run()
+            app.sidebar.selectbox[0].select("功能测试生成").run()
+            app.text_area[0].input("- Users can log in with email and password").run()
+            _wait_for_jobs(app.button[0].click().run())
+            _wait_for_jobs(app.button[0].click().run())
+        finally:
+            FunctionalTestGenerator._run = original
+        
+        if app.exception:
+            print(f"❌ 页面异常: {app.exception}")
+            return False
+        if len(calls) != 1:
+            print(f"❌ 重复点击再次调用了工具: {len(calls)} 次")
+            return False
+        if "agent" in app.session_state:
+            print("❌ 会话状态中仍保存了智能体")
+            return False
+        print("✅ 重复点击命中缓存，会话状态只保存对话")
+        return True
+    except Exception as e:
+        print(f"❌ 结果缓存测试失败: {e}")
+        return False
+
+def test_background_jobs():
+    """测试后台任务：并行运行、流式显示部分输出，结果在切换模式后保留"""
+    print("\n⚙️ 测试后台任务...")
+    
+    try:
+        import threading
+        from langchain_core.messages import AIMessageChunk
+        from streamlit.testing.v1 import AppTest
+        from llm import complete
+        from tools import FunctionalTestGenerator
+        
+        release = threading.Event()
+        
+        class StreamingModel:
+            def stream(self, messages):
+                yield AIMessageChunk(content="partial ")
+                release.wait(10)
+                yield AIMessageChunk(content="output",
+                                     response_metadata={"finish_reason": "stop"})
+        
+        def streaming_run(self, requirements, *args, **kwargs):
+            return complete(StreamingModel(), requirements, "functional_test_generator")
+        
+        original = FunctionalTestGenerator._run
+        FunctionalTestGenerator._run = streaming_run
+        try:
+            app = AppTest.from_file("web_app.py", default_timeout=60).run()
+            app.sidebar.selectbox[0].select("功能测试生成").run()
+            for requirement in ["- Reports can be exported", "- Reports can be scheduled"]:
+                app.text_area[0].input(requirement).run()
+                app.button[0].click().run()
+            
+            deadline = time.time() + 10
+            while time.time() < deadline:
+                running = [e for e in app.expander if e.label.startswith("🔄")]
+                if len(running) == 2 and all("partial" in code.value for code in app.code):
+                    break
+                time.sleep(0.1)
+                app.run()
+            else:
+                print(f"❌ 两个任务未同时运行并显示部分输出: {[e.label for e in app.expander]}")
+                return False
+            print("✅ 两个任务并行运行，页面未阻塞并显示流式输出")
+            
+            release.set()
+            _wait_for_jobs(app)
+            app.sidebar.selectbox[0].select("缺陷分析").run()
+        finally:
+            release.set()
+            FunctionalTestGenerator._run = original
+        
+        if app.exception:
+            print(f"❌ 页面异常: {app.exception}")
+            return False
+        done = [e for e in app.expander if e.label.startswith("✅")]
+        results = [m.value for m in app.markdown if m.value == "partial output"]
+        if len(done) != 2 or len(results) != 2:
+            print(f"❌ 切换模式后任务结果丢失: {[e.label for e in app.expander]}")
+            return False
+        print("✅ 任务完成，切换模式后结果仍保留在任务面板")
+        
+        import jobs
+        published = []
+        
+        class RecordingJob(jobs.Job):
+            def __setattr__(self, name, value):
+                if name == "status" and value in jobs.FINISHED:
+                    published.append(self.finished_at)
+                super().__setattr__(name, value)
+        
+        manager = jobs.JobManager(max_workers=1, retention=0.5)
+        original_job, jobs.Job = jobs.Job, RecordingJob
+        try:
+            manager.submit("session", "test", "done", lambda: "result")._future.result()
+            manager.submit("session", "test", "failed", lambda: 1 / 0)._future.result()
+            window = manager.submit("session", "test", "window", lambda: "result")
+            window._future.result()
+            window.finished_at = None
+            time.sleep(0.6)
+            kept = manager.jobs("session")
+        finally:
+            jobs.Job = original_job
+            manager.shutdown()
+        if None in published or len(published) != 3:
+            print(f"❌ 任务在设置完成时间之前发布了最终状态: {published}")
+            return False
+        if [job.title for job in kept] != ["window"]:
+            print(f"❌ 刚完成的任务被清理: {[job.title for job in kept]}")
+            return False
+        print("✅ 完成时间先于最终状态设置，清理不会删除刚完成的任务")
+        return True
+    except Exception as e:
+        print(f"❌ 后台任务测试失败: {e}")
+        return False
+
+def test_message_store():
+    """测试共享对话正文存储：去重、压缩、会话内存统计和空闲会话淘汰"""
+    print("\n💾 测试对话正文存储...")
+    
+    try:
+        from chat_store import MessageStore
+        
+        store = MessageStore(compress_threshold=1024, idle_seconds=60)
+        suite = "\n".join(f"TC_{i:03d}: 登录用例 {i} - 输入邮箱和密码后点击登录" for i in range(200))
+        first = store.put("session-a", suite)
+        second = store.put("session-b", suite)
+        store.put("session-b", "短消息")
+        
+        stats = store.stats()
+        if first != second or stats["bodies"] != 2:
+            print("❌ 相同正文被重复保存")
+            return False
+        if stats["stored_bytes"] * 4 > stats["bytes"]:
+            print(f"❌ 大消息未被压缩: {stats}")
+            return False
+        if store.get(first) != suite:
+            print("❌ 压缩后的正文无法还原")
+            return False
+        usage = store.session_usage("session-b")
+        if usage["messages"] != 2 or usage["bytes"] != len(suite.encode("utf-8")) + len("短消息".encode("utf-8")):
+            print(f"❌ 会话内存统计错误: {usage}")
+            return False
+        print(f"✅ 两个会话共用一份正文，{stats['bytes']} 字节压缩为 {stats['stored_bytes']} 字节")
+        
+        store._seen["session-a"] -= 120
+        if store.evict_idle() != ["session-a"] or store.get(first) != suite:
+            print("❌ 淘汰空闲会话时释放了其他会话仍在使用的正文")
+            return False
+        store.release("session-b")
+        if store.stats()["bodies"] != 0:
+            print("❌ 无人引用的正文未被释放")
+            return False
+        print("✅ 空闲会话被淘汰，无人引用的正文被释放")
+        
+        from cache import MemoryBackend
+        shared = MemoryBackend()
+        worker_a, worker_b = MessageStore(cache=shared), MessageStore(cache=shared)
+        keys = [worker_a.put("session-c", "问题"), worker_a.put("session-c", suite)]
+        worker_a.release("session-c")
+        if not worker_b.restore("session-c", keys) or worker_b.get(keys[1]) != suite:
+            print("❌ 本进程缺少的正文未从共享缓存取回")
+            return False
+        if worker_b.session_usage("session-c")["messages"] != 2:
+            print("❌ 取回的正文未计入会话")
+            return False
+        if MessageStore().restore("session-c", keys):
+            print("❌ 正文已不存在时仍报告恢复成功")
+            return False
+        print("✅ 其他工作进程的会话正文从共享缓存恢复")
+        return True
+    except Exception as e:
+        print(f"❌ 对话正文存储测试失败: {e}")
+        return False
+
+def test_chat_history_paging():
+    """测试对话历史分页渲染，过长回答默认折叠"""
+    print("\n📜 测试对话历史分页...")
+    
+    try:
+        from streamlit.testing.v1 import AppTest
+        import config
+        from test_engineer_agent import TestEngineerAgent
+        
+        answer = "\n".join(f"- Step {i}: verify the login form field {i}" for i in range(200))
+        original = TestEngineerAgent.process_request
+        TestEngineerAgent.process_request = lambda self, user_input, chat_history=None: answer
+        try:
+            app = AppTest.from_file("web_app.py", default_timeout=60).run()
+            for turn in range(config.WEB_CHAT_PAGE_SIZE + 1):
+                app.text_area[0].input(f"question {turn}").run()
+                _wait_for_jobs(app.button[0].click().run())
+        finally:
+            TestEngineerAgent.process_request = original
+        
+        if app.exception:
+            print(f"❌ 页面异常: {app.exception}")
+            return False
+        questions = [m.value for m in app.markdown if m.value.startswith("**👤 用户**")]
+        if len(app.number_input) != 1 or questions != [f"**👤 用户**: question {config.WEB_CHAT_PAGE_SIZE}"]:
+            print(f"❌ 未按页渲染对话: {questions}")
+            return False
+        answers = [m.value for m in app.markdown if m.value.startswith("**🤖 AI助手**")]
+        if len(app.toggle) != 1 or len(answers[0]) > config.WEB_CHAT_COLLAPSE_CHARS + 20:
+            print("❌ 过长回答未折叠")
+            return False
+        app.toggle[0].set_value(True).run()
+        answers = [m.value for m in app.markdown if m.value.startswith("**🤖 AI助手**")]
+        if answers != [f"**🤖 AI助手**: {answer}"]:
+            print("❌ 展开后未显示完整回答")
+            return False
+        app.number_input[0].set_value(1).run()
+        questions = [m.value for m in app.markdown if m.value.startswith("**👤 用户**")]
+        if len(questions) != config.WEB_CHAT_PAGE_SIZE or not questions[0].endswith("question 0"):
+            print("❌ 翻页后显示的对话不正确")
+            return False
+        print(f"✅ {config.WEB_CHAT_PAGE_SIZE + 1} 轮对话分 2 页显示，长回答默认折叠")
+        return True
+    except Exception as e:
+        print(f"❌ 对话历史分页测试失败: {e}")
+        return False
+
 def test_web_app_structure():
     """测试Web应用文件结构"""
     print("\n📁 测试Web应用文件结构...")
@@ -76,7 +399,12 @@ def main():
     tests = [
         ("文件结构测试", test_web_app_structure),
         ("导入测试", test_web_app_imports),
-        ("智能体初始化测试", test_agent_initialization)
+        ("智能体初始化测试", test_agent_initialization),
+        ("共享智能体核心测试", test_shared_agent_core),
+        ("结果缓存测试", test_result_caching),
+        ("后台任务测试", test_background_jobs),
+        ("对话正文存储测试", test_message_store),
+        ("对话历史分页测试", test_chat_history_paging)
     ]
     
     passed = 0
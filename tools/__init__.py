@@ -4,9 +4,33 @@ Test Engineer Intelligent Assistant Tools Package
 from .functional_test_generator import FunctionalTestGenerator
 from .defect_analyzer import DefectAnalyzer
 from .api_test_generator import APITestGenerator
+from .api_rule_engine import APIRuleEngine
+from .api_test_executor import APITestExecutor
+from .mock_api_server import MockAPIServer
+from .code_repair import CodeRepairer
+from .defect_index import DefectIndex
+from .defect_triage import BulkDefectTriage
+from .log_reducer import LogReducer
+from .defect_classifier import DefectClassifier
+from .defect_clustering import DefectClusterer
+from .artifact_store import ArtifactStore
+from .traceability import TraceabilityEngine
+from .case_dedup import CaseDeduplicator
 
 __all__ = [
     "FunctionalTestGenerator",
     "DefectAnalyzer", 
-    "APITestGenerator"
+    "APITestGenerator",
+    "APIRuleEngine",
+    "APITestExecutor",
+    "MockAPIServer",
+    "CodeRepairer",
+    "DefectIndex",
+    "BulkDefectTriage",
+    "LogReducer",
+    "DefectClassifier",
+    "DefectClusterer",
+    "ArtifactStore",
+    "TraceabilityEngine",
+    "CaseDeduplicator"
 ]
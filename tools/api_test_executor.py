@@ -0,0 +1,340 @@
+"""
+Generated API Test Executor
+Materializes generated test modules into a temporary package and runs them in
+parallel against a configurable base URL or the local mock server
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+import ast
+import importlib.util
+import inspect
+import os
+import re
+import signal
+import sys
+import tempfile
+import time
+import traceback
+import xml.etree.ElementTree as ET
+import config
+from metrics import metrics
+from .api_rule_engine import APIRuleEngine
+from .mock_api_server import MockAPIServer
+
+_PACKAGE_NAME = "generated_api_tests"
+_loaded_modules: Dict[str, Any] = {}
+
+# Extra seconds the parent waits beyond a test's own timeout before giving up on its worker
+_TIMEOUT_GRACE = 5.0
+
+class TestTimeout(BaseException):
+    """Raised in a worker when a test exceeds its timeout (not caught by `except Exception`)"""
+
+@dataclass
+class TestResult:
+    """Outcome of a single generated test"""
+    module: str
+    classname: str
+    name: str
+    status: str
+    duration: float
+    message: str = ""
+    details: str = ""
+
+@dataclass
+class ExecutionReport:
+    """Aggregated results of an execution run"""
+    results: List[TestResult] = field(default_factory=list)
+    base_url: str = ""
+    wall_time: float = 0.0
+
+    def count(self, status: str) -> int:
+        """Number of results with the given status"""
+        return sum(1 for result in self.results if result.status == status)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals suitable for display"""
+        return {
+            "total": len(self.results),
+            "passed": self.count("passed"),
+            "failed": self.count("failed"),
+            "errors": self.count("error"),
+            "skipped": self.count("skipped"),
+            "wall_time": round(self.wall_time, 3),
+            "test_time": round(sum(r.duration for r in self.results), 3),
+            "base_url": self.base_url,
+        }
+
+    def to_junit_xml(self) -> str:
+        """Render the report as JUnit XML"""
+        suites = ET.Element("testsuites", name="generated_api_tests")
+        by_module: Dict[str, List[TestResult]] = {}
+        for result in self.results:
+            by_module.setdefault(result.module, []).append(result)
+
+        for module, results in by_module.items():
+            suite = ET.SubElement(suites, "testsuite", {
+                "name": module,
+                "tests": str(len(results)),
+                "failures": str(sum(r.status == "failed" for r in results)),
+                "errors": str(sum(r.status == "error" for r in results)),
+                "skipped": str(sum(r.status == "skipped" for r in results)),
+                "time": f"{sum(r.duration for r in results):.3f}",
+            })
+            for result in results:
+                case = ET.SubElement(suite, "testcase", {
+                    "classname": f"{module}.{result.classname}" if result.classname else module,
+                    "name": result.name,
+                    "time": f"{result.duration:.3f}",
+                })
+                if result.status in ("failed", "error", "skipped"):
+                    tag = {"failed": "failure", "error": "error", "skipped": "skipped"}
+                    child = ET.SubElement(case, tag[result.status], message=result.message)
+                    child.text = result.details
+        ET.indent(suites)
+        return ET.tostring(suites, encoding="unicode", xml_declaration=True)
+
+def extract_python_modules(generated: str) -> List[str]:
+    """
+    Pull runnable Python modules out of generator output
+
+    Args:
+        generated: Raw tool output (markdown with fenced code, or plain code)
+
+    Returns:
+        List of module sources, one per fenced python block
+    """
+    blocks = re.findall(r"```(?:python|py)\s*\n(.*?)```", generated, re.DOTALL)
+    if blocks:
+        return [block.strip() + "\n" for block in blocks if block.strip()]
+    return [generated.strip() + "\n"] if generated.strip() else []
+
+def _collect_tests(path: str) -> List[Tuple[str, str]]:
+    """Find (class name, test name) pairs in a module without importing it"""
+    try:
+        tree = ast.parse(open(path, encoding="utf-8").read())
+    except SyntaxError:
+        return [("", "<module>")]
+
+    items = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+            items.append(("", node.name))
+        elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) \
+                        and child.name.startswith("test"):
+                    items.append((node.name, child.name))
+    return items
+
+def _init_worker(base_url: str, auth_token: str, package_root: str):
+    """Process pool initializer: expose the target URL to generated code"""
+    os.environ["API_BASE_URL"] = base_url
+    os.environ["API_AUTH_TOKEN"] = auth_token
+    if package_root not in sys.path:
+        sys.path.insert(0, package_root)
+
+def _load_module(path: str):
+    """Import a generated module once per worker process"""
+    if path not in _loaded_modules:
+        name = f"{_PACKAGE_NAME}.{os.path.splitext(os.path.basename(path))[0]}"
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        _loaded_modules[path] = module
+    return _loaded_modules[path]
+
+def _call_hook(instance: Any, name: str, func: Any):
+    """Call a pytest-style xunit hook, with or without the method argument"""
+    hook = getattr(instance, name, None)
+    if hook is None:
+        return
+    if inspect.signature(hook).parameters:
+        hook(func)
+    else:
+        hook()
+
+def _raise_timeout(signum, frame):
+    raise TestTimeout()
+
+def _run_test_item(item: Tuple[str, str, str], timeout: float = 0.0) -> TestResult:
+    """Execute one collected test in a worker process, interrupting it after `timeout` seconds"""
+    path, classname, name = item
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    start = time.perf_counter()
+
+    def result(status: str, message: str = "", details: str = "") -> TestResult:
+        return TestResult(module_name, classname, name, status,
+                          time.perf_counter() - start, message, details)
+
+    alarm = timeout > 0 and hasattr(signal, "setitimer")
+    if alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return _execute(module_name, path, classname, name, result)
+    except TestTimeout:
+        return result("error", f"Timed out after {timeout:g}s", traceback.format_exc())
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+def _execute(module_name: str, path: str, classname: str, name: str, result) -> TestResult:
+    """Import and call one test, mapping its outcome to a result"""
+    try:
+        module = _load_module(path)
+        if classname:
+            instance = getattr(module, classname)()
+            func = getattr(instance, name)
+        else:
+            instance, func = None, getattr(module, name)
+
+        if [p for p in inspect.signature(func).parameters.values()
+                if p.default is inspect.Parameter.empty and p.kind not in
+                (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)]:
+            return result("skipped", "pytest fixtures are not supported by the executor")
+
+        _call_hook(instance, "setup_method", func)
+        try:
+            func()
+        finally:
+            _call_hook(instance, "teardown_method", func)
+        return result("passed")
+    except AssertionError as e:
+        return result("failed", str(e) or "assertion failed", traceback.format_exc())
+    except Exception as e:
+        return result("error", f"{type(e).__name__}: {e}", traceback.format_exc())
+    except BaseException as e:
+        # pytest.skip()/pytest.fail() raise BaseException subclasses
+        if type(e).__name__ == "Skipped":
+            return result("skipped", str(e))
+        if type(e).__name__ == "Failed":
+            return result("failed", str(e), traceback.format_exc())
+        raise
+
+class APITestExecutor:
+    """
+    Parallel runner for generated API tests
+    Runs each collected test in a process pool and reports per-test timing;
+    a test running longer than the timeout is interrupted and reported as an error
+    """
+
+    def __init__(self, base_url: Optional[str] = None, max_workers: Optional[int] = None,
+                 auth_token: str = "test-token", timeout: Optional[float] = None):
+        """
+        Initialize the executor
+
+        Args:
+            base_url: Target service; None starts the local mock server from the spec
+            max_workers: Process pool size (defaults to the CPU count)
+            auth_token: Token exposed to generated code via API_AUTH_TOKEN
+            timeout: Seconds per test (defaults to config.API_TEST_TIMEOUT)
+        """
+        self.base_url = base_url
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.auth_token = auth_token
+        self.timeout = config.API_TEST_TIMEOUT if timeout is None else timeout
+
+    def materialize(self, modules: List[str], directory: str) -> List[str]:
+        """
+        Write module sources into an importable package
+
+        Returns:
+            Paths of the written test modules
+        """
+        package = os.path.join(directory, _PACKAGE_NAME)
+        os.makedirs(package, exist_ok=True)
+        open(os.path.join(package, "__init__.py"), "w").close()
+
+        paths = []
+        for index, source in enumerate(modules, 1):
+            path = os.path.join(package, f"test_generated_{index:03d}.py")
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(source)
+            paths.append(path)
+        return paths
+
+    def run(self, generated: List[str], api_specification: Optional[str] = None,
+            junit_path: Optional[str] = None) -> ExecutionReport:
+        """
+        Execute generated test code
+
+        Args:
+            generated: Generator outputs (markdown or plain code)
+            api_specification: OpenAPI spec used to drive the mock server
+            junit_path: Optional path to write a JUnit XML report
+
+        Returns:
+            Execution report with per-test results
+        """
+        modules = [module for text in generated for module in extract_python_modules(text)]
+        server = None
+        base_url = self.base_url
+        if base_url is None:
+            spec = APIRuleEngine().load_spec(api_specification or "")
+            if spec is None:
+                raise ValueError("A base_url or an OpenAPI specification for the mock server is required")
+            server = MockAPIServer(spec, auth_token=self.auth_token).start()
+            base_url = server.base_url
+
+        start = time.perf_counter()
+        try:
+            with tempfile.TemporaryDirectory(prefix="api_tests_") as directory:
+                paths = self.materialize(modules, directory)
+                items = [(path, classname, name)
+                         for path in paths for classname, name in _collect_tests(path)]
+                results = self._run_items(items, base_url, directory)
+        finally:
+            if server is not None:
+                server.stop()
+
+        report = ExecutionReport(results=results, base_url=base_url,
+                                 wall_time=time.perf_counter() - start)
+        if junit_path:
+            with open(junit_path, "w", encoding="utf-8") as handle:
+                handle.write(report.to_junit_xml())
+        return report
+
+    def _run_items(self, items: List[Tuple[str, str, str]], base_url: str,
+                   directory: str) -> List[TestResult]:
+        """
+        Run collected tests in the process pool
+
+        Workers interrupt a test at the timeout themselves. A worker stuck where
+        it cannot be interrupted (e.g. in native code) is given up on: each
+        result is awaited for at most two timeouts plus a grace period (the
+        test may first wait for a busy worker), reported as an error, and the
+        pool is replaced so the remaining tests still run.
+        """
+        wait_limit = 2 * self.timeout + _TIMEOUT_GRACE if self.timeout > 0 else None
+        results: List[TestResult] = []
+        while len(results) < len(items):
+            pending = items[len(results):]
+            pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                       initargs=(base_url, self.auth_token, directory))
+            futures = [pool.submit(_run_test_item, item, self.timeout) for item in pending]
+            stuck = False
+            try:
+                for (path, classname, name), future in zip(pending, futures):
+                    try:
+                        results.append(future.result(timeout=wait_limit))
+                    except FutureTimeout:
+                        module_name = os.path.splitext(os.path.basename(path))[0]
+                        results.append(TestResult(module_name, classname, name, "error", wait_limit,
+                                                  f"Timed out after {self.timeout:g}s "
+                                                  "(worker did not respond)"))
+                        metrics.increment("api_test_executor.stuck_workers")
+                        stuck = True
+                        break
+            finally:
+                if stuck:
+                    # The executor has no public way to stop a busy worker
+                    processes = list((getattr(pool, "_processes", None) or {}).values())
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    for process in processes:
+                        process.terminate()
+                else:
+                    pool.shutdown()
+        return results
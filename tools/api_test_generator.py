@@ -4,11 +4,14 @@ Generates comprehensive API test cases based on API specifications
 """
 from typing import Dict, List, Any, Optional
 from langchain_core.tools import BaseTool
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 import json
 import config
+from llm import Route, get_chat_model, complete, output_budget, select_route, track_models
+from .api_rule_engine import APIRuleEngine
+from .code_repair import CodeRepairer, repair_markdown_code
+from .artifact_store import record_artifact
 
 class APITestInput(BaseModel):
     """Input schema for API test case generation"""
@@ -16,6 +19,8 @@ class APITestInput(BaseModel):
     test_framework: str = Field(default="requests", description="Test framework (requests/pytest/postman)")
     coverage_type: str = Field(default="comprehensive", description="Coverage type (basic/comprehensive/security)")
     output_format: str = Field(default="python", description="Output format (python/postman/curl)")
+    use_rule_engine: bool = Field(default=True, description="Derive mechanical cases locally from OpenAPI schemas")
+    repair_code: bool = Field(default=True, description="Compile-check generated Python and repair failing fragments")
 
 class APITestGenerator(BaseTool):
     """Tool for generating API test cases from specifications"""
@@ -28,19 +33,35 @@ class APITestGenerator(BaseTool):
     """
     args_schema: type = APITestInput
 
-    def _get_llm(self):
-        """Get LLM instance"""
-        return ChatOpenAI(
-            base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            model=config.OPENAI_MODEL,
-            temperature=0.3
-        )
+    def _get_llm(self, max_tokens: Optional[int] = None, route: Optional[Route] = None):
+        """Get LLM instance (on the route's model when given)"""
+        return get_chat_model(temperature=0.3, max_tokens=max_tokens, route=route)
 
     def _run(self, api_specification: str, test_framework: str = "requests",
-             coverage_type: str = "comprehensive", output_format: str = "python") -> str:
+             coverage_type: str = "comprehensive", output_format: str = "python",
+             use_rule_engine: bool = True, repair_code: bool = True) -> str:
         """Generate API test cases"""
 
+        with track_models() as models:
+            result = self._generate(api_specification, test_framework, coverage_type,
+                                    output_format, use_rule_engine, repair_code)
+        record_artifact(self.name, result, api_specification, output_format=output_format,
+                        coverage=coverage_type, model=",".join(models) or None,
+                        parameters={"test_framework": test_framework})
+        return result
+
+    def _generate(self, api_specification: str, test_framework: str, coverage_type: str,
+                  output_format: str, use_rule_engine: bool, repair_code: bool) -> str:
+        """Generate the tests with the rule engine when possible, otherwise the LLM alone"""
+
+        if use_rule_engine:
+            engine = APIRuleEngine()
+            spec = engine.load_spec(api_specification)
+            if spec is not None:
+                result = self._run_with_rule_engine(engine, spec, test_framework,
+                                                    coverage_type, output_format)
+                return self._repair(result, output_format, repair_code)
+
         prompt_template = self._get_api_test_prompt(test_framework, output_format, coverage_type)
 
         prompt = PromptTemplate(
@@ -55,9 +76,77 @@ class APITestGenerator(BaseTool):
             output_format=output_format
         )
 
-        llm = self._get_llm()
-        response = llm.invoke(formatted_prompt)
-        return response.content
+        llm = self._get_llm(max_tokens=output_budget(self.name, coverage_type),
+                            route=select_route(self.name, coverage_type, formatted_prompt))
+        result = complete(llm, formatted_prompt, self.name,
+                          expect_json=output_format == "postman")
+        return self._repair(result, output_format, repair_code)
+
+    def _repair(self, result: str, output_format: str, repair_code: bool) -> str:
+        """Compile-check Python output and repair only the failing fragments"""
+        if output_format != "python" or not repair_code:
+            return result
+        repaired, _ = repair_markdown_code(result, CodeRepairer(
+            llm_factory=lambda: self._get_llm(route=select_route("code_repair"))))
+        return repaired
+
+    def _run_with_rule_engine(self, engine: APIRuleEngine, spec: Dict[str, Any],
+                              test_framework: str, coverage_type: str,
+                              output_format: str) -> str:
+        """Derive baseline cases locally and ask the LLM only for business logic"""
+        scenarios = config.API_COVERAGE_SCENARIOS.get(coverage_type, config.API_TEST_SCENARIOS)
+        cases = engine.generate_cases(spec, scenarios)
+        baseline = engine.render(cases, output_format)
+
+        prompt = PromptTemplate(
+            template=self._get_business_logic_prompt(),
+            input_variables=["endpoint_summary", "covered_scenarios", "test_framework",
+                             "coverage_type", "output_format"]
+        )
+        formatted_prompt = prompt.format(
+            endpoint_summary=engine.summarize_spec(spec),
+            covered_scenarios="\n".join(f"- {case.description}" for case in cases),
+            test_framework=test_framework,
+            coverage_type=coverage_type,
+            output_format=output_format
+        )
+
+        llm = self._get_llm(max_tokens=output_budget(self.name, coverage_type),
+                            route=select_route(self.name, coverage_type, formatted_prompt))
+        business_logic = complete(llm, formatted_prompt, self.name,
+                                  expect_json=output_format == "postman")
+
+        language = {"python": "python", "postman": "json"}.get(output_format, "bash")
+        return (f"## Baseline Tests (derived from schema, {len(cases)} cases)\n\n"
+                f"```{language}\n{baseline}```\n\n"
+                f"## Business Logic Tests\n\n{business_logic}")
+
+    def _get_business_logic_prompt(self) -> str:
+        """Get prompt for the scenarios the rule engine cannot derive"""
+        return """
+        You are an expert API test engineer. A rule engine has already generated the mechanical
+        tests for this API (missing required fields, wrong types, boundary values, malformed
+        bodies, missing/invalid authentication). Do NOT repeat them.
+
+        Endpoints:
+        {endpoint_summary}
+
+        Already covered:
+        {covered_scenarios}
+
+        Test Framework: {test_framework}
+        Coverage Type: {coverage_type}
+        Output Format: {output_format}
+
+        Generate only business-logic test cases that require understanding the domain:
+        1. Multi-step workflows (create, read back, update, delete and verify state)
+        2. Cross-field and cross-resource consistency rules
+        3. Authorization rules between different users or roles
+        4. Idempotency, duplicate submission and concurrency behaviour
+        5. Response payload content beyond status codes
+
+        Use the same output format as requested and keep each test self-contained.
+        """
 
     def _get_api_test_prompt(self, framework: str, output_format: str, coverage_type: str) -> str:
         """Get API test generation prompt"""
@@ -105,14 +194,18 @@ class APITestGenerator(BaseTool):
             - Clear test documentation
 
             Example structure:
+            Read the service URL from the API_BASE_URL environment variable and the
+            bearer token from API_AUTH_TOKEN so the tests can run against any environment.
+
             ```python
+            import os
             import requests
             import pytest
             import json
 
             class TestAPIEndpoint:
                 def setup_method(self):
-                    self.base_url = "https://api.example.com"
+                    self.base_url = os.environ.get("API_BASE_URL", "https://api.example.com")
                     self.headers = {{"Content-Type": "application/json"}}
 
                 def test_positive_scenario(self):
@@ -0,0 +1,303 @@
+"""
+Generated Artifact Store
+Persists every generated test artifact with its metadata in SQLite and keeps
+an FTS5 index over requirements, test names and steps
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import config
+from metrics import metrics
+from .llm_output import extract_test_cases
+
+_GHERKIN_SCENARIO = re.compile(r"^\s*Scenario(?: Outline)?:\s*(.+)$", re.MULTILINE)
+_GHERKIN_STEP = re.compile(r"^\s*(?:Given|When|Then|And|But)\s+(.+)$", re.MULTILINE)
+_PYTHON_TEST = re.compile(r"^\s*(?:async\s+)?def\s+(test_\w+)", re.MULTILINE)
+_QUERY_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+@dataclass
+class Artifact:
+    """A stored generation result"""
+    artifact_id: int
+    tool: str
+    output_format: str
+    coverage: str
+    model: str
+    prompt_hash: str
+    input_text: str
+    content: str
+    created_at: float
+    parameters: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class SearchHit:
+    """A search result with a highlighted excerpt"""
+    artifact_id: int
+    tool: str
+    output_format: str
+    coverage: str
+    created_at: float
+    score: float
+    snippet: str
+
+def prompt_hash(tool: str, input_text: str, parameters: Optional[Dict[str, Any]] = None) -> str:
+    """Stable hash of a generation request (tool, parameters and input)"""
+    payload = json.dumps({"tool": tool, "parameters": parameters or {},
+                          "input": " ".join(input_text.split())}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def index_fields(content: str) -> Tuple[str, str]:
+    """
+    Test names and steps found in a generated artifact
+
+    Understands the standard JSON format, Gherkin scenarios and pytest
+    functions; anything else is only indexed through its input text.
+    """
+    names: List[str] = []
+    steps: List[str] = []
+    for case in extract_test_cases(content):
+        names.append(str(case.get("test_name") or case.get("name") or case.get("title") or ""))
+        case_steps = case.get("steps") or []
+        steps.extend(case_steps if isinstance(case_steps, list) else [case_steps])
+        if case.get("expected_result"):
+            steps.append(case["expected_result"])
+    names.extend(_GHERKIN_SCENARIO.findall(content))
+    steps.extend(_GHERKIN_STEP.findall(content))
+    names.extend(name.replace("_", " ") for name in _PYTHON_TEST.findall(content))
+    return "\n".join(n for n in names if n), "\n".join(str(s) for s in steps if s)
+
+def fts_query(text: str) -> str:
+    """Safe FTS5 query matching all words of free text (last word as a prefix)"""
+    tokens = _QUERY_TOKEN.findall(text)
+    if not tokens:
+        return ""
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+class ArtifactStore:
+    """
+    Local searchable store of generated artifacts
+    Search runs against an FTS5 index, so finding an existing suite takes
+    milliseconds regardless of how many generations are stored
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize (and create if needed) the store
+
+        Args:
+            path: SQLite database file (defaults to config.ARTIFACT_STORE_PATH)
+        """
+        self.path = path or config.ARTIFACT_STORE_PATH
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                id INTEGER PRIMARY KEY,
+                tool TEXT NOT NULL,
+                output_format TEXT NOT NULL DEFAULT '',
+                coverage TEXT NOT NULL DEFAULT '',
+                model TEXT NOT NULL DEFAULT '',
+                prompt_hash TEXT NOT NULL,
+                input_text TEXT NOT NULL,
+                content TEXT NOT NULL,
+                parameters TEXT NOT NULL DEFAULT '{}',
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_artifacts_prompt ON artifacts(prompt_hash);
+            CREATE INDEX IF NOT EXISTS idx_artifacts_tool ON artifacts(tool, created_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS artifacts_fts USING fts5(
+                requirements, test_names, steps, tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS suite_versions (
+                id INTEGER PRIMARY KEY,
+                suite_id TEXT NOT NULL,
+                requirements_text TEXT NOT NULL,
+                state TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_suite_versions ON suite_versions(suite_id, id);
+        """)
+        self._conn.commit()
+
+    def save(self, tool: str, content: str, input_text: str, output_format: str = "",
+             coverage: str = "", model: Optional[str] = None,
+             parameters: Optional[Dict[str, Any]] = None,
+             prompt_hash_value: Optional[str] = None) -> int:
+        """
+        Store a generated artifact
+
+        Args:
+            tool: Tool (or "agent") that produced the artifact
+            content: Generated output
+            input_text: Requirements/specification/request it was generated from
+            output_format: Output format (standard, gherkin, python, ...)
+            coverage: Coverage level or type
+            model: Model name (defaults to config.OPENAI_MODEL)
+            parameters: Remaining generation parameters
+            prompt_hash_value: Precomputed request hash
+
+        Returns:
+            Artifact id
+        """
+        parameters = parameters or {}
+        request = {"output_format": output_format, "coverage": coverage, **parameters}
+        digest = prompt_hash_value or prompt_hash(tool, input_text, request)
+        names, steps = index_fields(content)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO artifacts (tool, output_format, coverage, model, prompt_hash, "
+                "input_text, content, parameters, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (tool, output_format, coverage, model or config.OPENAI_MODEL, digest, input_text,
+                 content, json.dumps(parameters, ensure_ascii=False), time.time())
+            )
+            artifact_id = cursor.lastrowid
+            self._conn.execute(
+                "INSERT INTO artifacts_fts (rowid, requirements, test_names, steps) "
+                "VALUES (?, ?, ?, ?)", (artifact_id, input_text, names, steps)
+            )
+        metrics.increment("artifact_store.saved", tool=tool)
+        return artifact_id
+
+    def search(self, query: str, tool: Optional[str] = None, limit: int = 20) -> List[SearchHit]:
+        """
+        Full-text search over requirements, test names and steps
+
+        Args:
+            query: Free text; every word must match (the last one as a prefix)
+            tool: Only return artifacts of this tool
+            limit: Maximum number of hits
+
+        Returns:
+            Hits ordered by relevance (test names weigh most)
+        """
+        match = fts_query(query)
+        if not match:
+            return self.recent(tool, limit)
+        tool_clause = " AND a.tool = ?" if tool else ""
+        start = time.perf_counter()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.id, a.tool, a.output_format, a.coverage, a.created_at, "
+                "bm25(artifacts_fts, 2.0, 3.0, 1.0) AS score, "
+                "snippet(artifacts_fts, -1, '**', '**', ' … ', 16) "
+                "FROM artifacts_fts JOIN artifacts a ON a.id = artifacts_fts.rowid "
+                f"WHERE artifacts_fts MATCH ?{tool_clause} ORDER BY score LIMIT ?",
+                (match,) + ((tool,) if tool else ()) + (limit,)
+            ).fetchall()
+        metrics.observe("artifact_store.search_seconds", time.perf_counter() - start)
+        return [SearchHit(row[0], row[1], row[2], row[3], row[4], -row[5], row[6]) for row in rows]
+
+    def recent(self, tool: Optional[str] = None, limit: int = 20) -> List[SearchHit]:
+        """Most recently stored artifacts"""
+        tool_clause = "WHERE tool = ? " if tool else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, tool, output_format, coverage, created_at, substr(input_text, 1, 160) "
+                f"FROM artifacts {tool_clause}ORDER BY id DESC LIMIT ?",
+                ((tool,) if tool else ()) + (limit,)
+            ).fetchall()
+        return [SearchHit(row[0], row[1], row[2], row[3], row[4], 0.0, row[5]) for row in rows]
+
+    def get(self, artifact_id: int) -> Optional[Artifact]:
+        """Artifact by id"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, tool, output_format, coverage, model, prompt_hash, input_text, "
+                "content, created_at, parameters FROM artifacts WHERE id = ?", (artifact_id,)
+            ).fetchone()
+        return self._artifact(row) if row else None
+
+    def find_by_prompt(self, prompt_hash_value: str) -> Optional[Artifact]:
+        """Latest artifact generated from an identical request"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, tool, output_format, coverage, model, prompt_hash, input_text, "
+                "content, created_at, parameters FROM artifacts WHERE prompt_hash = ? "
+                "ORDER BY id DESC LIMIT 1", (prompt_hash_value,)
+            ).fetchone()
+        return self._artifact(row) if row else None
+
+    @staticmethod
+    def _artifact(row) -> Artifact:
+        """Build an Artifact from a row"""
+        return Artifact(row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8],
+                        json.loads(row[9] or "{}"))
+
+    def save_suite_version(self, suite_id: str, requirements_text: str,
+                           state: Dict[str, Any]) -> int:
+        """
+        Store a version of an incrementally maintained suite
+
+        Args:
+            suite_id: Name of the suite
+            requirements_text: Requirement document of this version
+            state: Requirement items, test cases and id counters of this version
+
+        Returns:
+            Version row id
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO suite_versions (suite_id, requirements_text, state, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (suite_id, requirements_text, json.dumps(state, ensure_ascii=False), time.time())
+            )
+        return cursor.lastrowid
+
+    def latest_suite_version(self, suite_id: str) -> Optional[Dict[str, Any]]:
+        """State of the latest stored version of a suite, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM suite_versions WHERE suite_id = ? ORDER BY id DESC LIMIT 1",
+                (suite_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self) -> int:
+        """Number of stored artifacts"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+_stores: Dict[str, ArtifactStore] = {}
+_stores_lock = threading.Lock()
+
+def get_artifact_store(path: Optional[str] = None) -> ArtifactStore:
+    """Process-wide shared store per database path"""
+    path = os.path.abspath(path or config.ARTIFACT_STORE_PATH)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ArtifactStore(path)
+        return _stores[path]
+
+def record_artifact(tool: str, content: str, input_text: str, output_format: str = "",
+                    coverage: str = "", model: Optional[str] = None,
+                    parameters: Optional[Dict[str, Any]] = None) -> Optional[int]:
+    """
+    Save a generation to the shared store if the store is enabled
+
+    `model` names the model(s) the generation ran on (see llm.track_models);
+    storage problems never fail the generation itself.
+    """
+    if not config.ARTIFACT_STORE_ENABLED:
+        return None
+    try:
+        return get_artifact_store().save(tool, content, input_text, output_format,
+                                         coverage, model=model, parameters=parameters)
+    except (sqlite3.Error, OSError):
+        metrics.increment("artifact_store.save_errors", tool=tool)
+        return None
@@ -0,0 +1,228 @@
+"""
+Test Case Deduplication
+Clusters near-identical test cases of merged or accumulated suites with
+MinHash/LSH and keeps the most complete case of each cluster; cases whose
+numbers or expected result differ (e.g. boundary values) are never merged
+"""
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Any, Optional, Tuple
+import re
+import time
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+import config
+from metrics import metrics
+from .minhash import MinHasher, lsh_params
+
+_STEP_PREFIX = re.compile(r"^\s*step\s*\d+\s*[:.)-]\s*", re.IGNORECASE | re.MULTILINE)
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_NUMBER = re.compile(r"(?<!\w)-?\d+(?:\.\d+)?")
+_COMPLETENESS_FIELDS = ["test_name", "description", "preconditions", "steps",
+                        "expected_result", "priority", "category"]
+
+def _normalize(text: str) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+def _case_text(case: Dict[str, Any]) -> str:
+    """Name, steps (without "Step N:" prefixes) and expected result of a test case"""
+    name = case.get("test_name") or case.get("name") or case.get("title") or ""
+    steps = case.get("steps") or []
+    steps = "\n".join(map(str, steps)) if isinstance(steps, list) else str(steps)
+    return f"{name}\n{_STEP_PREFIX.sub('', steps)}\n{case.get('expected_result') or ''}"
+
+def fingerprint(case: Dict[str, Any]) -> str:
+    """Normalized name, steps and expected result of a test case"""
+    return _normalize(_case_text(case))
+
+def exact_key(case: Dict[str, Any]) -> str:
+    """
+    Parts two cases must share exactly to be merged: their numeric literals
+    and normalized expected result (the similarity of "age at minimum (0)"
+    and "age at maximum (150)" says nothing about them testing the same thing)
+    """
+    numbers = sorted(_NUMBER.findall(_case_text(case)))
+    return f"{' '.join(numbers)}\n{_normalize(str(case.get('expected_result') or ''))}"
+
+def completeness(case: Dict[str, Any]) -> Tuple[int, int, int]:
+    """Ranking key: filled fields, number of steps, amount of text"""
+    steps = case.get("steps") or []
+    if not isinstance(steps, list):
+        steps = [steps]
+    values = [case.get(name) for name in _COMPLETENESS_FIELDS if name != "steps"]
+    return (sum(1 for value in values if value) + (1 if steps else 0), len(steps),
+            sum(len(str(value)) for value in values + steps if value))
+
+@dataclass
+class MergeGroup:
+    """Near-duplicate test cases folded into one representative"""
+    kept: str
+    merged: List[str]
+    names: List[str]
+    similarity: float
+
+@dataclass
+class DedupResult:
+    """Deduplicated suite and what was merged"""
+    test_cases: List[Dict[str, Any]]
+    groups: List[MergeGroup] = field(default_factory=list)
+    original: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def removed(self) -> int:
+        """Number of test cases folded into a representative"""
+        return self.original - len(self.test_cases)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable merge report"""
+        return {"original": self.original, "kept": len(self.test_cases),
+                "removed": self.removed, "elapsed_seconds": round(self.elapsed, 3),
+                "groups": [asdict(group) for group in self.groups]}
+
+    def to_markdown(self) -> str:
+        """Render the merge report as Markdown"""
+        lines = [
+            "# Test Case Deduplication Report",
+            "",
+            f"- Test cases: {self.original} → {len(self.test_cases)} "
+            f"({self.removed} merged into {len(self.groups)} representatives)",
+            "",
+        ]
+        if self.groups:
+            lines += ["| Kept | Merged | Similarity | Names |",
+                      "|------|--------|------------|-------|"]
+            for group in self.groups:
+                names = " / ".join(dict.fromkeys(group.names))
+                lines.append(f"| {group.kept} | {', '.join(group.merged)} | "
+                             f"{group.similarity:.2f} | {names} |")
+        return "\n".join(lines) + "\n"
+
+class CaseDeduplicator:
+    """
+    Near-duplicate test case remover
+    Identical fingerprints collapse through a dictionary; the remaining
+    distinct fingerprints are signed in batch, bucketed by LSH bands and
+    candidate pairs are verified on their signatures and exact keys, so
+    100k-case suites are handled in seconds
+    """
+
+    def __init__(self, threshold: Optional[float] = None, num_perm: int = 64,
+                 shingle_size: int = 2, seed: int = 1):
+        """
+        Initialize the deduplicator
+
+        Args:
+            threshold: Estimated Jaccard similarity at which two cases are duplicates
+                (defaults to config.TEST_DEDUP_THRESHOLD)
+            num_perm: MinHash signature length
+            shingle_size: Words per shingle
+            seed: Seed for the MinHash permutations
+        """
+        self.threshold = config.TEST_DEDUP_THRESHOLD if threshold is None else threshold
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands, self.rows = lsh_params(num_perm, self.threshold)
+
+    def clusters(self, texts: List[str],
+                 exact: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cluster distinct fingerprint texts
+
+        Args:
+            texts: Fingerprint texts
+            exact: Per text, a key that must be equal for two texts to cluster
+
+        Returns:
+            Tuple of (cluster label per text, signatures)
+        """
+        signatures = self.hasher.batch_signatures(texts)
+        keys = MinHasher.band_matrix(signatures, self.bands, self.rows)
+        first: List[np.ndarray] = []
+        second: List[np.ndarray] = []
+        for band in range(self.bands):
+            order = np.argsort(keys[:, band], kind="stable")
+            sorted_keys = keys[order, band]
+            same = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1])
+            if same.size == 0:
+                continue
+            # Each bucket member is compared with its predecessor and the bucket head
+            starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+            heads = starts[np.searchsorted(starts, same + 1, side="right") - 1]
+            first += [order[same], order[heads]]
+            second += [order[same + 1], order[same + 1]]
+
+        count = len(texts)
+        if first:
+            encoded = np.unique(np.concatenate(first) * count + np.concatenate(second))
+            pairs = np.stack([encoded // count, encoded % count], axis=1)
+            pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+            similar = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1) >= self.threshold
+            if exact is not None:
+                ids: Dict[str, int] = {}
+                exact_ids = np.array([ids.setdefault(key, len(ids)) for key in exact], dtype=np.int64)
+                similar &= exact_ids[pairs[:, 0]] == exact_ids[pairs[:, 1]]
+            pairs = pairs[similar]
+        else:
+            pairs = np.zeros((0, 2), dtype=np.int64)
+        graph = coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])),
+                           shape=(count, count))
+        _, labels = connected_components(graph, directed=False)
+        return labels, signatures
+
+    def deduplicate(self, cases: List[Dict[str, Any]]) -> DedupResult:
+        """
+        Remove near-duplicate test cases
+
+        Only cases with the same exact_key are merged. The most complete
+        case of each cluster is kept in its original
+        position (ties go to the earliest); requirement ids of merged cases
+        are added to it.
+
+        Args:
+            cases: Test case dictionaries
+
+        Returns:
+            Deduplicated cases and the merge report
+        """
+        start = time.perf_counter()
+        distinct: Dict[Tuple[str, str], int] = {}
+        text_of_case = np.fromiter((distinct.setdefault((fingerprint(case), exact_key(case)),
+                                                        len(distinct))
+                                    for case in cases), dtype=np.int64, count=len(cases))
+        texts = [text for text, _ in distinct]
+        exact = [key for _, key in distinct]
+        labels, signatures = (self.clusters(texts, exact) if texts
+                              else (np.zeros(0, np.int64), None))
+        text_ids = text_of_case.tolist()
+
+        members: Dict[int, List[int]] = {}
+        for index, label in enumerate(labels[text_of_case].tolist()):
+            members.setdefault(label, []).append(index)
+
+        keep = np.ones(len(cases), dtype=bool)
+        groups: List[MergeGroup] = []
+        for indices in members.values():
+            if len(indices) == 1:
+                continue
+            best = max(indices, key=lambda i: (completeness(cases[i]), -i))
+            others = [i for i in indices if i != best]
+            keep[others] = False
+            representative = cases[best]
+            references = [ref for i in [best] + others for ref in cases[i].get("requirement_ids") or []]
+            if references:
+                representative["requirement_ids"] = list(dict.fromkeys(references))
+            similar_texts = list({text_ids[i] for i in others} - {text_ids[best]})
+            similarity = float((signatures[similar_texts] == signatures[text_ids[best]])
+                               .mean(axis=1).min()) if similar_texts else 1.0
+            groups.append(MergeGroup(
+                kept=str(representative.get("test_id") or f"#{best + 1}"),
+                merged=[str(cases[i].get("test_id") or f"#{i + 1}") for i in others],
+                names=[str(cases[i].get("test_name") or "") for i in [best] + others],
+                similarity=round(similarity, 3),
+            ))
+
+        result = DedupResult([case for case, kept in zip(cases, keep) if kept], groups,
+                             len(cases), time.perf_counter() - start)
+        metrics.increment("case_dedup.removed", result.removed)
+        metrics.observe("case_dedup.seconds", result.elapsed)
+        return result
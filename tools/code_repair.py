@@ -0,0 +1,277 @@
+"""
+Generated Code Repair
+Compile-checks generated Python test code and repairs only the failing
+function or class instead of regenerating the whole module
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Any, Optional, Tuple
+import ast
+import builtins
+import re
+import symtable
+import textwrap
+from metrics import metrics
+
+# Undefined names that can be fixed with a well-known import, no LLM needed
+KNOWN_IMPORTS = {
+    "requests": "import requests",
+    "pytest": "import pytest",
+    "json": "import json",
+    "os": "import os",
+    "re": "import re",
+    "sys": "import sys",
+    "time": "import time",
+    "uuid": "import uuid",
+    "random": "import random",
+    "string": "import string",
+    "datetime": "import datetime",
+    "timedelta": "from datetime import timedelta",
+    "Mock": "from unittest.mock import Mock",
+    "MagicMock": "from unittest.mock import MagicMock",
+    "patch": "from unittest.mock import patch",
+    "HTTPBasicAuth": "from requests.auth import HTTPBasicAuth",
+    "jsonschema": "import jsonschema",
+}
+
+_BLOCK_START = re.compile(r"^(@|def |async def |class )")
+
+@dataclass
+class CodeIssue:
+    """A compile or lint problem found in generated code"""
+    kind: str
+    message: str
+    line: int
+    name: str = ""
+
+@dataclass
+class RepairReport:
+    """Outcome of repairing one module"""
+    issues_found: int = 0
+    auto_fixed: int = 0
+    llm_attempts: int = 0
+    fragments_repaired: int = 0
+    fragment_chars: int = 0
+    module_chars: int = 0
+    remaining: List[CodeIssue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """Whether the module compiles cleanly after repair"""
+        return not self.remaining
+
+class CodeRepairer:
+    """
+    Compile-check and targeted repair loop for generated test modules
+    Missing well-known imports are fixed locally; anything else is sent to the
+    LLM one top-level function or class at a time
+    """
+
+    def __init__(self, llm_factory: Optional[Callable[[], Any]] = None, max_attempts: int = 2):
+        """
+        Initialize the repairer
+
+        Args:
+            llm_factory: Callable returning a chat model used for fragment repair
+            max_attempts: LLM repair attempts per module before giving up
+        """
+        self.llm_factory = llm_factory
+        self.max_attempts = max_attempts
+
+    def check(self, source: str) -> List[CodeIssue]:
+        """
+        Compile and lint a module
+
+        Returns:
+            Syntax errors, or undefined names if the module parses
+        """
+        try:
+            compile(source, "<generated>", "exec")
+        except SyntaxError as e:
+            return [CodeIssue("syntax", e.msg or "invalid syntax", e.lineno or 1)]
+        return self._undefined_names(source)
+
+    def _undefined_names(self, source: str) -> List[CodeIssue]:
+        """Find global names that are referenced but never bound or imported"""
+        tree = ast.parse(source)
+        if any(isinstance(node, ast.ImportFrom) and any(a.name == "*" for a in node.names)
+               for node in ast.walk(tree)):
+            return []
+
+        table = symtable.symtable(source, "<generated>", "exec")
+        defined = {symbol.get_name() for symbol in table.get_symbols()
+                   if symbol.is_assigned() or symbol.is_imported()}
+        known = defined | set(dir(builtins)) | {"__file__", "__name__", "__doc__"}
+
+        referenced = set()
+        pending = [table]
+        while pending:
+            scope = pending.pop()
+            for symbol in scope.get_symbols():
+                if symbol.is_referenced() and symbol.is_global() \
+                        and symbol.get_name() not in known:
+                    referenced.add(symbol.get_name())
+            pending.extend(scope.get_children())
+
+        first_use: Dict[str, int] = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and node.id in referenced:
+                first_use[node.id] = min(first_use.get(node.id, node.lineno), node.lineno)
+        return [CodeIssue("undefined_name", f"undefined name '{name}'", line, name)
+                for name, line in sorted(first_use.items(), key=lambda item: item[1])]
+
+    def repair(self, source: str) -> Tuple[str, RepairReport]:
+        """
+        Repair a module until it compiles and lints cleanly
+
+        Args:
+            source: Generated module source
+
+        Returns:
+            Tuple of (repaired source, repair report)
+        """
+        report = RepairReport(module_chars=len(source))
+        metrics.increment("code_repair.modules_checked")
+        issues = self.check(source)
+        report.issues_found = len(issues)
+        if not issues:
+            metrics.increment("code_repair.modules_clean")
+            return source, report
+
+        source, fixed = self._add_known_imports(source, issues)
+        report.auto_fixed = fixed
+        issues = self.check(source)
+
+        while issues and self.llm_factory is not None and report.llm_attempts < self.max_attempts:
+            issue = issues[0]
+            start, end = self._enclosing_block(source, issue.line)
+            lines = source.splitlines()
+            fragment = "\n".join(lines[start:end])
+            report.llm_attempts += 1
+            report.fragment_chars += len(fragment)
+
+            replacement = self._repair_fragment(source, fragment, issue)
+            if replacement is None:
+                continue
+            new_lines = replacement.splitlines()
+            candidate = "\n".join(lines[:start] + new_lines + lines[end:]) + "\n"
+            candidate, added = self._add_known_imports(candidate, self.check(candidate))
+            remaining = self.check(candidate)
+            first, last = start + added, start + added + len(new_lines)
+            if not any(first < r.line <= last for r in remaining):
+                source, issues = candidate, remaining
+                report.auto_fixed += added
+                report.fragments_repaired += 1
+
+        report.remaining = issues
+        metrics.increment("code_repair.issues_found", report.issues_found)
+        metrics.increment("code_repair.auto_fixed", report.auto_fixed)
+        metrics.increment("code_repair.llm_attempts", report.llm_attempts)
+        metrics.increment("code_repair.fragments_repaired", report.fragments_repaired)
+        metrics.increment("code_repair.fragment_chars", report.fragment_chars)
+        metrics.increment("code_repair.module_chars", report.module_chars)
+        metrics.increment("code_repair.modules_repaired" if report.ok else "code_repair.modules_failed")
+        return source, report
+
+    def _add_known_imports(self, source: str, issues: List[CodeIssue]) -> Tuple[str, int]:
+        """Insert imports for undefined names with an unambiguous module"""
+        imports = sorted({KNOWN_IMPORTS[issue.name] for issue in issues
+                          if issue.kind == "undefined_name" and issue.name in KNOWN_IMPORTS})
+        if not imports:
+            return source, 0
+
+        lines = source.splitlines()
+        insert_at = 0
+        try:
+            tree = ast.parse(source)
+            if tree.body and isinstance(tree.body[0], ast.Expr) and \
+                    isinstance(getattr(tree.body[0], "value", None), ast.Constant) and \
+                    isinstance(tree.body[0].value.value, str):
+                insert_at = tree.body[0].end_lineno
+        except SyntaxError:
+            pass
+        lines[insert_at:insert_at] = imports
+        return "\n".join(lines) + "\n", len(imports)
+
+    def _enclosing_block(self, source: str, line: int) -> Tuple[int, int]:
+        """
+        Locate the top-level statement block containing a line
+
+        Works on source that does not parse, using indentation only.
+
+        Returns:
+            Zero-based [start, end) line range
+        """
+        lines = source.splitlines()
+        index = min(max(line - 1, 0), max(len(lines) - 1, 0))
+
+        start = index
+        while start > 0 and not _BLOCK_START.match(lines[start]):
+            start -= 1
+        if not _BLOCK_START.match(lines[start] if lines else ""):
+            return index, index + 1
+        while start > 0 and lines[start - 1].startswith("@"):
+            start -= 1
+
+        end = max(index, start) + 1
+        while end < len(lines):
+            text = lines[end]
+            if text.strip() and not text[0].isspace() and not text.lstrip().startswith("#"):
+                break
+            end += 1
+        while end > start + 1 and not lines[end - 1].strip():
+            end -= 1
+        return start, end
+
+    def _repair_fragment(self, source: str, fragment: str, issue: CodeIssue) -> Optional[str]:
+        """Ask the LLM to fix a single function or class"""
+        header = [line for line in source.splitlines()
+                  if line.startswith(("import ", "from "))]
+        prompt = f"""
+        You are fixing one fragment of a generated Python test module. Return ONLY the corrected
+        fragment in a single ```python code block. Keep the same function/class names, keep the
+        test intent, and do not add code outside the fragment.
+
+        Problem: {issue.message} (line {issue.line})
+
+        Module imports already available:
+        {chr(10).join(header) or "(none)"}
+
+        Fragment:
+        ```python
+        {fragment}
+        ```
+        """
+        try:
+            response = self.llm_factory().invoke(prompt)
+        except Exception:
+            return None
+        match = re.search(r"```(?:python|py)?\s*\n(.*?)```", response.content, re.DOTALL)
+        fixed = textwrap.dedent(match.group(1) if match else response.content).strip("\n")
+        return fixed.rstrip() or None
+
+def repair_markdown_code(text: str, repairer: CodeRepairer) -> Tuple[str, List[RepairReport]]:
+    """
+    Repair every fenced python block in generator output
+
+    Args:
+        text: Markdown output containing ```python blocks (or plain code)
+        repairer: Configured repairer
+
+    Returns:
+        Tuple of (text with repaired blocks spliced in, per-block reports)
+    """
+    reports: List[RepairReport] = []
+    pattern = re.compile(r"(```(?:python|py)\s*\n)(.*?)(```)", re.DOTALL)
+
+    if not pattern.search(text):
+        if not text.lstrip().startswith(("import ", "from ", "def ", "class ", "#", '"""')):
+            return text, reports
+        repaired, report = repairer.repair(text)
+        return repaired, [report]
+
+    def replace(match):
+        repaired, report = repairer.repair(match.group(2))
+        reports.append(report)
+        return match.group(1) + repaired + match.group(3)
+
+    return pattern.sub(replace, text), reports
@@ -4,17 +4,25 @@ Analyzes defects, identifies patterns, and provides recommendations
 """
 from typing import Dict, List, Any, Optional
 from langchain_core.tools import BaseTool
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 import json
 import config
+from metrics import metrics
+from cache import cache_key, get_cache
+from llm import Route, get_chat_model, complete, output_budget, select_route
+from .defect_index import DefectMatch, get_defect_index
+from .log_reducer import LogReducer
+from .defect_classifier import get_defect_classifier
 
 class DefectAnalysisInput(BaseModel):
     """Input schema for defect analysis"""
     defect_data: str = Field(description="Defect information (description, logs, code snippets)")
     analysis_type: str = Field(default="comprehensive", description="Analysis type (quick/comprehensive/root_cause)")
     context: str = Field(default="", description="Additional context (system info, environment)")
+    use_history: bool = Field(default=True, description="Reuse the analysis of a near-duplicate historical defect")
+    reduce_logs: bool = Field(default=True, description="Collapse pasted logs and stack traces to fit the prompt budget")
+    use_classifier: bool = Field(default=True, description="Answer confident quick analyses with the local classifier")
 
 class DefectAnalyzer(BaseTool):
     """Tool for analyzing test defects and providing insights"""
@@ -27,19 +35,19 @@ class DefectAnalyzer(BaseTool):
     """
     args_schema: type = DefectAnalysisInput
 
-    def _get_llm(self):
-        """Get LLM instance"""
-        return ChatOpenAI(
-            base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            model=config.OPENAI_MODEL,
-            temperature=0.2
-        )
+    def _get_llm(self, max_tokens: Optional[int] = None, route: Optional[Route] = None):
+        """Get LLM instance (on the route's model when given)"""
+        return get_chat_model(temperature=0.2, max_tokens=max_tokens, route=route)
 
     def _run(self, defect_data: str, analysis_type: str = "comprehensive",
-             context: str = "") -> str:
+             context: str = "", use_history: bool = True, reduce_logs: bool = True,
+             use_classifier: bool = True) -> str:
         """Analyze defect data and provide insights"""
 
+        if reduce_logs:
+            defect_data = LogReducer(config.DEFECT_PROMPT_TOKEN_BUDGET).reduce(defect_data).text
+            context = LogReducer(config.DEFECT_CONTEXT_TOKEN_BUDGET).reduce(context).text
+
         prompt_template = self._get_analysis_prompt(analysis_type)
 
         prompt = PromptTemplate(
@@ -52,10 +60,43 @@ class DefectAnalyzer(BaseTool):
             context=context,
             analysis_type=analysis_type
         )
-
-        llm = self._get_llm()
-        response = llm.invoke(formatted_prompt)
-        return response.content
+        route = select_route(self.name, analysis_type, formatted_prompt)
+
+        index = get_defect_index() if use_history and config.DEFECT_HISTORY_ENABLED else None
+        shared_key = None
+        if index is not None:
+            # Exact repeats analysed by any worker on the same model come from the
+            # shared cache; near-duplicates from this host's index
+            shared_key = cache_key("defect_analysis", " ".join(defect_data.lower().split()),
+                                   analysis_type, context, route.model)
+            shared = get_cache().get(shared_key)
+            if shared is not None:
+                metrics.increment("defect_analyzer.shared_cache_hits")
+                return shared
+            match = index.lookup(defect_data, analysis_type, context=context)
+            if match is not None:
+                return self._format_cached(match)
+
+        if analysis_type == "quick" and use_classifier:
+            classifier = get_defect_classifier()
+            if classifier is not None:
+                prediction = classifier.predict(f"{defect_data}\n{context}")
+                if prediction.confidence >= config.DEFECT_CLASSIFIER_THRESHOLD:
+                    metrics.increment("defect_analyzer.local_answers")
+                    return prediction.to_quick_analysis()
+                metrics.increment("defect_analyzer.deferred_to_llm")
+
+        llm = self._get_llm(max_tokens=output_budget(self.name, analysis_type), route=route)
+        result = complete(llm, formatted_prompt, self.name, expect_json=True)
+        if index is not None:
+            index.add(defect_data, analysis_type, result, context)
+            get_cache().set(shared_key, result)
+        return result
+
+    def _format_cached(self, match: DefectMatch) -> str:
+        """Present a historical analysis returned instead of a new LLM call"""
+        return (f"[Cached analysis: near-duplicate of historical defect #{match.defect_id}, "
+                f"similarity {match.similarity:.2f}]\n\n{match.result}")
 
     def _get_analysis_prompt(self, analysis_type: str) -> str:
         """Get defect analysis prompt based on type"""
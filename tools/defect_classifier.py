@@ -0,0 +1,344 @@
+"""
+Local Defect Classifier
+Hashed n-gram features with NumPy softmax models that predict the category
+and severity of a defect, so confident "quick" analyses skip the LLM
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+import json
+import os
+import re
+import threading
+import zlib
+import numpy as np
+import scipy.sparse as sp
+import config
+from .llm_output import extract_json
+
+SEVERITIES = ["critical", "high", "medium", "low"]
+# Latin words, status-code-like numbers and single CJK characters (bigrams pair them up)
+_TOKEN = re.compile(r"[a-z][a-z0-9_]+|\d{3}|[一-鿿]")
+
+# Canned guidance for locally answered quick analyses, keyed by category
+CATEGORY_GUIDANCE = {
+    "functional_defects": ("Logic or validation error in the affected feature",
+                           "Reproduce with the reported steps and check recent changes to the feature"),
+    "performance_issues": ("Resource contention, slow queries or missing caching on the hot path",
+                           "Profile the slow operation and check database and connection pool metrics"),
+    "security_vulnerabilities": ("Missing or incorrect input validation or access control",
+                                 "Restrict exposure and review authentication/authorization on the endpoint"),
+    "usability_problems": ("UI flow or messaging does not match user expectations",
+                           "Review the interaction against the UX specification"),
+    "compatibility_issues": ("Platform, browser or version specific behaviour",
+                             "Reproduce on the reported environment and compare with a supported one"),
+}
+SEVERITY_EFFORT = {"critical": "High", "high": "Medium", "medium": "Medium", "low": "Low"}
+
+@dataclass
+class Prediction:
+    """Category and severity prediction for one defect"""
+    category: str
+    category_confidence: float
+    severity: str
+    severity_confidence: float
+
+    @property
+    def confidence(self) -> float:
+        """Joint confidence used against the threshold"""
+        return min(self.category_confidence, self.severity_confidence)
+
+    def to_quick_analysis(self) -> str:
+        """Render the prediction in the "quick" analysis JSON format"""
+        likely_cause, action = CATEGORY_GUIDANCE.get(self.category, ("Unknown", "Investigate"))
+        return json.dumps({
+            "defect_category": self.category.split("_")[0],
+            "severity": self.severity,
+            "likely_cause": likely_cause,
+            "immediate_action": action,
+            "estimated_effort": SEVERITY_EFFORT.get(self.severity, "Medium"),
+            "source": "local_classifier",
+            "confidence": round(self.confidence, 3),
+        }, indent=2)
+
+def normalize_category(value: Any) -> Optional[str]:
+    """Map a category label ("performance", "Performance Issues", ...) to config categories"""
+    if not value:
+        return None
+    text = str(value).strip().lower().replace(" ", "_")
+    for category in config.DEFECT_ANALYSIS_CATEGORIES:
+        if text == category or text.split("_")[0] == category.split("_")[0]:
+            return category
+    return None
+
+def normalize_severity(value: Any) -> Optional[str]:
+    """Map a severity label to critical/high/medium/low"""
+    text = str(value or "").strip().lower()
+    aliases = {"blocker": "critical", "p1": "critical", "major": "high", "p2": "high",
+               "minor": "medium", "p3": "medium", "trivial": "low", "p4": "low"}
+    text = aliases.get(text, text)
+    return text if text in SEVERITIES else None
+
+class HashedNgramVectorizer:
+    """Signed feature hashing of word unigrams and bigrams, log-scaled and L2-normalized"""
+
+    def __init__(self, n_features: int = 2 ** 18):
+        """
+        Initialize the vectorizer
+
+        Args:
+            n_features: Size of the hashed feature space
+        """
+        self.n_features = n_features
+
+    def transform_one(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Sparse (indices, values) of one text"""
+        tokens = _TOKEN.findall(text.lower())
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not grams:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams),
+                             dtype=np.int64, count=len(grams))
+        signs = np.where(hashes & (1 << 31), -1.0, 1.0)
+        indices, inverse = np.unique(hashes % self.n_features, return_inverse=True)
+        values = np.zeros(len(indices))
+        np.add.at(values, inverse, signs)
+        values = np.sign(values) * np.log1p(np.abs(values))
+        norm = np.linalg.norm(values)
+        if norm:
+            values /= norm
+        return indices, values.astype(np.float32)
+
+    def transform(self, texts: Iterable[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """CSR-style (indptr, indices, values) of several texts"""
+        pieces = [self.transform_one(text) for text in texts]
+        indptr = np.zeros(len(pieces) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(i) for i, _ in pieces])
+        indices = np.concatenate([i for i, _ in pieces]) if pieces else np.zeros(0, np.int64)
+        values = np.concatenate([v for _, v in pieces]) if pieces else np.zeros(0, np.float32)
+        return indptr, indices, values
+
+    def tfidf(self, texts: List[str]) -> sp.csr_matrix:
+        """TF-IDF weighted, L2-normalized SciPy CSR matrix of the texts"""
+        indptr, indices, values = self.transform(texts)
+        matrix = sp.csr_matrix((np.abs(values), indices, indptr),
+                               shape=(len(texts), self.n_features))
+        document_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1.0
+        matrix = matrix @ sp.diags(idf.astype(np.float32))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sp.csr_matrix(sp.diags(1.0 / norms) @ matrix)
+
+def _scores(weights: np.ndarray, bias: np.ndarray, indptr: np.ndarray,
+            indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Linear scores of a CSR batch"""
+    rows = len(indptr) - 1
+    scores = np.tile(bias, (rows, 1))
+    if len(indices):
+        contributions = weights[indices] * values[:, None]
+        row_of = np.repeat(np.arange(rows), np.diff(indptr))
+        np.add.at(scores, row_of, contributions)
+    return scores
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    """Row-wise softmax"""
+    shifted = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+class DefectClassifier:
+    """
+    Category and severity classifier over hashed n-grams
+    Two multinomial logistic regression heads share one feature space and are
+    trained with mini-batch SGD in NumPy
+    """
+
+    def __init__(self, n_features: int = 2 ** 18, categories: Optional[List[str]] = None):
+        """
+        Initialize an untrained classifier
+
+        Args:
+            n_features: Size of the hashed feature space
+            categories: Category labels (defaults to config.DEFECT_ANALYSIS_CATEGORIES)
+        """
+        self.vectorizer = HashedNgramVectorizer(n_features)
+        self.categories = list(categories or config.DEFECT_ANALYSIS_CATEGORIES)
+        self.severities = list(SEVERITIES)
+        self._heads = {
+            "category": [np.zeros((n_features, len(self.categories)), np.float32),
+                         np.zeros(len(self.categories), np.float32)],
+            "severity": [np.zeros((n_features, len(self.severities)), np.float32),
+                         np.zeros(len(self.severities), np.float32)],
+        }
+
+    def fit(self, texts: List[str], categories: List[str], severities: List[str],
+            epochs: int = 10, learning_rate: float = 10.0, l2: float = 1e-6,
+            batch_size: int = 64, seed: int = 0) -> "DefectClassifier":
+        """
+        Train both heads
+
+        Args:
+            texts: Defect texts
+            categories: Category label per text
+            severities: Severity label per text
+            epochs: Passes over the data
+            learning_rate: SGD step size
+            l2: L2 regularization strength
+            batch_size: Mini-batch size
+            seed: Shuffle seed
+        """
+        indptr, indices, values = self.vectorizer.transform(texts)
+        targets = {
+            "category": np.array([self.categories.index(c) for c in categories]),
+            "severity": np.array([self.severities.index(s) for s in severities]),
+        }
+        rng = np.random.RandomState(seed)
+        for epoch in range(epochs):
+            order = rng.permutation(len(texts))
+            rate = learning_rate / np.sqrt(1 + epoch)
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                b_indptr, b_indices, b_values = self._take(indptr, indices, values, batch)
+                row_of = np.repeat(np.arange(len(batch)), np.diff(b_indptr))
+                for head, (weights, bias) in self._heads.items():
+                    probs = _softmax(_scores(weights, bias, b_indptr, b_indices, b_values))
+                    probs[np.arange(len(batch)), targets[head][batch]] -= 1.0
+                    probs /= len(batch)
+                    gradient = probs[row_of] * b_values[:, None]
+                    np.add.at(weights, b_indices, (-rate * gradient).astype(np.float32))
+                    if l2:
+                        weights[np.unique(b_indices)] *= (1 - rate * l2)
+                    bias -= rate * probs.sum(axis=0)
+        return self
+
+    @staticmethod
+    def _take(indptr: np.ndarray, indices: np.ndarray, values: np.ndarray,
+              rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Select rows of a CSR batch"""
+        lengths = indptr[rows + 1] - indptr[rows]
+        new_indptr = np.concatenate([[0], np.cumsum(lengths)])
+        positions = np.concatenate([np.arange(indptr[r], indptr[r + 1]) for r in rows]) \
+            if len(rows) else np.zeros(0, np.int64)
+        return new_indptr, indices[positions], values[positions]
+
+    def predict_many(self, texts: List[str]) -> List[Prediction]:
+        """Predictions for several texts"""
+        indptr, indices, values = self.vectorizer.transform(texts)
+        probs = {head: _softmax(_scores(w, b, indptr, indices, values))
+                 for head, (w, b) in self._heads.items()}
+        predictions = []
+        for row in range(len(texts)):
+            cat, sev = probs["category"][row], probs["severity"][row]
+            predictions.append(Prediction(
+                self.categories[int(cat.argmax())], float(cat.max()),
+                self.severities[int(sev.argmax())], float(sev.max())
+            ))
+        return predictions
+
+    def predict(self, text: str) -> Prediction:
+        """Prediction for one text"""
+        return self.predict_many([text])[0]
+
+    def evaluate(self, texts: List[str], categories: List[str], severities: List[str],
+                 threshold: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Accuracy overall and on the predictions confident enough to answer locally
+
+        Returns:
+            Dictionary with accuracy, coverage and confident accuracy per head
+        """
+        threshold = config.DEFECT_CLASSIFIER_THRESHOLD if threshold is None else threshold
+        predictions = self.predict_many(texts)
+        confident = np.array([p.confidence >= threshold for p in predictions])
+        category_ok = np.array([p.category == c for p, c in zip(predictions, categories)])
+        severity_ok = np.array([p.severity == s for p, s in zip(predictions, severities)])
+        both_ok = category_ok & severity_ok
+
+        def rate(mask: np.ndarray) -> float:
+            return round(float(mask.mean()), 4) if mask.size else 0.0
+
+        return {
+            "samples": len(texts),
+            "threshold": threshold,
+            "category_accuracy": rate(category_ok),
+            "severity_accuracy": rate(severity_ok),
+            "coverage": rate(confident),
+            "confident_accuracy": rate(both_ok[confident]),
+        }
+
+    def save(self, path: Optional[str] = None):
+        """Write the model to a compressed .npz file"""
+        path = path or config.DEFECT_CLASSIFIER_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        arrays = {f"{head}_{part}": array for head, pair in self._heads.items()
+                  for part, array in zip(("weights", "bias"), pair)}
+        with open(path, "wb") as handle:
+            np.savez_compressed(handle, categories=np.array(self.categories),
+                                n_features=np.array(self.vectorizer.n_features), **arrays)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "DefectClassifier":
+        """Read a model written by save()"""
+        with np.load(path or config.DEFECT_CLASSIFIER_PATH) as data:
+            model = cls(int(data["n_features"]), [str(c) for c in data["categories"]])
+            for head in model._heads:
+                model._heads[head] = [data[f"{head}_weights"], data[f"{head}_bias"]]
+        return model
+
+def load_labelled_defects(path: str) -> Iterator[Tuple[str, str, str]]:
+    """
+    Labelled (text, category, severity) examples from a CSV/JSONL export
+
+    Category is read from category/defect_category and severity from
+    severity/priority; records without both labels are skipped.
+    """
+    from .defect_triage import iter_defect_records, record_to_defect
+
+    for _, record in iter_defect_records(path):
+        lowered = {str(k).lower(): v for k, v in record.items()}
+        analysis = lowered.get("analysis")
+        if isinstance(analysis, dict):
+            lowered = {**lowered, **analysis}
+        category = normalize_category(lowered.get("category") or lowered.get("defect_category"))
+        severity = normalize_severity(lowered.get("severity") or lowered.get("priority"))
+        if category and severity:
+            text, _ = record_to_defect(
+                {k: v for k, v in record.items()
+                 if str(k).lower() not in ("category", "defect_category", "severity",
+                                           "priority", "analysis")})
+            yield text, category, severity
+
+def labelled_from_index(index) -> Iterator[Tuple[str, str, str]]:
+    """Labelled examples from quick analyses stored in the historical defect index"""
+    for defect_data, result in index.iter_analyses("quick"):
+        parsed = extract_json(result)
+        if not isinstance(parsed, dict):
+            continue
+        category = normalize_category(parsed.get("defect_category"))
+        severity = normalize_severity(parsed.get("severity"))
+        if category and severity:
+            yield defect_data, category, severity
+
+_classifier = None
+_classifier_loaded = False
+_classifier_lock = threading.Lock()
+
+def get_defect_classifier():
+    """
+    Process-wide local classifier, or None when none is trained
+
+    Anything with a predict(text) -> Prediction method can be plugged in with
+    set_defect_classifier().
+    """
+    global _classifier, _classifier_loaded
+    with _classifier_lock:
+        if not _classifier_loaded:
+            _classifier_loaded = True
+            if config.DEFECT_CLASSIFIER_ENABLED and os.path.exists(config.DEFECT_CLASSIFIER_PATH):
+                _classifier = DefectClassifier.load(config.DEFECT_CLASSIFIER_PATH)
+        return _classifier
+
+def set_defect_classifier(classifier):
+    """Replace the process-wide classifier (None disables local answers)"""
+    global _classifier, _classifier_loaded
+    with _classifier_lock:
+        _classifier, _classifier_loaded = classifier, True
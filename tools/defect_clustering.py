@@ -0,0 +1,409 @@
+"""
+Defect Clustering and Trend Reports
+Vectorizes large defect histories into sparse TF-IDF matrices, groups them
+with mini-batch k-means and labels each cluster from a few representatives
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple
+import json
+import re
+import time
+import numpy as np
+import scipy.sparse as sp
+import config
+from metrics import metrics
+from llm import complete, propagate
+from .defect_classifier import HashedNgramVectorizer
+from .llm_output import extract_json
+
+_TERM = re.compile(r"[a-z][a-z_]{2,}")
+_STOPWORDS = {
+    "the", "and", "for", "with", "when", "that", "this", "are", "was", "not", "after",
+    "from", "have", "has", "but", "all", "can", "does", "into", "user", "users", "issue",
+    "error", "defect", "bug", "steps", "expected", "actual", "title", "description",
+}
+_DATE_FIELDS = ["created_at", "created", "date", "opened", "reported_at", "timestamp"]
+
+LABEL_PROMPT = """
+You are an expert software defect analyst. Below are clusters of similar defects taken
+from a large defect history. For each cluster you get its size, distinctive terms and a
+few representative defects. Name the dominant root cause of each cluster.
+
+{clusters}
+
+Respond in JSON format:
+{{
+    "clusters": [
+        {{
+            "cluster_id": 0,
+            "label": "Short cluster name (at most 6 words)",
+            "root_cause": "One sentence describing the dominant root cause",
+            "category": "functional/performance/security/usability/compatibility"
+        }}
+    ]
+}}
+"""
+
+@dataclass
+class DefectCluster:
+    """One cluster of similar defects and its trend"""
+    cluster_id: int
+    size: int
+    label: str = ""
+    root_cause: str = ""
+    category: str = ""
+    top_terms: List[str] = field(default_factory=list)
+    representatives: List[str] = field(default_factory=list)
+    recent: int = 0
+    previous: int = 0
+    trend: str = "stable"
+    periods: Dict[str, int] = field(default_factory=dict)
+
+@dataclass
+class ClusterReport:
+    """Clusters of a defect history ordered by recent volume"""
+    clusters: List[DefectCluster]
+    total: int
+    window_days: int
+    window_end: float
+    llm_calls: int = 0
+    elapsed: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable report"""
+        return asdict(self)
+
+    def to_markdown(self) -> str:
+        """Render the trend report"""
+        end = datetime.fromtimestamp(self.window_end, timezone.utc).date()
+        lines = [
+            "# Defect Trend Report",
+            "",
+            f"- Defects: {self.total}",
+            f"- Clusters: {len(self.clusters)}",
+            f"- Window: last {self.window_days} days up to {end} vs the {self.window_days} days before",
+            f"- LLM calls for labelling: {self.llm_calls}",
+            "",
+            f"| # | Cluster | Defects | Share | Last {self.window_days}d | "
+            f"Previous {self.window_days}d | Trend |",
+            "|---|---------|---------|-------|------|----------|-------|",
+        ]
+        for rank, cluster in enumerate(self.clusters, 1):
+            share = cluster.size / self.total if self.total else 0.0
+            lines.append(f"| {rank} | {cluster.label} | {cluster.size} | {share:.1%} | "
+                         f"{cluster.recent} | {cluster.previous} | {cluster.trend} |")
+
+        lines += ["", "## Cluster Details"]
+        for rank, cluster in enumerate(self.clusters, 1):
+            lines += ["", f"### {rank}. {cluster.label} ({cluster.size} defects)"]
+            if cluster.root_cause:
+                lines.append(f"**Root cause:** {cluster.root_cause}")
+            if cluster.category:
+                lines.append(f"**Category:** {cluster.category}")
+            lines.append(f"**Distinctive terms:** {', '.join(cluster.top_terms)}")
+            if cluster.periods:
+                weekly = ", ".join(f"{week}: {count}" for week, count in cluster.periods.items())
+                lines.append(f"**Weekly counts:** {weekly}")
+            lines.append("**Representative defects:**")
+            lines += [f"- {_one_line(text, 200)}" for text in cluster.representatives]
+        return "\n".join(lines) + "\n"
+
+def _one_line(text: str, limit: int) -> str:
+    """Collapse whitespace and cut a text to a length"""
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def _flatten_strings(value: Any) -> Iterator[str]:
+    """All string leaves of a parsed JSON value"""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _flatten_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _flatten_strings(item)
+
+def _parse_timestamp(value: Any) -> Optional[float]:
+    """Epoch seconds from a number or ISO date string"""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def defects_from_index(index, since: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Clustering inputs (text, created_at) from the historical defect index"""
+    for defect in index.iter_defects(since=since):
+        parsed = extract_json(defect["result"])
+        analysis = " ".join(_flatten_strings(parsed)) if parsed is not None else ""
+        yield {"text": f"{defect['defect_data']}\n{analysis}", "created_at": defect["created_at"]}
+
+def defects_from_export(path: str) -> Iterator[Dict[str, Any]]:
+    """Clustering inputs (text, created_at) from a CSV/JSONL defect export"""
+    from .defect_triage import iter_defect_records, record_to_defect
+
+    for _, record in iter_defect_records(path):
+        lowered = {str(k).lower(): v for k, v in record.items()}
+        created_at = next((_parse_timestamp(lowered[name]) for name in _DATE_FIELDS
+                           if lowered.get(name) not in (None, "")), None)
+        text, _ = record_to_defect(record)
+        yield {"text": text, "created_at": created_at}
+
+class DefectClusterer:
+    """
+    Offline clustering of defect histories
+    Vectorization and k-means run on sparse matrices; the LLM only sees a few
+    representatives per cluster, batched several clusters per call
+    """
+
+    def __init__(self, n_clusters: Optional[int] = None, n_features: int = 2 ** 16,
+                 batch_size: int = 1024, max_iter: int = 100, samples_per_cluster: int = 5,
+                 clusters_per_call: int = 10, llm_factory: Optional[Callable[[], Any]] = None,
+                 seed: int = 0):
+        """
+        Initialize the clusterer
+
+        Args:
+            n_clusters: Number of clusters (defaults to config.DEFECT_CLUSTER_COUNT)
+            n_features: Size of the hashed feature space
+            batch_size: Mini-batch size for k-means updates
+            max_iter: Maximum mini-batch iterations
+            samples_per_cluster: Representatives sent to the LLM per cluster
+            clusters_per_call: Clusters labelled per LLM call
+            llm_factory: Callable returning a chat model; None disables LLM labels
+            seed: Random seed
+        """
+        self.n_clusters = n_clusters or config.DEFECT_CLUSTER_COUNT
+        self.vectorizer = HashedNgramVectorizer(n_features)
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+        self.samples_per_cluster = samples_per_cluster
+        self.clusters_per_call = clusters_per_call
+        self.llm_factory = llm_factory
+        self.seed = seed
+
+    def vectorize(self, texts: List[str]) -> sp.csr_matrix:
+        """TF-IDF weighted, L2-normalized sparse matrix of the texts"""
+        return self.vectorizer.tfidf(texts)
+
+    def fit(self, matrix: sp.csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Mini-batch spherical k-means
+
+        Returns:
+            (cluster assignment per row, unit-norm centroids)
+        """
+        rng = np.random.RandomState(self.seed)
+        rows = matrix.shape[0]
+        k = min(self.n_clusters, rows)
+        centroids = self._init_centroids(matrix, k, rng)
+        counts = np.zeros(k)
+
+        previous = None
+        for _ in range(self.max_iter):
+            batch = matrix[rng.choice(rows, min(self.batch_size, rows), replace=False)]
+            assignment = np.asarray((batch @ centroids.T).argmax(axis=1)).ravel()
+            for cluster in np.unique(assignment):
+                members = batch[assignment == cluster]
+                counts[cluster] += members.shape[0]
+                rate = members.shape[0] / counts[cluster]
+                centroids[cluster] = (1 - rate) * centroids[cluster] + \
+                    rate * np.asarray(members.mean(axis=0)).ravel()
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+            if previous is not None and np.abs(centroids - previous).max() < 1e-4:
+                break
+            previous = centroids.copy()
+
+        return self._assign(matrix, centroids), centroids
+
+    def _init_centroids(self, matrix: sp.csr_matrix, k: int,
+                        rng: np.random.RandomState) -> np.ndarray:
+        """k-means++ seeding on a sample of the rows"""
+        sample = matrix[rng.choice(matrix.shape[0], min(matrix.shape[0], max(20 * k, 1000)),
+                                   replace=False)]
+        chosen = [rng.randint(sample.shape[0])]
+        closest = 1.0 - (sample @ sample[chosen[0]].T).toarray().ravel()
+        for _ in range(1, k):
+            weights = np.clip(closest, 0, None)
+            total = weights.sum()
+            index = rng.choice(sample.shape[0], p=weights / total) if total > 0 \
+                else rng.randint(sample.shape[0])
+            chosen.append(index)
+            closest = np.minimum(closest, 1.0 - (sample @ sample[index].T).toarray().ravel())
+        return sample[chosen].toarray().astype(np.float64)
+
+    @staticmethod
+    def _assign(matrix: sp.csr_matrix, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        """Nearest centroid of every row, computed in chunks"""
+        return np.concatenate([
+            np.asarray((matrix[start:start + chunk] @ centroids.T).argmax(axis=1)).ravel()
+            for start in range(0, matrix.shape[0], chunk)
+        ])
+
+    def cluster(self, defects: Iterable[Dict[str, Any]], window_days: Optional[int] = None,
+                now: Optional[float] = None) -> ClusterReport:
+        """
+        Cluster a defect history and build its trend report
+
+        Args:
+            defects: Dicts with text and optional created_at (epoch seconds)
+            window_days: Length of the recent window (defaults to config.DEFECT_TREND_WINDOW_DAYS)
+            now: End of the recent window (defaults to the newest defect)
+
+        Returns:
+            Report with clusters ordered by recent volume
+        """
+        start = time.perf_counter()
+        window_days = window_days or config.DEFECT_TREND_WINDOW_DAYS
+        texts, created = [], []
+        for defect in defects:
+            texts.append(defect["text"])
+            created.append(defect.get("created_at"))
+        if not texts:
+            return ClusterReport([], 0, window_days, now or time.time())
+
+        matrix = self.vectorize(texts)
+        assignment, centroids = self.fit(matrix)
+
+        stamps = np.array([c if c is not None else np.nan for c in created], dtype=float)
+        window_end = now or (float(np.nanmax(stamps)) if not np.all(np.isnan(stamps)) else time.time())
+        window = window_days * 86400
+        recent_mask = (stamps > window_end - window) & (stamps <= window_end)
+        previous_mask = (stamps > window_end - 2 * window) & (stamps <= window_end - window)
+
+        global_terms = self._term_frequencies(texts, np.arange(len(texts)),
+                                              np.random.RandomState(self.seed))
+        clusters = []
+        for cluster_id in range(centroids.shape[0]):
+            members = np.flatnonzero(assignment == cluster_id)
+            if not len(members):
+                continue
+            closeness = (matrix[members] @ centroids[cluster_id]).ravel()
+            nearest = members[np.argsort(-closeness)[:self.samples_per_cluster]]
+            terms = self._top_terms(texts, members, global_terms)
+            cluster = DefectCluster(
+                cluster_id=cluster_id, size=len(members),
+                label=", ".join(terms[:3]) or f"Cluster {cluster_id}", top_terms=terms,
+                representatives=[texts[i] for i in nearest],
+                recent=int(recent_mask[members].sum()), previous=int(previous_mask[members].sum()),
+                periods=self._weekly_counts(stamps[members]),
+            )
+            cluster.trend = self._trend(cluster.recent, cluster.previous)
+            clusters.append(cluster)
+
+        clusters.sort(key=lambda c: (-c.recent, -c.size))
+        report = ClusterReport(clusters, len(texts), window_days, window_end)
+        if self.llm_factory is not None:
+            report.llm_calls = self.label_clusters(clusters)
+        report.elapsed = time.perf_counter() - start
+        metrics.observe("defect_clustering.seconds", report.elapsed)
+        return report
+
+    @staticmethod
+    def _term_frequencies(texts: List[str], members: np.ndarray, rng: np.random.RandomState,
+                          limit: int = 500) -> Dict[str, float]:
+        """Fraction of (sampled) documents containing each term"""
+        if len(members) > limit:
+            members = rng.choice(members, limit, replace=False)
+        counts = Counter()
+        for index in members:
+            counts.update(set(_TERM.findall(texts[index].lower())) - _STOPWORDS)
+        return {term: count / len(members) for term, count in counts.items()}
+
+    def _top_terms(self, texts: List[str], members: np.ndarray,
+                   global_terms: Dict[str, float], count: int = 8) -> List[str]:
+        """Terms frequent in the cluster but comparatively rare overall"""
+        local = self._term_frequencies(texts, members, np.random.RandomState(self.seed))
+        scored = [(share * np.log(share / max(global_terms.get(term, share), 1e-6) + 1), term)
+                  for term, share in local.items() if share >= 0.2]
+        return [term for _, term in sorted(scored, reverse=True)[:count]]
+
+    @staticmethod
+    def _weekly_counts(stamps: np.ndarray, weeks: int = 8) -> Dict[str, int]:
+        """Defects per ISO week for the most recent weeks"""
+        counts = Counter()
+        for stamp in stamps[~np.isnan(stamps)]:
+            year, week, _ = datetime.fromtimestamp(stamp, timezone.utc).isocalendar()
+            counts[f"{year}-W{week:02d}"] += 1
+        return dict(sorted(counts.items())[-weeks:])
+
+    @staticmethod
+    def _trend(recent: int, previous: int) -> str:
+        """Direction of a cluster between the previous and the recent window"""
+        if previous == 0:
+            return "new" if recent else "stable"
+        if recent >= previous * 1.25:
+            return "rising"
+        if recent <= previous * 0.8:
+            return "falling"
+        return "stable"
+
+    def label_clusters(self, clusters: List[DefectCluster]) -> int:
+        """
+        Name clusters with the LLM, several clusters per call, calls in parallel
+
+        Returns:
+            Number of LLM calls made
+        """
+        batches = [clusters[i:i + self.clusters_per_call]
+                   for i in range(0, len(clusters), self.clusters_per_call)]
+        if not batches:
+            return 0
+        with ThreadPoolExecutor(max_workers=min(len(batches), 4)) as pool:
+            results = list(pool.map(propagate(self._label_batch), batches))
+        for batch, labels in zip(batches, results):
+            for cluster in batch:
+                entry = labels.get(cluster.cluster_id)
+                if entry:
+                    cluster.label = str(entry.get("label") or cluster.label)
+                    cluster.root_cause = str(entry.get("root_cause") or "")
+                    cluster.category = str(entry.get("category") or "")
+        metrics.increment("defect_clustering.llm_calls", len(batches))
+        return len(batches)
+
+    def _label_batch(self, batch: List[DefectCluster]) -> Dict[int, Dict[str, Any]]:
+        """Labels of one batch of clusters keyed by cluster id"""
+        described = []
+        for cluster in batch:
+            examples = "\n".join(f"  - {_one_line(text, 600)}" for text in cluster.representatives)
+            described.append(f"Cluster {cluster.cluster_id} ({cluster.size} defects)\n"
+                             f"Distinctive terms: {', '.join(cluster.top_terms)}\n"
+                             f"Representative defects:\n{examples}")
+        prompt = LABEL_PROMPT.format(clusters="\n\n".join(described))
+        result = complete(self.llm_factory(), prompt, "defect_clustering", expect_json=True)
+        parsed = extract_json(result)
+        entries = parsed.get("clusters", []) if isinstance(parsed, dict) else parsed or []
+        labels = {}
+        for entry in entries:
+            if isinstance(entry, dict):
+                try:
+                    labels[int(entry.get("cluster_id"))] = entry
+                except (TypeError, ValueError):
+                    continue
+        return labels
+
+def default_llm_factory():
+    """Chat model used for cluster labels"""
+    from llm import get_chat_model, output_budget, select_route
+    return get_chat_model(temperature=0.2, max_tokens=output_budget("defect_clustering", "labels"),
+                          route=select_route("defect_clustering", "labels"))
+
+def write_report(report: ClusterReport, path: str):
+    """Write a report as Markdown (.md) or JSON (any other extension)"""
+    with open(path, "w", encoding="utf-8") as handle:
+        if path.lower().endswith(".md"):
+            handle.write(report.to_markdown())
+        else:
+            json.dump(report.to_dict(), handle, ensure_ascii=False, indent=2)
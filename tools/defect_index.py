@@ -0,0 +1,249 @@
+"""
+Historical Defect Index
+Persistent SQLite store of past defect reports and their analyses with
+MinHash/LSH near-duplicate lookup
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import config
+from metrics import metrics
+from .minhash import MinHasher, lsh_params
+
+@dataclass
+class DefectMatch:
+    """A stored defect that is a near-duplicate of a lookup query"""
+    defect_id: int
+    similarity: float
+    defect_data: str
+    analysis_type: str
+    result: str
+
+class DefectIndex:
+    """
+    Near-duplicate index of analysed defects
+    Lookups touch only the LSH buckets of the query, so latency does not grow
+    with the number of stored defects
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: Optional[float] = None,
+                 num_perm: int = 128):
+        """
+        Initialize (and create if needed) the index
+
+        Args:
+            path: SQLite database file (defaults to config.DEFECT_INDEX_PATH)
+            threshold: Minimum estimated Jaccard similarity for a match
+            num_perm: MinHash signature length
+        """
+        self.path = path or config.DEFECT_INDEX_PATH
+        self.threshold = config.DEFECT_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=3)
+        self.bands, self.rows = lsh_params(num_perm, self.threshold)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS defects (
+                id INTEGER PRIMARY KEY,
+                text_hash TEXT NOT NULL,
+                defect_data TEXT NOT NULL,
+                context TEXT NOT NULL DEFAULT '',
+                context_hash TEXT NOT NULL DEFAULT '',
+                analysis_type TEXT NOT NULL,
+                result TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_defects_hash ON defects(text_hash, analysis_type);
+            CREATE TABLE IF NOT EXISTS lsh_buckets (
+                bucket INTEGER NOT NULL,
+                defect_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON lsh_buckets(bucket);
+        """)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        """Add context hashes to indexes created before they were stored"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(defects)")]
+        if "context_hash" in columns:
+            return
+        self._conn.execute("ALTER TABLE defects ADD COLUMN context_hash TEXT NOT NULL DEFAULT ''")
+        rows = self._conn.execute("SELECT id, context FROM defects").fetchall()
+        self._conn.executemany("UPDATE defects SET context_hash = ? WHERE id = ?",
+                               [(self._text_hash(context), defect_id) for defect_id, context in rows])
+
+    @staticmethod
+    def _text_hash(text: str) -> str:
+        """Hash of the whitespace/case-normalized text"""
+        normalized = " ".join(text.lower().split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def add(self, defect_data: str, analysis_type: str, result: str, context: str = "",
+            created_at: Optional[float] = None) -> int:
+        """
+        Store an analysed defect
+
+        Returns:
+            Row id of the stored defect
+        """
+        return self.add_many([{
+            "defect_data": defect_data, "analysis_type": analysis_type,
+            "result": result, "context": context, "created_at": created_at
+        }])[0]
+
+    def add_many(self, records: List[Dict[str, Any]]) -> List[int]:
+        """Store several analysed defects in one transaction"""
+        ids = []
+        with self._lock, self._conn:
+            for record in records:
+                signature = self.hasher.signature(record["defect_data"])
+                context = record.get("context") or ""
+                cursor = self._conn.execute(
+                    "INSERT INTO defects (text_hash, defect_data, context, context_hash, "
+                    "analysis_type, result, signature, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self._text_hash(record["defect_data"]), record["defect_data"], context,
+                     self._text_hash(context), record["analysis_type"], record["result"],
+                     signature.tobytes(), record.get("created_at") or time.time())
+                )
+                defect_id = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO lsh_buckets (bucket, defect_id) VALUES (?, ?)",
+                    [(key, defect_id) for key in
+                     self.hasher.band_keys(signature, self.bands, self.rows)]
+                )
+                ids.append(defect_id)
+        return ids
+
+    def lookup(self, defect_data: str, analysis_type: Optional[str] = None,
+               threshold: Optional[float] = None,
+               context: Optional[str] = None) -> Optional[DefectMatch]:
+        """
+        Find the most similar stored defect above the threshold
+
+        Args:
+            defect_data: Defect text to look up
+            analysis_type: Only match analyses of this type (None matches any)
+            threshold: Override for the similarity threshold
+            context: Only match analyses made with this context (compared
+                whitespace/case-normalized; None matches any)
+
+        Returns:
+            Best match, or None if nothing is similar enough
+        """
+        threshold = self.threshold if threshold is None else threshold
+        start = time.perf_counter()
+        try:
+            match = self._lookup(defect_data, analysis_type, threshold, context)
+        finally:
+            metrics.observe("defect_index.lookup_seconds", time.perf_counter() - start)
+        metrics.increment("defect_index.hits" if match else "defect_index.misses")
+        return match
+
+    def _lookup(self, defect_data: str, analysis_type: Optional[str], threshold: float,
+                context: Optional[str]) -> Optional[DefectMatch]:
+        """Exact-hash check followed by LSH candidate scoring"""
+        type_clause = " AND analysis_type = ?" if analysis_type else ""
+        type_args = (analysis_type,) if analysis_type else ()
+        if context is not None:
+            type_clause += " AND context_hash = ?"
+            type_args += (self._text_hash(context),)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, defect_data, analysis_type, result FROM defects "
+                f"WHERE text_hash = ?{type_clause} ORDER BY id DESC LIMIT 1",
+                (self._text_hash(defect_data),) + type_args
+            ).fetchone()
+        if row:
+            return DefectMatch(row[0], 1.0, row[1], row[2], row[3])
+
+        signature = self.hasher.signature(defect_data)
+        keys = self.hasher.band_keys(signature, self.bands, self.rows)
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, defect_data, analysis_type, result, signature FROM defects "
+                f"WHERE id IN (SELECT DISTINCT defect_id FROM lsh_buckets "
+                f"WHERE bucket IN ({placeholders})){type_clause} LIMIT 500",
+                tuple(keys) + type_args
+            ).fetchall()
+        if not rows:
+            return None
+
+        signatures = np.frombuffer(b"".join(r[4] for r in rows), dtype=np.uint32)
+        scores = (signatures.reshape(len(rows), -1) == signature).mean(axis=1)
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        row = rows[best]
+        return DefectMatch(row[0], float(scores[best]), row[1], row[2], row[3])
+
+    def iter_defects(self, analysis_type: Optional[str] = None, since: Optional[float] = None,
+                     batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream stored defects in insertion order
+
+        Args:
+            analysis_type: Only yield analyses of this type (None yields all)
+            since: Only yield defects created at or after this timestamp
+            batch_size: Rows fetched per query
+
+        Yields:
+            Dicts with id, defect_data, context, analysis_type, result and created_at
+        """
+        clauses, args = "", ()
+        if analysis_type:
+            clauses, args = clauses + " AND analysis_type = ?", args + (analysis_type,)
+        if since is not None:
+            clauses, args = clauses + " AND created_at >= ?", args + (since,)
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, defect_data, context, analysis_type, result, created_at "
+                    f"FROM defects WHERE id > ?{clauses} ORDER BY id LIMIT ?",
+                    (last_id,) + args + (batch_size,)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield {"id": row[0], "defect_data": row[1], "context": row[2],
+                       "analysis_type": row[3], "result": row[4], "created_at": row[5]}
+            last_id = rows[-1][0]
+
+    def iter_analyses(self, analysis_type: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """Stream stored (defect_data, result) pairs in insertion order"""
+        for defect in self.iter_defects(analysis_type):
+            yield defect["defect_data"], defect["result"]
+
+    def count(self) -> int:
+        """Number of stored defects"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM defects").fetchone()[0]
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+_indexes: Dict[str, DefectIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_defect_index(path: Optional[str] = None) -> DefectIndex:
+    """Process-wide shared index per database path"""
+    path = os.path.abspath(path or config.DEFECT_INDEX_PATH)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = DefectIndex(path)
+        return _indexes[path]
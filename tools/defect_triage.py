@@ -0,0 +1,275 @@
+"""
+Bulk Defect Triage Pipeline
+Streams defects from CSV/JSONL exports, runs quick analyses with bounded
+concurrency and writes results incrementally with resumable checkpoints
+"""
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Any, Optional, Set, Tuple
+import csv
+import json
+import os
+import sys
+import time
+import config
+from metrics import metrics
+from llm import propagate, scheduling
+from .llm_output import extract_json
+
+# Fields joined (in this order) into defect_data when a record has no defect_data column
+DEFAULT_TEXT_FIELDS = ["title", "summary", "description", "steps", "expected", "actual",
+                       "logs", "error", "environment"]
+DEFAULT_ID_FIELDS = ["id", "key", "issue_key", "defect_id", "bug_id"]
+
+@dataclass
+class TriageSummary:
+    """Outcome of a triage run"""
+    processed: int = 0
+    skipped: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    resumed_from: int = 0
+
+def iter_defect_records(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Stream records from a CSV or JSONL export without loading the file
+
+    Args:
+        path: .csv, .jsonl or .ndjson file
+
+    Yields:
+        (record index, record) pairs
+    """
+    if path.lower().endswith(".csv"):
+        csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+        with open(path, newline="", encoding="utf-8-sig") as handle:
+            for index, row in enumerate(csv.DictReader(handle)):
+                yield index, row
+        return
+
+    with open(path, encoding="utf-8") as handle:
+        index = 0
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            yield index, json.loads(line)
+            index += 1
+
+def record_to_defect(record: Dict[str, Any],
+                     text_fields: Optional[List[str]] = None) -> Tuple[str, str]:
+    """
+    Build (defect_data, context) from an exported record
+
+    Uses the defect_data/context columns when present, otherwise joins the
+    usual tracker fields as "Field: value" lines.
+    """
+    if record.get("defect_data"):
+        return str(record["defect_data"]), str(record.get("context") or "")
+
+    lowered = {str(key).lower(): value for key, value in record.items()}
+    fields = text_fields or DEFAULT_TEXT_FIELDS
+    lines = [f"{name.title()}: {lowered[name]}" for name in fields
+             if lowered.get(name) not in (None, "")]
+    if not lines:
+        lines = [f"{key}: {value}" for key, value in record.items() if value not in (None, "")]
+    return "\n".join(lines), str(record.get("context") or "")
+
+def record_id(record: Dict[str, Any]) -> Optional[str]:
+    """Tracker identifier of a record, if it has one"""
+    lowered = {str(key).lower(): value for key, value in record.items()}
+    for name in DEFAULT_ID_FIELDS:
+        if lowered.get(name) not in (None, ""):
+            return str(lowered[name])
+    return None
+
+class BulkDefectTriage:
+    """
+    Resumable bulk triage over large defect exports
+    At most max_concurrency analyses are in flight and only a bounded window of
+    records is held in memory
+    """
+
+    def __init__(self, analyze: Optional[Callable[[str, str], str]] = None,
+                 max_concurrency: Optional[int] = None, checkpoint_every: int = 25,
+                 text_fields: Optional[List[str]] = None):
+        """
+        Initialize the pipeline
+
+        Args:
+            analyze: Callable(defect_data, context) -> analysis text; defaults to a
+                quick DefectAnalyzer analysis
+            max_concurrency: Concurrent analyses (defaults to config.TRIAGE_CONCURRENCY)
+            checkpoint_every: Completed records between checkpoint writes
+            text_fields: Record fields joined into defect_data
+        """
+        if analyze is None:
+            from .defect_analyzer import DefectAnalyzer
+            analyzer = DefectAnalyzer()
+            analyze = lambda defect_data, context: analyzer._run(
+                defect_data=defect_data, analysis_type="quick", context=context)
+        self.analyze = analyze
+        self.max_concurrency = max_concurrency or config.TRIAGE_CONCURRENCY
+        self.checkpoint_every = checkpoint_every
+        self.text_fields = text_fields
+
+    def run(self, input_path: str, output_path: str, checkpoint_path: Optional[str] = None,
+            progress: Optional[Callable[[TriageSummary], None]] = None) -> TriageSummary:
+        """
+        Triage every record of an export, resuming a previous run if possible
+
+        A run resumes only from a checkpoint of the same input; records whose
+        analysis failed are written with status "error" and retried by the next run.
+
+        Args:
+            input_path: CSV/JSONL export
+            output_path: JSONL file results are appended to
+            checkpoint_path: Checkpoint file (defaults to output_path + ".checkpoint")
+            progress: Optional callback invoked after each checkpoint
+
+        Returns:
+            Run summary
+        """
+        checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+        watermark, done = self._resume_state(input_path, output_path, checkpoint_path)
+        summary = TriageSummary(resumed_from=watermark)
+        start = time.perf_counter()
+        # Ties the output lines written before the first checkpoint to this input
+        self._write_checkpoint(checkpoint_path, input_path, watermark, summary)
+
+        pending: Dict[Future, int] = {}
+        finished: Set[int] = set(done)
+        since_checkpoint = 0
+
+        # Bulk triage runs in the batch class so it only soaks up spare LLM capacity
+        with scheduling(priority="batch"):
+            triage_one = propagate(self._triage_one)
+        with open(output_path, "a", encoding="utf-8") as output, \
+                ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+
+            def drain():
+                nonlocal watermark, since_checkpoint
+                completed, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in completed:
+                    index = pending.pop(future)
+                    line = future.result()
+                    output.write(json.dumps(line, ensure_ascii=False) + "\n")
+                    summary.processed += 1
+                    if line["status"] == "error":
+                        # Failed records hold the watermark so a resumed run retries them
+                        summary.errors += 1
+                    else:
+                        finished.add(index)
+                    since_checkpoint += 1
+                while watermark in finished:
+                    finished.discard(watermark)
+                    watermark += 1
+                if since_checkpoint >= self.checkpoint_every:
+                    output.flush()
+                    self._write_checkpoint(checkpoint_path, input_path, watermark, summary)
+                    since_checkpoint = 0
+                    if progress:
+                        progress(summary)
+
+            for index, record in iter_defect_records(input_path):
+                if index < watermark or index in done:
+                    summary.skipped += 1
+                    continue
+                while len(pending) >= self.max_concurrency:
+                    drain()
+                pending[pool.submit(triage_one, index, record)] = index
+
+            while pending:
+                drain()
+
+            output.flush()
+            self._write_checkpoint(checkpoint_path, input_path, watermark, summary)
+
+        summary.elapsed = time.perf_counter() - start
+        if progress:
+            progress(summary)
+        return summary
+
+    def _triage_one(self, index: int, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Analyse one record and build its output line"""
+        defect_data, context = record_to_defect(record, self.text_fields)
+        line: Dict[str, Any] = {"record_index": index, "record_id": record_id(record)}
+        start = time.perf_counter()
+        try:
+            result = self.analyze(defect_data, context)
+            parsed = extract_json(result)
+            line.update(status="ok", analysis=parsed if parsed is not None else result)
+            metrics.increment("defect_triage.records", status="ok")
+        except Exception as e:
+            line.update(status="error", error=f"{type(e).__name__}: {e}")
+            metrics.increment("defect_triage.records", status="error")
+        metrics.observe("defect_triage.record_seconds", time.perf_counter() - start)
+        return line
+
+    def _resume_state(self, input_path: str, output_path: str,
+                      checkpoint_path: str) -> Tuple[int, Set[int]]:
+        """
+        Recover the contiguous watermark and completed indices of a previous run
+
+        Records already written past the checkpoint (the run crashed before the
+        next checkpoint) are recovered from the output file when the checkpoint
+        belongs to the same input; failed records are not counted as completed.
+        A partially written last line is truncated.
+        """
+        watermark = 0
+        same_input = False
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding="utf-8") as handle:
+                state = json.load(handle)
+            if os.path.abspath(state.get("input_path", "")) == os.path.abspath(input_path):
+                watermark = int(state.get("watermark", 0))
+                same_input = True
+
+        done: Set[int] = set()
+        if not os.path.exists(output_path):
+            return watermark, done
+
+        with open(output_path, "rb+") as handle:
+            end = position = handle.seek(0, os.SEEK_END)
+            keep = 0
+            while position > 0:
+                step = min(65536, position)
+                position -= step
+                handle.seek(position)
+                newline = handle.read(step).rfind(b"\n")
+                if newline != -1:
+                    keep = position + newline + 1
+                    break
+            if keep != end:
+                handle.truncate(keep)
+        if not same_input:
+            return watermark, done
+
+        with open(output_path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    written = json.loads(line)
+                    index = written["record_index"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if index >= watermark and written.get("status") != "error":
+                    done.add(index)
+        while watermark in done:
+            done.discard(watermark)
+            watermark += 1
+        return watermark, done
+
+    def _write_checkpoint(self, checkpoint_path: str, input_path: str, watermark: int,
+                          summary: TriageSummary):
+        """Atomically persist progress"""
+        state = {
+            "input_path": os.path.abspath(input_path),
+            "watermark": watermark,
+            "processed": summary.processed,
+            "errors": summary.errors,
+            "updated_at": time.time(),
+        }
+        temporary = checkpoint_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump(state, handle)
+        os.replace(temporary, checkpoint_path)
@@ -0,0 +1,558 @@
+"""
+Document Ingestion
+Streams Markdown/text, HTML, DOCX, PDF and OpenAPI files into a normalized
+section tree and splits it into token-budgeted chunks for the tools
+"""
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import io
+import json
+import mmap
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+import config
+from metrics import metrics
+from .log_reducer import count_tokens
+
+try:
+    import yaml
+except ImportError:  # YAML specs are optional, JSON always works
+    yaml = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF ingestion is optional
+    PdfReader = None
+
+HEADING, TEXT, ITEM = "heading", "text", "item"
+FORMATS = ["markdown", "html", "docx", "pdf", "openapi"]
+
+_EXTENSIONS = {
+    ".md": "markdown", ".markdown": "markdown", ".txt": "markdown", ".rst": "markdown",
+    ".html": "html", ".htm": "html", ".docx": "docx", ".pdf": "pdf",
+    ".json": "openapi", ".yaml": "openapi", ".yml": "openapi",
+}
+_INVISIBLE = re.compile(r"[\u00ad\u200b-\u200d\u2060\ufeff]")
+_BOILERPLATE = [
+    re.compile(r"^(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?$", re.I),
+    re.compile(r"^第\s*\d+\s*页(?:\s*[/，,]?\s*共\s*\d+\s*页)?$"),
+    re.compile(r"^.{1,120}?(?:\s?\.){4,}\s*\d+$"),
+    re.compile(r"^(?:©|\(c\)|copyright\b|all rights reserved)", re.I),
+    re.compile(r"^(?:table of contents|contents|目\s*录)$", re.I),
+]
+_MD_HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$")
+_MD_SETEXT = re.compile(r"^\s{0,3}(=+|-+)\s*$")
+_BULLET = re.compile(r"^\s*(?:[-*+•▪◦●]|\d+[.)]|[a-zA-Z][.)]|\(\w{1,3}\))\s+(.+)$")
+_NUMBERED_HEADING = re.compile(
+    r"^(?:(\d+(?:\.\d+){0,5})\.?|第[一二三四五六七八九十\d]+[章节]|[Cc]hapter \d+|[Ss]ection \d+)\s+"
+    r"([A-Z\u4e00-\u9fff].{0,100})$")
+_SENTENCE_END = re.compile(r"[.:;!?。：；！？]$")
+_DIGITS = re.compile(r"\d+")
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+Block = Tuple[str, int, str]
+
+def normalize_line(text: str) -> str:
+    """Whitespace-normalized line, or "" for boilerplate (page numbers, TOC entries, ...)"""
+    text = " ".join(_INVISIBLE.sub("", text).split())
+    if any(pattern.match(text) for pattern in _BOILERPLATE):
+        return ""
+    return text
+
+@dataclass
+class DocumentSection:
+    """A heading and the text and list items directly below it"""
+    title: str
+    level: int
+    lines: List[str] = field(default_factory=list)
+    children: List["DocumentSection"] = field(default_factory=list)
+
+    def walk(self, path: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], "DocumentSection"]]:
+        """Depth-first (heading path, section) pairs, this section included"""
+        path = path + (self.title,) if self.title else path
+        yield path, self
+        for child in self.children:
+            yield from child.walk(path)
+
+    def to_markdown(self, depth: int = 1) -> str:
+        """Markdown rendering of the section and its subsections"""
+        parts = []
+        if self.title:
+            parts.append(f"{'#' * min(depth, 6)} {self.title}")
+        parts.extend(self.lines)
+        text = "\n".join(parts)
+        children = [child.to_markdown(depth + 1 if self.title else depth)
+                    for child in self.children]
+        return "\n\n".join(part for part in [text] + children if part)
+
+@dataclass
+class Document:
+    """An ingested document as a section tree"""
+    source: str
+    format: str
+    root: DocumentSection
+    spec: Optional[Dict] = None
+
+    def sections(self) -> Iterator[Tuple[Tuple[str, ...], DocumentSection]]:
+        """All sections with their heading paths (the untitled root first)"""
+        return self.root.walk()
+
+    def find(self, title: str) -> List[DocumentSection]:
+        """Sections whose heading contains the given text (case-insensitive)"""
+        wanted = title.lower()
+        return [section for _, section in self.sections()
+                if section.title and wanted in section.title.lower()]
+
+    def outline(self, max_depth: int = 3) -> str:
+        """Indented heading outline with the token count of each subtree"""
+        lines = []
+        for path, section in self.sections():
+            if section.title and len(path) <= max_depth:
+                tokens = count_tokens(section.to_markdown())
+                lines.append(f"{'  ' * (len(path) - 1)}- {section.title} (~{tokens} tokens)")
+        return "\n".join(lines)
+
+    def to_markdown(self, titles: Optional[List[str]] = None) -> str:
+        """Markdown of the whole document or of the sections matching the titles"""
+        if not titles:
+            return self.root.to_markdown()
+        return "\n\n".join(section.to_markdown()
+                           for title in titles for section in self.find(title))
+
+    def chunks(self, token_budget: Optional[int] = None,
+               titles: Optional[List[str]] = None) -> List[str]:
+        """
+        Split the document into Markdown chunks for the tools
+
+        Consecutive sections are packed up to the budget, each under a single
+        heading holding its full heading path so requirements keep their
+        context. Sections larger than the budget are split between lines.
+
+        Args:
+            token_budget: Maximum tokens per chunk (defaults to config.INGEST_CHUNK_TOKENS)
+            titles: Only chunk the sections matching these headings
+
+        Returns:
+            List of Markdown chunks
+        """
+        budget = token_budget or config.INGEST_CHUNK_TOKENS
+        roots = [section for title in titles for section in self.find(title)] if titles \
+            else [self.root]
+        chunks: List[str] = []
+        current: List[str] = []
+        used = 0
+
+        def flush():
+            nonlocal current, used
+            if current:
+                chunks.append("\n\n".join(current))
+            current, used = [], 0
+
+        for root in roots:
+            for path, section in root.walk():
+                if not section.lines:
+                    continue
+                heading = " > ".join(path)
+                header = f"# {heading}" if heading else ""
+                for piece in self._split(section.lines, budget - count_tokens(header) - 1):
+                    block = f"{header}\n{piece}" if header else piece
+                    tokens = count_tokens(block)
+                    if used and used + tokens > budget:
+                        flush()
+                    current.append(block)
+                    used += tokens
+        flush()
+        return chunks
+
+    @staticmethod
+    def _split(lines: List[str], budget: int) -> Iterator[str]:
+        """Line groups of a section that fit the budget"""
+        group: List[str] = []
+        used = 0
+        for line in lines:
+            tokens = count_tokens(line) + 1
+            if group and used + tokens > budget:
+                yield "\n".join(group)
+                group, used = [], 0
+            group.append(line)
+            used += tokens
+        if group:
+            yield "\n".join(group)
+
+class SectionTreeBuilder:
+    """Builds a section tree from a stream of (kind, level, text) blocks"""
+
+    def __init__(self, title: str = ""):
+        """Initialize with an untitled (or titled) root section"""
+        self.root = DocumentSection(title, 0)
+        self._stack = [self.root]
+
+    def add(self, kind: str, level: int, text: str):
+        """Append a heading, paragraph or list item"""
+        text = normalize_line(text)
+        if not text:
+            return
+        if kind == HEADING:
+            level = max(level, 1)
+            while self._stack[-1].level >= level:
+                self._stack.pop()
+            section = DocumentSection(text, level)
+            self._stack[-1].children.append(section)
+            self._stack.append(section)
+        elif kind == ITEM:
+            self._stack[-1].lines.append(f"- {text}")
+        else:
+            self._stack[-1].lines.append(text)
+
+    def extend(self, blocks: Iterable[Block]) -> DocumentSection:
+        """Append all blocks and return the root"""
+        for kind, level, text in blocks:
+            self.add(kind, level, text)
+        return self.root
+
+def _text_lines(source: Union[str, BinaryIO]) -> Iterator[str]:
+    """Decoded lines of a file, memory-mapped when it is a path"""
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for raw in iter(mapped.readline, b""):
+                    yield raw.decode("utf-8", errors="replace").rstrip("\r\n")
+    else:
+        for raw in source:
+            yield raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+def markdown_blocks(lines: Iterable[str]) -> Iterator[Block]:
+    """
+    Blocks of Markdown or plain text
+
+    ATX and setext headings and bullets become their own blocks; other
+    consecutive lines are joined into one paragraph until a blank line.
+    """
+    paragraph: List[str] = []
+    in_fence = False
+    for line in lines:
+        if line.strip().startswith("```"):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            yield TEXT, 0, line
+            continue
+        setext = _MD_SETEXT.match(line)
+        if setext and len(paragraph) == 1:
+            yield HEADING, 1 if setext.group(1)[0] == "=" else 2, paragraph.pop()
+            continue
+        heading = _MD_HEADING.match(line)
+        bullet = _BULLET.match(line)
+        if paragraph and (heading or bullet or not line.strip()):
+            yield TEXT, 0, " ".join(paragraph)
+            paragraph = []
+        if heading:
+            yield HEADING, len(heading.group(1)), heading.group(2)
+        elif bullet:
+            yield ITEM, 0, bullet.group(1)
+        elif normalize_line(line):
+            paragraph.append(line.strip())
+    if paragraph:
+        yield TEXT, 0, " ".join(paragraph)
+
+class _HTMLBlockParser(HTMLParser):
+    """Collects heading/paragraph/list item blocks, skipping page chrome"""
+
+    SKIP = {"script", "style", "noscript", "nav", "header", "footer", "aside", "svg",
+            "template", "form", "button"}
+    BLOCKS = {"p", "div", "section", "article", "main", "pre", "blockquote", "tr", "dt",
+              "dd", "table", "br", "ul", "ol", "figcaption", "caption"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Block] = []
+        self._skip = 0
+        self._text: List[str] = []
+        self._kind: Tuple[str, int] = (TEXT, 0)
+
+    def _flush(self):
+        text = " ".join("".join(self._text).split())
+        if text:
+            self.blocks.append((self._kind[0], self._kind[1], text))
+        self._text = []
+        self._kind = (TEXT, 0)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif self._skip:
+            return
+        elif re.fullmatch(r"h[1-6]", tag):
+            self._flush()
+            self._kind = (HEADING, int(tag[1]))
+        elif tag == "li":
+            self._flush()
+            self._kind = (ITEM, 0)
+        elif tag in self.BLOCKS:
+            self._flush()
+        elif tag in ("td", "th") and "".join(self._text).strip():
+            self._text.append(" | ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(self._skip - 1, 0)
+        elif not self._skip and (re.fullmatch(r"h[1-6]", tag) or tag == "li" or tag in self.BLOCKS):
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._text.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+def html_blocks(source: Union[str, BinaryIO], chunk_size: int = 1 << 20) -> Iterator[Block]:
+    """Blocks of an HTML page, fed to the parser chunk by chunk"""
+    parser = _HTMLBlockParser()
+    handle = open(source, "rb") if isinstance(source, str) else source
+    decoder = io.TextIOWrapper(handle, encoding="utf-8", errors="replace")
+    try:
+        for chunk in iter(lambda: decoder.read(chunk_size), ""):
+            parser.feed(chunk)
+            yield from parser.blocks
+            parser.blocks.clear()
+        parser.close()
+        yield from parser.blocks
+    finally:
+        decoder.detach()
+        if isinstance(source, str):
+            handle.close()
+
+def _docx_styles(archive: zipfile.ZipFile) -> Dict[str, int]:
+    """Heading level per paragraph style id (from style names and outline levels)"""
+    levels: Dict[str, int] = {}
+    if "word/styles.xml" not in archive.namelist():
+        return levels
+    with archive.open("word/styles.xml") as f:
+        for style in ET.parse(f).getroot().iter(f"{_W}style"):
+            style_id = style.get(f"{_W}styleId", "")
+            name = style.find(f"{_W}name")
+            name = (name.get(f"{_W}val", "") if name is not None else "").lower()
+            outline = style.find(f"{_W}pPr/{_W}outlineLvl")
+            match = re.match(r"(?:heading|标题)\s*(\d)", name)
+            if match:
+                levels[style_id] = int(match.group(1))
+            elif name == "title":
+                levels[style_id] = 1
+            elif outline is not None:
+                levels[style_id] = int(outline.get(f"{_W}val", "0")) + 1
+    return levels
+
+def docx_blocks(source: Union[str, BinaryIO]) -> Iterator[Block]:
+    """Blocks of a Word document, streamed paragraph by paragraph from document.xml"""
+    with zipfile.ZipFile(source) as archive:
+        levels = _docx_styles(archive)
+        with archive.open("word/document.xml") as f:
+            for _, element in ET.iterparse(f, events=("end",)):
+                if element.tag != f"{_W}p":
+                    continue
+                text = "".join(node.text or "" if node.tag == f"{_W}t" else " "
+                               for node in element.iter()
+                               if node.tag in (f"{_W}t", f"{_W}tab", f"{_W}br"))
+                properties = element.find(f"{_W}pPr")
+                style = properties.find(f"{_W}pStyle") if properties is not None else None
+                style_id = style.get(f"{_W}val", "") if style is not None else ""
+                outline = properties.find(f"{_W}outlineLvl") if properties is not None else None
+                if style_id in levels:
+                    yield HEADING, levels[style_id], text
+                elif outline is not None:
+                    yield HEADING, int(outline.get(f"{_W}val", "0")) + 1, text
+                elif properties is not None and (properties.find(f"{_W}numPr") is not None
+                                                 or "list" in style_id.lower()):
+                    yield ITEM, 0, text
+                else:
+                    yield TEXT, 0, text
+                element.clear()
+
+def pdf_blocks(source: Union[str, BinaryIO], repeat_pages: int = 3) -> Iterator[Block]:
+    """
+    Blocks of a PDF's text layer, page by page
+
+    The first and last line of a page are dropped as running header/footer
+    when the same line (digits ignored) tops or ends at least repeat_pages
+    pages; a window of repeat_pages pages is read ahead so the first pages
+    are cleaned too. Wrapped lines are joined into paragraphs and numbered
+    lines such as "3.2 Login" become headings.
+    """
+    if PdfReader is None:
+        raise ImportError("PDF ingestion requires pypdf (pip install pypdf)")
+    reader = PdfReader(source)
+    margins: Counter = Counter()
+    window: deque = deque()
+
+    def edges(lines: List[str]) -> List[str]:
+        return [f"top:{_DIGITS.sub('#', lines[0])}", f"bottom:{_DIGITS.sub('#', lines[-1])}"] \
+            if lines else []
+
+    def emit(lines: List[str]) -> Iterator[Block]:
+        top, bottom = edges(lines) or ["", ""]
+        if lines and margins[top] >= repeat_pages:
+            lines = lines[1:]
+        if lines and margins[bottom] >= repeat_pages:
+            lines = lines[:-1]
+        paragraph: List[str] = []
+        for line in lines + [""]:
+            heading = _NUMBERED_HEADING.match(line)
+            is_heading = heading and not _SENTENCE_END.search(line)
+            if paragraph and (not line or is_heading or _BULLET.match(line)):
+                text = " ".join(paragraph)
+                bullet = _BULLET.match(text)
+                yield (ITEM, 0, bullet.group(1)) if bullet else (TEXT, 0, text)
+                paragraph = []
+            if is_heading:
+                depth = heading.group(1).count(".") + 1 if heading.group(1) else 1
+                yield HEADING, depth, line
+            elif paragraph and paragraph[-1].endswith("-") and not paragraph[-1].endswith(" -"):
+                paragraph[-1] = paragraph[-1][:-1] + line
+            elif line:
+                paragraph.append(line)
+                if _SENTENCE_END.search(line) and not _BULLET.match(paragraph[0]):
+                    yield TEXT, 0, " ".join(paragraph)
+                    paragraph = []
+
+    for page in reader.pages:
+        lines = [normalize_line(line) for line in (page.extract_text() or "").splitlines()]
+        lines = [line for line in lines if line]
+        margins.update(edges(lines))
+        window.append(lines)
+        if len(window) > repeat_pages:
+            yield from emit(window.popleft())
+    while window:
+        yield from emit(window.popleft())
+
+def load_spec(source: Union[str, BinaryIO]) -> Optional[Dict]:
+    """Parse a JSON/YAML OpenAPI or Swagger document (None if it is not one)"""
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            raw = f.read()
+    else:
+        raw = source.read()
+    text = raw.decode("utf-8", errors="replace")
+    try:
+        spec = json.loads(text)
+    except ValueError:
+        spec = None
+        if yaml is not None:
+            try:
+                spec = yaml.safe_load(text)
+            except yaml.YAMLError:
+                spec = None
+    if isinstance(spec, dict) and ("openapi" in spec or "swagger" in spec):
+        return spec
+    return None
+
+def openapi_blocks(spec: Dict) -> Iterator[Block]:
+    """Blocks describing an OpenAPI spec: one section per tag and operation"""
+    info = spec.get("info") or {}
+    yield HEADING, 1, f"{info.get('title', 'API')} {info.get('version', '')}".strip()
+    if info.get("description"):
+        yield from ((TEXT, 0, line) for line in str(info["description"]).splitlines())
+
+    by_tag: Dict[str, List[Tuple[str, str, Dict]]] = {}
+    for path, path_item in (spec.get("paths") or {}).items():
+        if not isinstance(path_item, dict):
+            continue
+        for method, operation in path_item.items():
+            if method.lower() not in ("get", "post", "put", "patch", "delete", "head", "options") \
+                    or not isinstance(operation, dict):
+                continue
+            tag = (operation.get("tags") or ["Endpoints"])[0]
+            by_tag.setdefault(tag, []).append((method.upper(), path, operation))
+
+    for tag, operations in by_tag.items():
+        yield HEADING, 2, tag
+        for method, path, operation in operations:
+            summary = operation.get("summary") or operation.get("operationId") or ""
+            yield HEADING, 3, f"{method} {path}" + (f" - {summary}" if summary else "")
+            if operation.get("description"):
+                yield from ((TEXT, 0, line) for line in str(operation["description"]).splitlines())
+            for parameter in operation.get("parameters") or []:
+                if not isinstance(parameter, dict) or "name" not in parameter:
+                    continue
+                schema = parameter.get("schema") or parameter
+                required = "required" if parameter.get("required") else "optional"
+                yield ITEM, 0, (f"Parameter {parameter['name']} ({parameter.get('in', '')}, "
+                                f"{schema.get('type', 'any')}, {required})"
+                                + (f": {parameter['description']}" if parameter.get("description") else ""))
+            body = operation.get("requestBody") or {}
+            for media, content in (body.get("content") or {}).items():
+                schema = (content or {}).get("schema") or {}
+                fields = ", ".join(schema.get("properties") or {}) or schema.get("$ref", "")
+                yield ITEM, 0, f"Request body ({media}): {fields}".rstrip(": ")
+            for status, response in (operation.get("responses") or {}).items():
+                description = response.get("description", "") if isinstance(response, dict) else ""
+                yield ITEM, 0, f"Response {status}: {description}".rstrip(": ")
+
+def detect_format(name: str, head: bytes = b"") -> str:
+    """Document format from the file name, falling back to the first bytes"""
+    extension = os.path.splitext(name.lower())[1]
+    if extension in _EXTENSIONS:
+        return _EXTENSIONS[extension]
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"PK"):
+        return "docx"
+    if re.search(rb"<(?:!doctype html|html|body)\b", head[:2048], re.I):
+        return "html"
+    return "markdown"
+
+def ingest(source: Union[str, BinaryIO], name: Optional[str] = None,
+           format: Optional[str] = None) -> Document:
+    """
+    Parse a document into a section tree
+
+    Args:
+        source: File path, or a binary file object (e.g. an uploaded file)
+        name: File name used for format detection when source is a file object
+        format: One of FORMATS (detected from the name/content when omitted)
+
+    Returns:
+        The ingested document
+    """
+    name = name or (source if isinstance(source, str) else getattr(source, "name", "document"))
+    if format is None:
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                head = f.read(2048)
+        else:
+            head = source.read(2048)
+            source.seek(0)
+        format = detect_format(name, head)
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported document format: {format}")
+
+    spec = None
+    builder = SectionTreeBuilder()
+    if format == "openapi":
+        spec = load_spec(source)
+        if spec is None:
+            # Plain JSON/YAML that is not an API spec: treat it as text
+            format = "markdown"
+            if not isinstance(source, str):
+                source.seek(0)
+        else:
+            builder.extend(openapi_blocks(spec))
+    if format == "markdown":
+        builder.extend(markdown_blocks(_text_lines(source)))
+    elif format == "html":
+        builder.extend(html_blocks(source))
+    elif format == "docx":
+        builder.extend(docx_blocks(source))
+    elif format == "pdf":
+        builder.extend(pdf_blocks(source))
+
+    document = Document(os.path.basename(str(name)), format, builder.root, spec)
+    metrics.increment("document_ingest.documents", format=format)
+    return document
@@ -2,13 +2,24 @@
 Functional Test Case Generation Tool
 Generates comprehensive test cases based on functional requirements
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from langchain_core.tools import BaseTool
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
 import json
+import re
+import time
 import config
+from metrics import metrics
+from llm import (Route, get_chat_model, complete, output_budget, select_route, propagate,
+                 track_models)
+from .llm_output import extract_test_cases, normalize_text
+from .artifact_store import get_artifact_store, record_artifact
+from .requirement_diff import (RequirementItem, best_requirement, diff_requirements,
+                               items_from_dicts, parse_requirements)
+from .traceability import TraceabilityEngine
+from .case_dedup import CaseDeduplicator
 
 class FunctionalTestInput(BaseModel):
     """Input schema for functional test case generation"""
@@ -16,6 +27,11 @@ class FunctionalTestInput(BaseModel):
     test_format: str = Field(default="standard", description="Test case format (standard/gherkin)")
     coverage_level: str = Field(default="comprehensive", description="Coverage level (basic/comprehensive/exhaustive)")
     priority_focus: str = Field(default="high", description="Priority focus (high/medium/low/all)")
+    parallel_categories: bool = Field(default=True, description="Generate each category concurrently for exhaustive coverage")
+    incremental: bool = Field(default=False, description="Only regenerate test cases for requirements changed since the suite's last version (standard format)")
+    suite_id: str = Field(default="default", description="Suite name under which versions are kept for incremental generation")
+    fill_gaps: bool = Field(default=False, description="Only generate test cases for requirements the existing suite leaves uncovered or weakly covered (standard format)")
+    existing_tests: str = Field(default="", description="Existing test suite for gap filling (defaults to the stored suite_id suite)")
 
 class FunctionalTestGenerator(BaseTool):
     """Tool for generating functional test cases from requirements"""
@@ -28,19 +44,40 @@ class FunctionalTestGenerator(BaseTool):
     """
     args_schema: type = FunctionalTestInput
 
-    def _get_llm(self):
-        """Get LLM instance"""
-        return ChatOpenAI(
-            base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            model=config.OPENAI_MODEL,
-            temperature=0.3
-        )
+    def _get_llm(self, max_tokens: Optional[int] = None, route: Optional[Route] = None):
+        """Get LLM instance (on the route's model when given)"""
+        return get_chat_model(temperature=0.3, max_tokens=max_tokens, route=route)
 
     def _run(self, requirements: str, test_format: str = "standard",
-             coverage_level: str = "comprehensive", priority_focus: str = "high") -> str:
+             coverage_level: str = "comprehensive", priority_focus: str = "high",
+             parallel_categories: bool = True, incremental: bool = False,
+             suite_id: str = "default", fill_gaps: bool = False,
+             existing_tests: str = "") -> str:
         """Generate functional test cases"""
 
+        with track_models() as models:
+            if fill_gaps:
+                result = self._run_fill_gaps(requirements, existing_tests, suite_id,
+                                             coverage_level, priority_focus)
+                test_format = "standard"
+            elif incremental:
+                result = self._run_incremental(requirements, suite_id, coverage_level, priority_focus)
+                test_format = "standard"
+            elif coverage_level == "exhaustive" and parallel_categories:
+                result = self._run_category_parallel(requirements, test_format,
+                                                     coverage_level, priority_focus)
+            else:
+                result = self._generate(requirements, test_format, coverage_level, priority_focus)
+
+        record_artifact(self.name, result, requirements, output_format=test_format,
+                        coverage=coverage_level, model=",".join(models) or None,
+                        parameters={"priority_focus": priority_focus})
+        return result
+
+    def _generate(self, requirements: str, test_format: str, coverage_level: str,
+                  priority_focus: str) -> str:
+        """Generate the whole suite with a single completion"""
+
         # Create prompt template based on format
         if test_format == "gherkin":
             prompt_template = self._get_gherkin_prompt()
@@ -59,9 +96,368 @@ class FunctionalTestGenerator(BaseTool):
             priority_focus=priority_focus
         )
 
-        llm = self._get_llm()
-        response = llm.invoke(formatted_prompt)
-        return response.content
+        llm = self._get_llm(max_tokens=output_budget(self.name, coverage_level),
+                            route=select_route(self.name, coverage_level, formatted_prompt))
+        return complete(llm, formatted_prompt, self.name, expect_json=test_format != "gherkin")
+
+    def generate_from_chunks(self, chunks: List[str], test_format: str = "standard",
+                             coverage_level: str = "comprehensive",
+                             priority_focus: str = "high") -> str:
+        """
+        Generate a suite for a large document split into chunks
+
+        Chunks (see tools.document_ingest.Document.chunks) are generated
+        concurrently; standard suites are renumbered and near-duplicates
+        removed, Gherkin outputs are merged under one feature.
+
+        Raises:
+            ValueError: If there are no chunks (e.g. no section matched)
+        """
+        if not chunks:
+            raise ValueError("No document text to generate tests from")
+        if len(chunks) == 1:
+            return self._run(chunks[0], test_format, coverage_level, priority_focus)
+        with track_models() as models, \
+                ThreadPoolExecutor(max_workers=min(len(chunks), config.INGEST_MAX_WORKERS)) as pool:
+            outputs = list(pool.map(propagate(lambda chunk: self._generate(
+                chunk, test_format, coverage_level, priority_focus)), chunks))
+        if test_format == "gherkin":
+            result = self._merge_gherkin(outputs)
+        else:
+            cases = [case for output in outputs for case in extract_test_cases(output)]
+            for number, case in enumerate(cases, 1):
+                case["test_id"] = f"TC_{number:03d}"
+            unparsed = [output for output in outputs if not extract_test_cases(output)]
+            deduplicated = CaseDeduplicator().deduplicate(cases)
+            metrics.increment("functional_test_generator.duplicates_dropped", deduplicated.removed)
+            result = "\n\n".join([json.dumps({"test_cases": deduplicated.test_cases}, indent=2,
+                                              ensure_ascii=False)] + unparsed)
+
+        record_artifact(self.name, result, "\n\n".join(chunks), output_format=test_format,
+                        coverage=coverage_level, model=",".join(models) or None,
+                        parameters={"priority_focus": priority_focus, "chunks": len(chunks)})
+        return result
+
+    def _run_incremental(self, requirements: str, suite_id: str, coverage_level: str,
+                         priority_focus: str) -> str:
+        """
+        Regenerate only added/modified requirements of a stored suite
+
+        Test cases of unchanged requirements keep their test_id; regenerated
+        cases of a modified requirement reuse that requirement's old ids first;
+        cases left without a live requirement are retired.
+        """
+        store = get_artifact_store()
+        state = store.latest_suite_version(suite_id) or {}
+        previous = items_from_dicts(state.get("requirements"))
+        diff = diff_requirements(previous, parse_requirements(requirements),
+                                 next_number=state.get("next_requirement_number"))
+        old_cases = state.get("test_cases", [])
+        next_test = state.get("next_test_number") or self._next_test_number(old_cases)
+
+        unchanged, modified = set(diff.unchanged), set(diff.modified)
+        removed = {item.req_id for item in diff.removed}
+        kept: List[Dict[str, Any]] = []
+        retired: List[Dict[str, Any]] = []
+        reusable: Dict[str, List[str]] = {}
+        for case in old_cases:
+            references = case.get("requirement_ids") or []
+            live = [ref for ref in references if ref in unchanged]
+            if live:
+                kept.append({**case, "requirement_ids": live})
+                continue
+            changed = [ref for ref in references if ref in modified]
+            if changed:
+                reusable.setdefault(changed[0], []).append(case["test_id"])
+                retired.append({"test_id": case["test_id"], "test_name": case.get("test_name", ""),
+                                "requirement_ids": references, "reason": "requirement modified"})
+            else:
+                retired.append({"test_id": case["test_id"], "test_name": case.get("test_name", ""),
+                                "requirement_ids": references,
+                                "reason": "requirement removed" if set(references) & removed
+                                else "no matching requirement"})
+
+        targets = diff.changed
+        generated: List[Dict[str, Any]] = []
+        if targets:
+            output = self._generate_for_requirements(targets, coverage_level, priority_focus)
+            generated = extract_test_cases(output)
+            if not generated:
+                # Keep the stored version so the next run retries these requirements
+                return output
+
+        for case in self._link_requirements(generated, targets):
+            references = case["requirement_ids"]
+            if reusable.get(references[0]):
+                case["test_id"] = reusable[references[0]].pop(0)
+                retired = [r for r in retired if r["test_id"] != case["test_id"]]
+            else:
+                case["test_id"] = f"TC_{next_test:03d}"
+                next_test += 1
+
+        active = sorted(kept + generated, key=lambda case: self._test_number(case["test_id"]))
+        version = store.save_suite_version(suite_id, requirements, {
+            "requirements": [item.to_dict() for item in diff.items],
+            "test_cases": active,
+            "next_test_number": next_test,
+            "next_requirement_number": diff.next_number,
+        })
+        metrics.increment("functional_test_generator.incremental_requirements", len(targets))
+        metrics.increment("functional_test_generator.incremental_cases_kept", len(kept))
+
+        return json.dumps({
+            "suite_id": suite_id,
+            "version": version,
+            "requirement_changes": diff.summary(),
+            "test_cases": active,
+            "retired_test_cases": retired,
+        }, indent=2, ensure_ascii=False)
+
+    def _run_fill_gaps(self, requirements: str, existing_tests: str, suite_id: str,
+                       coverage_level: str, priority_focus: str) -> str:
+        """
+        Generate test cases only for requirements the existing suite does not cover
+
+        The existing suite is the given text or, if empty, the stored version of
+        suite_id. New cases are numbered after the highest existing test id.
+        """
+        state = {} if existing_tests.strip() else \
+            get_artifact_store().latest_suite_version(suite_id) or {}
+        existing = extract_test_cases(existing_tests) if existing_tests.strip() \
+            else state.get("test_cases", [])
+        items = diff_requirements(items_from_dicts(state.get("requirements")),
+                                  parse_requirements(requirements),
+                                  next_number=state.get("next_requirement_number")).items
+
+        engine = TraceabilityEngine()
+        before = engine.coverage(items, existing)
+        gaps = before.gaps()
+        generated: List[Dict[str, Any]] = []
+        if gaps:
+            output = self._generate_for_requirements(gaps, coverage_level, priority_focus)
+            generated = extract_test_cases(output)
+            if not generated:
+                return output
+            next_test = self._next_test_number(existing)
+            for case in self._link_requirements(generated, gaps):
+                case["test_id"] = f"TC_{next_test:03d}"
+                next_test += 1
+        after = engine.coverage(items, existing + generated)
+        metrics.increment("functional_test_generator.gap_requirements", len(gaps))
+
+        return json.dumps({
+            "coverage_before": before.summary(),
+            "coverage_after": after.summary(),
+            "generated_for": [item.req_id for item in gaps],
+            "test_cases": existing + generated,
+            "coverage_matrix": after.to_dict()["requirements"],
+        }, indent=2, ensure_ascii=False)
+
+    @staticmethod
+    def _link_requirements(cases: List[Dict[str, Any]],
+                           targets: List[RequirementItem]) -> List[Dict[str, Any]]:
+        """Restrict requirement_ids to the targets, guessing the best one when missing"""
+        target_ids = {item.req_id for item in targets}
+        for case in cases:
+            references = [ref for ref in case.get("requirement_ids") or [] if ref in target_ids]
+            if not references:
+                best = best_requirement(f"{case.get('test_name', '')} {case.get('description', '')}",
+                                        targets)
+                references = [best.req_id] if best else [targets[0].req_id]
+            case["requirement_ids"] = references
+        return cases
+
+    def _generate_for_requirements(self, items: List[RequirementItem], coverage_level: str,
+                                   priority_focus: str) -> str:
+        """Generate test cases for the given requirements, tagged with requirement ids"""
+        template = self._get_standard_prompt() + self._get_traceability_prompt()
+        prompt = PromptTemplate(
+            template=template,
+            input_variables=["requirements", "coverage_level", "priority_focus"]
+        )
+        formatted_prompt = prompt.format(
+            requirements="\n" + "\n".join(item.render() for item in items),
+            coverage_level=coverage_level,
+            priority_focus=priority_focus
+        )
+        llm = self._get_llm(max_tokens=output_budget(self.name, coverage_level),
+                            route=select_route(self.name, coverage_level, formatted_prompt))
+        return complete(llm, formatted_prompt, self.name, expect_json=True)
+
+    @staticmethod
+    def _test_number(test_id: str) -> int:
+        """Numeric part of a test or requirement id"""
+        match = re.search(r"(\d+)$", str(test_id))
+        return int(match.group(1)) if match else 0
+
+    def _next_test_number(self, cases: List[Dict[str, Any]]) -> int:
+        """Next free number after the ids of the given cases"""
+        return max((self._test_number(case.get("test_id")) for case in cases), default=0) + 1
+
+    def _run_category_parallel(self, requirements: str, test_format: str,
+                               coverage_level: str, priority_focus: str) -> str:
+        """Generate one category per concurrent completion and merge the results"""
+        categories = list(config.FUNCTIONAL_TEST_CATEGORIES.items())
+        block = config.FUNCTIONAL_TEST_ID_BLOCK
+
+        def generate(index: int, category: str, description: str) -> str:
+            first_id = index * block + 1
+            template = self._get_gherkin_prompt() if test_format == "gherkin" \
+                else self._get_standard_prompt()
+            template += self._get_category_focus_prompt()
+            prompt = PromptTemplate(
+                template=template,
+                input_variables=["requirements", "coverage_level", "priority_focus",
+                                 "category", "first_id", "last_id"]
+            )
+            formatted_prompt = prompt.format(
+                requirements=requirements,
+                coverage_level=coverage_level,
+                priority_focus=priority_focus,
+                category=description,
+                first_id=f"TC_{first_id:03d}",
+                last_id=f"TC_{first_id + block - 1:03d}"
+            )
+            start = time.perf_counter()
+            llm = self._get_llm(max_tokens=output_budget(self.name, coverage_level),
+                                route=select_route(self.name, coverage_level, formatted_prompt))
+            result = complete(llm, formatted_prompt, self.name,
+                              expect_json=test_format != "gherkin")
+            metrics.observe("functional_test_generator.category_seconds",
+                            time.perf_counter() - start, category=category)
+            return result
+
+        with ThreadPoolExecutor(max_workers=len(categories)) as pool:
+            futures = [pool.submit(propagate(generate), index, category, description)
+                       for index, (category, description) in enumerate(categories)]
+            outputs = [future.result() for future in futures]
+
+        if test_format == "gherkin":
+            return self._merge_gherkin(outputs)
+        return self._merge_standard(outputs, [name for name, _ in categories], block)
+
+    def _merge_standard(self, outputs: List[str], categories: List[str], block: int) -> str:
+        """
+        Merge per-category JSON suites, renumber into disjoint ranges and drop near-duplicates
+
+        Each category numbers within its block of ids; if any category returned
+        more cases than fit its block, the whole suite is numbered sequentially
+        instead so ids stay unique.
+        """
+        merged: List[Dict[str, Any]] = []
+        unparsed: List[str] = []
+        blocks: List[Tuple[int, List[Dict[str, Any]]]] = []
+
+        for index, (category, output) in enumerate(zip(categories, outputs)):
+            cases = extract_test_cases(output)
+            if not cases:
+                unparsed.append(output)
+                continue
+            for case in cases:
+                case.setdefault("category", category)
+            blocks.append((index, cases))
+
+        overflow = any(len(cases) > block for _, cases in blocks)
+        if overflow:
+            metrics.increment("functional_test_generator.id_block_overflows")
+        for index, cases in blocks:
+            first = len(merged) + 1 if overflow else index * block + 1
+            for offset, case in enumerate(cases):
+                case["test_id"] = f"TC_{first + offset:03d}"
+            merged.extend(cases)
+
+        deduplicated = CaseDeduplicator().deduplicate(merged)
+        metrics.increment("functional_test_generator.duplicates_dropped", deduplicated.removed)
+        result = json.dumps({"test_cases": deduplicated.test_cases}, indent=2, ensure_ascii=False)
+        return "\n\n".join([result] + unparsed)
+
+    def _merge_gherkin(self, outputs: List[str]) -> str:
+        """
+        Merge per-category Gherkin outputs under one feature
+
+        Rule blocks are kept in place. A Background shared by all outputs
+        stays the feature's Background; otherwise each output's Background
+        steps are inlined into its own scenarios. Scenarios are duplicates
+        only when both their title and their steps match.
+        """
+        feature = None
+        parsed: List[Tuple[List[str], List[List[str]]]] = []
+
+        for output in outputs:
+            background: List[str] = []
+            blocks: List[List[str]] = []
+            current: Optional[List[str]] = None
+            tags: List[str] = []
+            in_rule = False
+            for line in re.sub(r"```\w*", "", output).splitlines():
+                stripped = line.strip()
+                if stripped.startswith("Feature:"):
+                    feature = feature or stripped
+                    current = None
+                elif stripped.startswith("@"):
+                    tags.append(line.rstrip())
+                elif stripped.startswith("Rule:"):
+                    current, tags, in_rule = tags + [line.rstrip()], [], True
+                    blocks.append(current)
+                elif stripped.startswith("Background:") and not in_rule:
+                    background = current = [line.rstrip()]
+                elif stripped.startswith(("Scenario:", "Scenario Outline:")):
+                    current, tags = tags + [line.rstrip()], []
+                    blocks.append(current)
+                elif current is not None:
+                    current.append(line.rstrip())
+            parsed.append((background, blocks))
+
+        def steps(lines: List[str]) -> List[str]:
+            return [" ".join(line.split()) for line in lines[1:] if line.strip()]
+
+        with_scenarios = [background for background, blocks in parsed if blocks]
+        backgrounds = {tuple(steps(background)) for background in with_scenarios}
+        shared = with_scenarios[0] if len(backgrounds) == 1 else []
+        merged = [feature or "Feature: Generated scenarios"]
+        if shared:
+            merged.append("\n".join(shared).strip("\n"))
+
+        seen = set()
+        for background, blocks in parsed:
+            inlined = [line for line in background[1:] if line.strip()] if not shared else []
+            for block in blocks:
+                header = next(i for i, line in enumerate(block) if not line.strip().startswith("@"))
+                if block[header].strip().startswith("Rule:"):
+                    merged.append("\n".join(block).strip("\n"))
+                    continue
+                body = [line for line in block[header + 1:] if line.strip()]
+                indent = (body[0][:len(body[0]) - len(body[0].lstrip())] if body
+                          else block[header][:len(block[header]) - len(block[header].lstrip())] + "  ")
+                block = (block[:header + 1] + [indent + line.strip() for line in inlined]
+                         + block[header + 1:])
+                key = (normalize_text(block[header].split(":", 1)[1]),
+                       tuple(step.lower() for step in steps(block[header:])))
+                if key in seen:
+                    metrics.increment("functional_test_generator.duplicates_dropped")
+                    continue
+                seen.add(key)
+                merged.append("\n".join(block).strip("\n"))
+        return "\n\n".join(merged) + "\n"
+
+    def _get_category_focus_prompt(self) -> str:
+        """Extra instructions restricting a completion to one category"""
+        return """
+        IMPORTANT: This request is one part of a larger suite generated in parallel.
+        Generate test cases ONLY for this category: {category}
+        Do not cover other categories; they are generated separately.
+        Number test cases from {first_id} up to at most {last_id}
+        (for Gherkin, tag each scenario with its id, e.g. @{first_id}).
+        """
+
+    def _get_traceability_prompt(self) -> str:
+        """Extra instructions tying each test case to requirement ids"""
+        return """
+        IMPORTANT: Each requirement above is prefixed with its id (e.g. REQ-001).
+        Generate test cases ONLY for the listed requirements, and add to every test case a
+        "requirement_ids" field listing the ids of the requirements it verifies,
+        e.g. "requirement_ids": ["REQ-001"].
+        """
 
     def _get_standard_prompt(self) -> str:
         """Get standard test case generation prompt"""
@@ -0,0 +1,52 @@
+"""
+LLM Output Parsing Helpers
+Extracts structured data (JSON documents, test case lists) from model responses
+"""
+from typing import Any, Dict, List, Optional
+import json
+import re
+
+def extract_json(text: str) -> Optional[Any]:
+    """
+    Parse the JSON document embedded in a model response
+
+    Args:
+        text: Raw response, possibly wrapped in markdown fences or prose
+
+    Returns:
+        Parsed JSON value, or None if no valid document is found
+    """
+    candidates = re.findall(r"```(?:json)?\s*\n(.*?)```", text, re.DOTALL)
+    candidates.append(text)
+    for candidate in candidates:
+        candidate = candidate.strip()
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            pass
+        for opener, closer in (("{", "}"), ("[", "]")):
+            start, end = candidate.find(opener), candidate.rfind(closer)
+            if start != -1 and end > start:
+                try:
+                    return json.loads(candidate[start:end + 1])
+                except ValueError:
+                    continue
+    return None
+
+def extract_test_cases(text: str) -> List[Dict[str, Any]]:
+    """Return the "test_cases" list of a standard-format response (empty if absent)"""
+    document = extract_json(text)
+    if isinstance(document, dict):
+        cases = document.get("test_cases", [])
+    elif isinstance(document, list):
+        cases = document
+    else:
+        cases = []
+    return [case for case in cases if isinstance(case, dict)]
+
+def normalize_text(value: Any) -> str:
+    """Lowercase, punctuation-free, single-spaced rendering of a field"""
+    if isinstance(value, list):
+        return " ".join(normalize_text(item) for item in value)
+    text = re.sub(r"^\s*step\s*\d+\s*[:.)-]\s*", "", str(value or ""), flags=re.IGNORECASE)
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
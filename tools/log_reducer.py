@@ -0,0 +1,342 @@
+"""
+Log and Stack Trace Reducer
+Collapses large pasted logs into templates, unique stack traces and
+error-level lines so defect prompts stay within a token budget
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import re
+import config
+from metrics import metrics
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tokenizer is optional; fall back to a character estimate
+    _ENCODING = None
+
+WILDCARD = "<*>"
+
+_MASKS = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<TS>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I), "<UUID>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<IP>"),
+    (re.compile(r"\b0x[0-9a-f]+\b", re.I), "<HEX>"),
+    (re.compile(r"\b[0-9a-f]{16,}\b", re.I), "<HEX>"),
+    (re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?:ms|s|kb|mb|gb|%)?\b", re.I), "<NUM>"),
+]
+_LEVEL = re.compile(r"\b(FATAL|CRITICAL|SEVERE|ERROR|ERR|WARN(?:ING)?|INFO|DEBUG|TRACE)\b")
+_ERROR_LEVELS = {"FATAL", "CRITICAL", "SEVERE", "ERROR", "ERR"}
+_TRACE_START = re.compile(
+    r"^(Traceback \(most recent call last\):|Exception in thread |"
+    r"\S*(?:Exception|Error)(?::|$)|panic: |goroutine \d+ \[)"
+)
+_TRACE_CONTINUATION = re.compile(r"^(\s+|Caused by:|Suppressed:|\.\.\. \d+ more)")
+_CHAIN = re.compile(r"^(During handling of the above exception|"
+                    r"The above exception was the direct cause)")
+_PY_TRACE_END = re.compile(r"^[\w.]+(?:Error|Exception|Exit|Interrupt|Warning)\b.*")
+
+def count_tokens(text: str) -> int:
+    """Token count (tiktoken when available, otherwise ~4 characters per token)"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+def mask_variables(line: str) -> str:
+    """Replace timestamps, ids, addresses and numbers with placeholders"""
+    for pattern, placeholder in _MASKS:
+        line = pattern.sub(placeholder, line)
+    return line
+
+@dataclass
+class LogTemplate:
+    """A Drain cluster of log lines sharing one template"""
+    tokens: List[str]
+    count: int = 0
+    first_line: int = 0
+    last_line: int = 0
+    first_example: str = ""
+    last_example: str = ""
+    level: str = ""
+
+    @property
+    def text(self) -> str:
+        """Template text with wildcards"""
+        return " ".join(self.tokens)
+
+    @property
+    def is_error(self) -> bool:
+        """Whether the template is error-level"""
+        return self.level in _ERROR_LEVELS
+
+class DrainTemplateMiner:
+    """
+    Streaming Drain-style log template miner
+    Lines are routed through a fixed-depth prefix tree keyed by token count and
+    leading tokens, then merged into the most similar cluster of their leaf
+    """
+
+    def __init__(self, depth: int = 4, similarity: float = 0.5, max_children: int = 100):
+        """
+        Initialize the miner
+
+        Args:
+            depth: Number of leading tokens used for routing
+            similarity: Minimum fraction of matching tokens to join a cluster
+            max_children: Fan-out limit per tree node before routing to a wildcard
+        """
+        self.depth = depth
+        self.similarity = similarity
+        self.max_children = max_children
+        self._root: Dict = {}
+        self.templates: List[LogTemplate] = []
+
+    def add(self, line: str, line_number: int) -> LogTemplate:
+        """Add one log line and return the template it was assigned to"""
+        tokens = mask_variables(line).split()
+        node = self._root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth]:
+            key = WILDCARD if any(ch.isdigit() for ch in token) else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+        clusters: List[LogTemplate] = node.setdefault(None, [])
+
+        best, best_score = None, -1.0
+        for cluster in clusters:
+            score = self._score(cluster.tokens, tokens)
+            if score > best_score:
+                best, best_score = cluster, score
+
+        if best is None or best_score < self.similarity:
+            level = _LEVEL.search(line)
+            best = LogTemplate(tokens=list(tokens), first_line=line_number,
+                               first_example=line, level=level.group(1) if level else "")
+            clusters.append(best)
+            self.templates.append(best)
+        else:
+            best.tokens = [a if a == b else WILDCARD for a, b in zip(best.tokens, tokens)]
+
+        best.count += 1
+        best.last_line = line_number
+        best.last_example = line
+        return best
+
+    @staticmethod
+    def _score(template: List[str], tokens: List[str]) -> float:
+        """Fraction of positions where the template matches the tokens"""
+        if not tokens:
+            return 1.0
+        same = sum(1 for a, b in zip(template, tokens) if a == b or a == WILDCARD)
+        return same / len(tokens)
+
+@dataclass
+class StackTrace:
+    """A unique stack trace and how often it occurred"""
+    text: str
+    count: int = 1
+    first_line: int = 0
+    last_line: int = 0
+
+@dataclass
+class ReducedLog:
+    """Result of reducing a block of text"""
+    text: str
+    original_lines: int
+    original_tokens: int
+    reduced_tokens: int
+    templates: int = 0
+    unique_traces: int = 0
+    reduced: bool = False
+
+class LogReducer:
+    """
+    Prompt-side log reducer for defect analysis
+    Texts within the token budget pass through untouched; longer logs are
+    replaced by a summary that keeps the signal within the budget
+    """
+
+    def __init__(self, token_budget: Optional[int] = None,
+                 head_lines: int = 5, tail_lines: int = 10):
+        """
+        Initialize the reducer
+
+        Args:
+            token_budget: Maximum tokens of the reduced text; shorter texts are
+                returned unchanged
+            head_lines: Leading lines kept verbatim
+            tail_lines: Trailing lines kept verbatim
+        """
+        self.token_budget = token_budget or config.DEFECT_PROMPT_TOKEN_BUDGET
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+
+    def reduce(self, text: str) -> ReducedLog:
+        """Reduce a pasted text block"""
+        lines = text.splitlines()
+        original_tokens = count_tokens(text)
+        if original_tokens <= self.token_budget:
+            return ReducedLog(text, len(lines), original_tokens, original_tokens)
+        reduced = self.reduce_lines(iter(lines), original_tokens=original_tokens)
+        if reduced.reduced_tokens >= original_tokens:
+            # Nothing repetitive to collapse: the summary would only add overhead
+            return ReducedLog(text, len(lines), original_tokens, original_tokens)
+        return reduced
+
+    def reduce_lines(self, lines: Iterable[str], original_tokens: Optional[int] = None) -> ReducedLog:
+        """
+        Reduce a stream of lines (e.g. an open log file) in a single pass
+
+        Memory is bounded by the number of distinct templates and traces, not
+        by the number of lines.
+        """
+        miner = DrainTemplateMiner()
+        traces: Dict[str, StackTrace] = {}
+        head: List[str] = []
+        tail: List[str] = []
+        total = 0
+        counted_tokens = 0
+
+        for number, line, trace in self._segment(lines):
+            if trace is not None and "\n" not in trace:
+                # A lone "SomethingError: ..." line is an ordinary log line
+                line, trace = trace, None
+            total = max(total, number + (trace.count("\n") if trace else 0))
+            if original_tokens is None:
+                counted_tokens += count_tokens(line if trace is None else trace)
+            if trace is not None:
+                fingerprint = self._trace_fingerprint(trace)
+                if fingerprint in traces:
+                    traces[fingerprint].count += 1
+                    traces[fingerprint].last_line = number
+                else:
+                    traces[fingerprint] = StackTrace(trace, 1, number, number)
+                entry = trace.splitlines()[0]
+            else:
+                if not line.strip():
+                    continue
+                miner.add(line, number)
+                entry = line
+            if len(head) < self.head_lines:
+                head.append(entry)
+            tail.append(entry)
+            if len(tail) > self.tail_lines:
+                tail.pop(0)
+
+        original_tokens = original_tokens if original_tokens is not None else counted_tokens
+        text = self._render(miner, list(traces.values()), head, tail, total)
+        reduced_tokens = count_tokens(text)
+        metrics.observe("log_reducer.reduction_ratio",
+                        reduced_tokens / original_tokens if original_tokens else 1.0)
+        return ReducedLog(text, total, original_tokens, reduced_tokens,
+                          len(miner.templates), len(traces), True)
+
+    @staticmethod
+    def _segment(lines: Iterable[str]) -> Iterator[Tuple[int, str, Optional[str]]]:
+        """
+        Split a line stream into plain lines and whole stack traces
+
+        Yields:
+            (line number, line, trace text or None)
+        """
+        buffer: List[str] = []
+        start = 0
+        python_trace = False
+
+        def flush():
+            while buffer and not buffer[-1].strip():
+                buffer.pop()
+            trace = "\n".join(buffer)
+            buffer.clear()
+            return trace
+
+        for number, raw in enumerate(lines, 1):
+            line = raw.rstrip("\r\n")
+            if buffer:
+                if python_trace:
+                    previous = next((l for l in reversed(buffer) if l.strip()), "")
+                    continues = (not line.strip() or line[:1].isspace()
+                                 or line.startswith("Traceback") or _CHAIN.match(line)
+                                 or (_PY_TRACE_END.match(line) and previous[:1].isspace()))
+                else:
+                    continues = bool(line.strip()) and bool(_TRACE_CONTINUATION.match(line))
+                if continues:
+                    buffer.append(line)
+                    continue
+                yield start, "", flush()
+            if _TRACE_START.match(line):
+                buffer.append(line)
+                start = number
+                python_trace = line.startswith("Traceback")
+                continue
+            yield number, line, None
+
+        if buffer:
+            yield start, "", flush()
+
+    @staticmethod
+    def _trace_fingerprint(trace: str) -> str:
+        """Hash of a trace with variable parts masked"""
+        return hashlib.sha1(mask_variables(trace).encode("utf-8")).hexdigest()
+
+    def _render(self, miner: DrainTemplateMiner, traces: List[StackTrace],
+                head: List[str], tail: List[str], total: int) -> str:
+        """Assemble summary sections in priority order until the budget is used"""
+        header = (f"[Log reduced: {total} lines -> {len(miner.templates)} templates, "
+                  f"{len(traces)} unique stack traces]")
+        errors = sorted((t for t in miner.templates if t.is_error),
+                        key=lambda t: t.first_line)
+        others = sorted((t for t in miner.templates if not t.is_error),
+                        key=lambda t: -t.count)
+        traces = sorted(traces, key=lambda t: -t.count)
+
+        sections: List[Tuple[str, List[str]]] = [
+            ("First lines:", [f"  {line}" for line in head]),
+            ("Error-level lines:", [self._describe(t) for t in errors]),
+            ("Stack traces (deduplicated):",
+             [f"  [x{t.count}, first at line {t.first_line}, last at line {t.last_line}]\n"
+              + self._indent(t.text) for t in traces]),
+            ("Last lines:", [f"  {line}" for line in tail]),
+            ("Other templates (by frequency):", [self._describe(t) for t in others]),
+        ]
+
+        parts = [header]
+        used = count_tokens(header)
+        omitted = 0
+        for title, entries in sections:
+            if not entries:
+                continue
+            kept: List[str] = []
+            cost = count_tokens(title)
+            for entry in entries:
+                entry_cost = count_tokens(entry)
+                if used + cost + entry_cost > self.token_budget:
+                    omitted += 1
+                    continue
+                kept.append(entry)
+                cost += entry_cost
+            if kept:
+                parts.append(title + "\n" + "\n".join(kept))
+                used += cost
+        if omitted:
+            parts.append(f"[{omitted} lower-priority entries omitted to fit the token budget]")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _describe(template: LogTemplate) -> str:
+        """One template with its count and first/last occurrence"""
+        if template.count == 1:
+            return f"  [x1, line {template.first_line}] {template.first_example.strip()}"
+        return (f"  [x{template.count}] {template.text}\n"
+                f"    first (line {template.first_line}): {template.first_example.strip()}\n"
+                f"    last (line {template.last_line}): {template.last_example.strip()}")
+
+    @staticmethod
+    def _indent(text: str, max_lines: int = 30) -> str:
+        """Indent a trace, eliding the middle of very deep traces"""
+        lines = text.splitlines()
+        if len(lines) > max_lines:
+            keep = max_lines // 2
+            lines = lines[:keep] + [f"... {len(lines) - 2 * keep} frames omitted ..."] + lines[-keep:]
+        return "\n".join(f"    {line}" for line in lines)
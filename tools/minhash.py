@@ -0,0 +1,195 @@
+"""
+MinHash / LSH Utilities
+Vectorized MinHash signatures and locality-sensitive hashing bands used for
+near-duplicate detection of defects and test cases
+"""
+from typing import Dict, Iterable, List, Set, Tuple
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+import numpy as np
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) whose S-curve threshold sits just below the target
+
+    Args:
+        num_perm: Signature length
+        threshold: Jaccard similarity that should reliably become a candidate
+
+    Returns:
+        Tuple of (bands, rows per band) with bands * rows <= num_perm
+    """
+    best = (num_perm, 1)
+    best_gap = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        curve = (1.0 / bands) ** (1.0 / rows)
+        gap = threshold - curve
+        if 0 <= gap < best_gap:
+            best, best_gap = (bands, rows), gap
+    return best
+
+class MinHasher:
+    """
+    MinHash signature generator over word shingles
+    Signatures for a text are computed in one vectorized NumPy pass
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        """
+        Initialize the hasher
+
+        Args:
+            num_perm: Number of hash permutations (signature length)
+            shingle_size: Words per shingle
+            seed: Seed for the permutation coefficients
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, (1 << 31) - 1, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, (1 << 31) - 1, size=num_perm, dtype=np.int64).astype(np.uint64)
+        # Odd 64-bit multipliers and offsets for the batch multiply-shift hashes
+        self._a64 = rng.randint(0, 1 << 63, size=num_perm, dtype=np.int64).astype(np.uint64) \
+            * np.uint64(2) + np.uint64(1)
+        self._b64 = rng.randint(0, 1 << 63, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def shingles(self, text: str) -> Set[int]:
+        """Hashed word n-grams of the normalized text"""
+        tokens = _TOKEN.findall(text.lower())
+        if len(tokens) < self.shingle_size:
+            return {zlib.crc32(" ".join(tokens).encode("utf-8"))} if tokens else set()
+        size = self.shingle_size
+        return {zlib.crc32(" ".join(tokens[i:i + size]).encode("utf-8"))
+                for i in range(len(tokens) - size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (uint32 array of length num_perm)"""
+        return self.signature_from_shingles(self.shingles(text))
+
+    def signature_from_shingles(self, shingles: Iterable[int]) -> np.ndarray:
+        """MinHash signature of a precomputed shingle set"""
+        values = np.fromiter(shingles, dtype=np.uint64)
+        if values.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        hashed = (np.outer(values, self._a) + self._b) % _PRIME & _MAX_HASH
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def batch_signatures(self, texts: List[str], chunk_rows: int = 1 << 16) -> np.ndarray:
+        """
+        MinHash signatures of many texts at once
+
+        Words are hashed once per vocabulary entry and shingles are built,
+        deduplicated and min-hashed with array operations over the whole batch,
+        so large batches cost a handful of NumPy passes instead of one per text.
+        Shingle hashes differ from shingles(), so these signatures are only
+        comparable with each other.
+
+        Returns:
+            uint32 array of shape (len(texts), num_perm)
+        """
+        vocabulary: Dict[str, int] = defaultdict()
+        vocabulary.default_factory = vocabulary.__len__
+        word_ids: List[int] = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for index, text in enumerate(texts):
+            tokens = _TOKEN.findall(text.lower())
+            lengths[index] = len(tokens)
+            word_ids.extend(map(vocabulary.__getitem__, tokens))
+        word_hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in vocabulary),
+                                  dtype=np.uint64, count=len(vocabulary))
+        hashes = word_hashes[np.asarray(word_ids, dtype=np.int64)]
+        ends = np.cumsum(lengths)
+        doc = np.repeat(np.arange(len(texts), dtype=np.uint64), lengths)
+        position = np.arange(len(hashes), dtype=np.int64)
+        doc_end = np.repeat(ends, lengths)
+
+        # FNV-style combination of up to shingle_size words starting at each position
+        shingles = np.full(len(hashes), _FNV_OFFSET, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for offset in range(self.shingle_size):
+                inside = position + offset < doc_end
+                shifted = hashes[np.minimum(position + offset, len(hashes) - 1)] if len(hashes) \
+                    else hashes
+                shingles = np.where(inside, (shingles ^ shifted) * _FNV_PRIME, shingles)
+        # Full shingles, plus the single shingle of texts shorter than shingle_size
+        starts = np.repeat(ends - lengths, lengths)
+        keep = (position + self.shingle_size <= doc_end) | \
+            ((doc_end - starts < self.shingle_size) & (position == starts))
+        keys = np.sort((doc[keep] << np.uint64(32)) | (shingles[keep] & _MAX_HASH))
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+
+        sizes = np.bincount((keys >> np.uint64(32)).astype(np.int64), minlength=len(texts))
+        return self._signatures(keys & _MAX_HASH, sizes, chunk_rows)
+
+    def _signatures(self, values: np.ndarray, sizes: np.ndarray, chunk_rows: int) -> np.ndarray:
+        """
+        Signatures of consecutive shingle runs (values grouped by set, sizes per set)
+
+        Uses multiply-shift hashing, which avoids the slow 64-bit modulo of
+        signature() at the same permutation quality for 32-bit inputs.
+        """
+        result = np.full((len(sizes), self.num_perm), _MAX_HASH, dtype=np.uint32)
+        ends = np.cumsum(sizes)
+        first = 0
+        while first < len(sizes):
+            # Whole sets up to chunk_rows rows (at least one set per chunk)
+            last = max(int(np.searchsorted(ends, ends[first] - sizes[first] + chunk_rows,
+                                           side="right")), first + 1)
+            members = first + np.flatnonzero(sizes[first:last])
+            if members.size:
+                begin = int(ends[first] - sizes[first])
+                # Permutations as rows keep each set's run contiguous for reduceat
+                with np.errstate(over="ignore"):
+                    hashed = ((np.outer(self._a64, values[begin:int(ends[last - 1])])
+                               + self._b64[:, None]) >> np.uint64(32)).astype(np.uint32)
+                offsets = ends[members] - sizes[members] - begin
+                result[members] = np.minimum.reduceat(hashed, offsets, axis=1).T
+            first = last
+        return result
+
+    @staticmethod
+    def band_matrix(signatures: np.ndarray, bands: int, rows: int) -> np.ndarray:
+        """
+        Vectorized LSH bucket keys (FNV-1a over each band) of shape (n, bands)
+
+        Keys are only comparable with other band_matrix() keys, not with
+        band_keys().
+        """
+        keys = np.empty((signatures.shape[0], bands), dtype=np.uint64)
+        columns = signatures.astype(np.uint64)
+        with np.errstate(over="ignore"):
+            for band in range(bands):
+                key = np.full(signatures.shape[0], _FNV_OFFSET ^ np.uint64(band), dtype=np.uint64)
+                for column in range(band * rows, (band + 1) * rows):
+                    key = (key ^ columns[:, column]) * _FNV_PRIME
+                keys[:, band] = key
+        return keys
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return float(np.mean(first == second))
+
+    @staticmethod
+    def band_keys(signature: np.ndarray, bands: int, rows: int) -> List[int]:
+        """
+        Signed 64-bit bucket keys, one per LSH band
+
+        The band index is mixed into each key so all bands can share one
+        lookup column.
+        """
+        keys = []
+        for band in range(bands):
+            chunk = signature[band * rows:(band + 1) * rows].tobytes()
+            digest = hashlib.blake2b(band.to_bytes(2, "little") + chunk, digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
@@ -0,0 +1,250 @@
+"""
+Local Mock API Server
+Serves an OpenAPI/Swagger specification offline so generated API tests can run
+without the real backend
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+import json
+import re
+import threading
+from .api_rule_engine import APIRuleEngine, NONEXISTENT_INT_ID, NONEXISTENT_STR_ID
+
+class MockAPIServer:
+    """
+    Spec-driven mock server
+    Validates authentication, parameters and request bodies against the schema
+    and answers with schema-shaped sample responses
+    """
+
+    def __init__(self, spec: Dict[str, Any], host: str = "127.0.0.1", port: int = 0,
+                 auth_token: str = "test-token"):
+        """
+        Initialize the mock server
+
+        Args:
+            spec: Parsed OpenAPI/Swagger document
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            auth_token: Bearer token accepted for secured operations
+        """
+        self.engine = APIRuleEngine()
+        self.engine.spec = spec
+        self.auth_token = auth_token
+        self.routes = self._build_routes(spec)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Base URL the server is reachable on"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockAPIServer":
+        """Start serving in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and release the port"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _build_routes(self, spec: Dict[str, Any]) -> List[Tuple[re.Pattern, str, Dict[str, Any]]]:
+        """Compile path templates into regular expressions"""
+        base_path = spec.get("basePath", "").rstrip("/")
+        for server in spec.get("servers", [])[:1]:
+            base_path = urlparse(server.get("url", "")).path.rstrip("/")
+
+        routes = []
+        for path, path_item in spec.get("paths", {}).items():
+            if not isinstance(path_item, dict):
+                continue
+            pattern = re.escape(base_path + path)
+            pattern = re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", pattern)
+            routes.append((re.compile(f"^{pattern}/?$"), path, path_item))
+            if base_path:
+                plain = re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(path))
+                routes.append((re.compile(f"^{plain}/?$"), path, path_item))
+        return routes
+
+    def handle(self, method: str, raw_path: str, headers: Dict[str, str],
+               body: bytes) -> Tuple[int, Any]:
+        """
+        Compute the mock response for a request
+
+        Returns:
+            Tuple of (status code, JSON-serializable payload)
+        """
+        parsed = urlparse(raw_path)
+        for pattern, _, path_item in self.routes:
+            match = pattern.match(parsed.path)
+            if match:
+                break
+        else:
+            return 404, {"error": "Not Found", "path": parsed.path}
+
+        operation = path_item.get(method.lower())
+        if not isinstance(operation, dict):
+            return 405, {"error": "Method Not Allowed"}
+
+        if self.engine.requires_auth(operation):
+            authorization = headers.get("authorization", "")
+            if authorization != f"Bearer {self.auth_token}":
+                return 401, {"error": "Unauthorized"}
+
+        params = [self.engine.resolve(p) for p in
+                  path_item.get("parameters", []) + operation.get("parameters", [])]
+        query = parse_qs(parsed.query)
+        for param in params:
+            location, name = param.get("in"), param.get("name")
+            schema = self.engine.resolve(param.get("schema", param))
+            if location == "path":
+                value = match.group(name) if name in match.groupdict() else None
+                if value in (str(NONEXISTENT_INT_ID), NONEXISTENT_STR_ID):
+                    return 404, {"error": "Not Found", name: value}
+                error = self._validate(self._coerce(value, schema), schema, name)
+            elif location == "query":
+                if name not in query:
+                    error = f"missing required query parameter '{name}'" \
+                        if param.get("required") else None
+                else:
+                    error = self._validate(self._coerce(query[name][0], schema), schema, name)
+            else:
+                error = None
+            if error:
+                return 400, {"error": error}
+
+        request_schema = self.engine.request_schema(operation, path_item.get("parameters", []))
+        if request_schema and body:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                return 400, {"error": "malformed JSON body"}
+            error = self._validate(payload, request_schema, "body")
+            if error:
+                return 400, {"error": error}
+        elif request_schema and method.upper() in ("POST", "PUT", "PATCH") \
+                and request_schema.get("required"):
+            return 400, {"error": "request body is required"}
+
+        status = self.engine.success_codes(operation)[0]
+        return status, self._response_sample(operation, status)
+
+    def _response_sample(self, operation: Dict[str, Any], status: int) -> Any:
+        """Sample payload for a documented response"""
+        response = self.engine.resolve(operation.get("responses", {}).get(str(status), {}))
+        if not isinstance(response, dict):
+            return None
+        schema = response.get("schema")
+        for media_type, media in response.get("content", {}).items():
+            if "json" in media_type and isinstance(media, dict):
+                schema = media.get("schema")
+        return self.engine.sample(schema) if schema else None
+
+    def _coerce(self, value: Optional[str], schema: Dict[str, Any]) -> Any:
+        """Convert a path/query string to the declared scalar type when possible"""
+        if value is None:
+            return None
+        try:
+            if schema.get("type") == "integer":
+                return int(value)
+            if schema.get("type") == "number":
+                return float(value)
+        except ValueError:
+            return value
+        if schema.get("type") == "boolean" and value in ("true", "false"):
+            return value == "true"
+        return value
+
+    def _validate(self, value: Any, schema: Any, name: str) -> Optional[str]:
+        """Return a validation error message, or None if the value conforms"""
+        schema = self.engine.resolve(schema)
+        if not isinstance(schema, dict) or value is None:
+            return None
+
+        expected = schema.get("type") or ("object" if "properties" in schema else None)
+        checks = {
+            "string": lambda v: isinstance(v, str),
+            "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+            "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+            "boolean": lambda v: isinstance(v, bool),
+            "array": lambda v: isinstance(v, list),
+            "object": lambda v: isinstance(v, dict),
+        }
+        if expected in checks and not checks[expected](value):
+            return f"'{name}' must be of type {expected}"
+
+        if "enum" in schema and value not in schema["enum"]:
+            return f"'{name}' must be one of {schema['enum']}"
+
+        if expected in ("integer", "number"):
+            if "minimum" in schema and (value < schema["minimum"] or
+                                        (schema.get("exclusiveMinimum") is True and
+                                         value == schema["minimum"])):
+                return f"'{name}' is below minimum {schema['minimum']}"
+            if "maximum" in schema and (value > schema["maximum"] or
+                                        (schema.get("exclusiveMaximum") is True and
+                                         value == schema["maximum"])):
+                return f"'{name}' is above maximum {schema['maximum']}"
+        elif expected == "string":
+            if len(value) < schema.get("minLength", 0):
+                return f"'{name}' is shorter than {schema['minLength']}"
+            if "maxLength" in schema and len(value) > schema["maxLength"]:
+                return f"'{name}' is longer than {schema['maxLength']}"
+        elif expected == "array":
+            if len(value) < schema.get("minItems", 0):
+                return f"'{name}' has fewer than {schema['minItems']} items"
+            if "maxItems" in schema and len(value) > schema["maxItems"]:
+                return f"'{name}' has more than {schema['maxItems']} items"
+            for index, item in enumerate(value):
+                error = self._validate(item, schema.get("items", {}), f"{name}[{index}]")
+                if error:
+                    return error
+        elif expected == "object":
+            for required in schema.get("required", []):
+                if required not in value:
+                    return f"missing required field '{required}'"
+            for key, prop in schema.get("properties", {}).items():
+                if key in value:
+                    error = self._validate(value[key], prop, key)
+                    if error:
+                        return error
+        return None
+
+    def _make_handler(self):
+        """Create the request handler class bound to this server"""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                headers = {key.lower(): value for key, value in self.headers.items()}
+                status, payload = mock.handle(self.command, self.path, headers, body)
+                data = b"" if payload is None or status == 204 else \
+                    json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,192 @@
+"""
+Requirement Parsing and Diffing
+Splits requirement documents into section/bullet items with stable ids and
+diffs two versions so only changed requirements need new test cases
+"""
+from dataclasses import dataclass, field, asdict
+from difflib import SequenceMatcher
+from typing import Dict, List, Any, Optional, Tuple
+import re
+from .llm_output import normalize_text
+
+_HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$")
+_BULLET = re.compile(r"^(\s*)(?:[-*+•]|\d+[.)]|[a-zA-Z][.)])\s+(.+)$")
+_ID_NUMBER = re.compile(r"(\d+)$")
+
+@dataclass
+class RequirementItem:
+    """One requirement (bullet or paragraph line) and the section it belongs to"""
+    req_id: str
+    section: str
+    text: str
+
+    @property
+    def key(self) -> str:
+        """Normalized text used for matching across versions"""
+        return normalize_text(self.text)
+
+    def render(self) -> str:
+        """Prompt rendering with id and section"""
+        location = f" ({self.section})" if self.section else ""
+        return f"{self.req_id}{location}: {self.text}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form"""
+        return asdict(self)
+
+@dataclass
+class RequirementDiff:
+    """Changes between two requirement versions"""
+    items: List[RequirementItem]
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    removed: List[RequirementItem] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    next_number: int = 1
+
+    @property
+    def changed(self) -> List[RequirementItem]:
+        """Added and modified requirements, in document order"""
+        wanted = set(self.added) | set(self.modified)
+        return [item for item in self.items if item.req_id in wanted]
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts and ids of each kind of change"""
+        return {
+            "added": self.added,
+            "modified": self.modified,
+            "removed": [item.req_id for item in self.removed],
+            "unchanged": len(self.unchanged),
+        }
+
+def parse_requirements(text: str) -> List[RequirementItem]:
+    """
+    Split a requirement document into items
+
+    Markdown headings and short lines ending with a colon open sections;
+    bullets, numbered items and other non-empty lines become requirements.
+    Nested bullets keep their parent bullet in the section path.
+    """
+    items: List[RequirementItem] = []
+    headings: List[Tuple[int, str]] = []
+    parents: List[Tuple[int, str]] = []
+
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        if not line.strip() or line.strip().startswith("```"):
+            continue
+        heading = _HEADING.match(line)
+        if heading:
+            level = len(heading.group(1))
+            headings = [h for h in headings if h[0] < level] + [(level, heading.group(2))]
+            parents = []
+            continue
+        bullet = _BULLET.match(line)
+        if not bullet and line.strip().endswith((":", "：")) and len(line.strip()) <= 80:
+            headings = [h for h in headings if h[0] < 7] + [(7, line.strip().rstrip(":："))]
+            parents = []
+            continue
+
+        if bullet:
+            indent, body = len(bullet.group(1).expandtabs(4)), bullet.group(2).strip()
+            parents = [p for p in parents if p[0] < indent]
+        else:
+            indent, body = 0, line.strip()
+            parents = []
+        path = [title for _, title in headings] + [_shorten(parent) for _, parent in parents]
+        items.append(RequirementItem("", " > ".join(path), body))
+        if bullet:
+            parents.append((indent, body))
+    return items
+
+def _shorten(text: str, limit: int = 40) -> str:
+    """Short form of a parent bullet used in section paths"""
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def _next_number(ids: List[str]) -> int:
+    """Next free numeric suffix after the given ids"""
+    numbers = [int(m.group(1)) for m in (_ID_NUMBER.search(i) for i in ids) if m]
+    return max(numbers, default=0) + 1
+
+def diff_requirements(previous: List[RequirementItem], current: List[RequirementItem],
+                      similarity: float = 0.6, prefix: str = "REQ",
+                      next_number: Optional[int] = None) -> RequirementDiff:
+    """
+    Match the current items against the previous version and assign ids
+
+    Identical requirements (anywhere in the document) keep their id and are
+    unchanged; a reworded requirement in the same section keeps its id and is
+    modified; everything else is added or removed. Ids are never reused.
+
+    Args:
+        previous: Items of the previous version (with ids)
+        current: Items of the new version (ids are assigned here)
+        similarity: Minimum text similarity for a reworded requirement
+        prefix: Prefix of newly assigned ids
+        next_number: First number for new ids (so ids of removed requirements
+            are not handed out again)
+
+    Returns:
+        The diff, whose items are the current version with ids
+    """
+    items = [RequirementItem("", item.section, item.text) for item in current]
+    diff = RequirementDiff(items)
+    unmatched_previous: Dict[str, List[RequirementItem]] = {}
+    for item in previous:
+        unmatched_previous.setdefault(item.key, []).append(item)
+
+    # Exact matches, preferring the same section
+    for item in items:
+        candidates = unmatched_previous.get(item.key)
+        if not candidates:
+            continue
+        match = next((c for c in candidates if c.section == item.section), candidates[0])
+        candidates.remove(match)
+        item.req_id = match.req_id
+        diff.unchanged.append(item.req_id)
+
+    remaining = [c for candidates in unmatched_previous.values() for c in candidates]
+    # Reworded requirements within the same section
+    for item in items:
+        if item.req_id:
+            continue
+        best, best_score = None, similarity
+        for candidate in remaining:
+            if candidate.section != item.section:
+                continue
+            score = SequenceMatcher(None, candidate.key, item.key).ratio()
+            if score >= best_score:
+                best, best_score = candidate, score
+        if best is not None:
+            remaining.remove(best)
+            item.req_id = best.req_id
+            diff.modified.append(item.req_id)
+
+    next_number = max(next_number or 0, _next_number([item.req_id for item in previous]))
+    for item in items:
+        if not item.req_id:
+            item.req_id = f"{prefix}-{next_number:03d}"
+            next_number += 1
+            diff.added.append(item.req_id)
+    diff.next_number = next_number
+
+    order = {item.req_id: index for index, item in enumerate(previous)}
+    diff.removed = sorted(remaining, key=lambda item: order.get(item.req_id, 0))
+    return diff
+
+def best_requirement(text: str, items: List[RequirementItem]) -> Optional[RequirementItem]:
+    """Requirement sharing the most words with a text (None if nothing overlaps)"""
+    words = set(normalize_text(text).split())
+    best, best_score = None, 0.0
+    for item in items:
+        other = set(item.key.split())
+        if not other:
+            continue
+        score = len(words & other) / len(words | other)
+        if score > best_score:
+            best, best_score = item, score
+    return best
+
+def items_from_dicts(values: Optional[List[Dict[str, Any]]]) -> List[RequirementItem]:
+    """Rebuild items stored with to_dict()"""
+    return [RequirementItem(v["req_id"], v.get("section", ""), v["text"]) for v in values or []]
@@ -0,0 +1,147 @@
+"""
+Requirement Traceability
+Maps requirements to test cases through explicit requirement references and
+vectorized lexical similarity, and reports coverage gaps
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Union
+import re
+import numpy as np
+import config
+from .defect_classifier import HashedNgramVectorizer
+from .llm_output import extract_test_cases
+from .requirement_diff import RequirementItem, diff_requirements, parse_requirements
+
+COVERED, WEAK, UNCOVERED = "covered", "weak", "uncovered"
+_REFERENCE = re.compile(r"\b[A-Z]{2,}-\d+\b")
+_CASE_FIELDS = ["test_name", "description", "preconditions", "steps", "expected_result"]
+
+def case_text(case: Dict[str, Any]) -> str:
+    """Text of a test case used for similarity"""
+    parts = []
+    for name in _CASE_FIELDS:
+        value = case.get(name)
+        parts.extend(value if isinstance(value, list) else [value])
+    return " ".join(str(part) for part in parts if part)
+
+def case_references(case: Dict[str, Any]) -> List[str]:
+    """Requirement ids a test case explicitly names"""
+    references = [str(ref) for ref in case.get("requirement_ids") or []]
+    references += _REFERENCE.findall(case_text(case))
+    return list(dict.fromkeys(references))
+
+@dataclass
+class CoverageMatrix:
+    """Requirement x test case scores and the resulting coverage status"""
+    requirements: List[RequirementItem]
+    case_ids: List[str]
+    scores: np.ndarray
+    status: List[str]
+    strong: float
+    weak: float
+
+    def covering_cases(self, row: int, limit: int = 5) -> List[str]:
+        """Ids of the best-matching test cases above the weak threshold"""
+        order = np.argsort(-self.scores[row])[:limit]
+        return [self.case_ids[i] for i in order if self.scores[row, i] >= self.weak]
+
+    def gaps(self, include_weak: bool = True) -> List[RequirementItem]:
+        """Requirements without (strong) coverage"""
+        wanted = {UNCOVERED, WEAK} if include_weak else {UNCOVERED}
+        return [item for item, status in zip(self.requirements, self.status) if status in wanted]
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts per status and the coverage ratio"""
+        counts = {state: self.status.count(state) for state in (COVERED, WEAK, UNCOVERED)}
+        total = len(self.requirements)
+        return {"requirements": total, "test_cases": len(self.case_ids), **counts,
+                "coverage": round(counts[COVERED] / total, 4) if total else 1.0}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable matrix (only links above the weak threshold)"""
+        return {
+            "summary": self.summary(),
+            "requirements": [
+                {**item.to_dict(), "status": status,
+                 "test_cases": {self.case_ids[i]: round(float(self.scores[row, i]), 3)
+                                for i in np.flatnonzero(self.scores[row] >= self.weak)}}
+                for row, (item, status) in enumerate(zip(self.requirements, self.status))
+            ],
+        }
+
+    def to_markdown(self) -> str:
+        """Render the matrix as a Markdown report"""
+        summary = self.summary()
+        lines = [
+            "# Requirement Coverage Matrix",
+            "",
+            f"- Requirements: {summary['requirements']} "
+            f"({summary[COVERED]} covered, {summary[WEAK]} weak, {summary[UNCOVERED]} uncovered)",
+            f"- Test cases: {summary['test_cases']}",
+            f"- Coverage: {summary['coverage']:.1%}",
+            "",
+            "| Requirement | Section | Text | Status | Test cases |",
+            "|-------------|---------|------|--------|------------|",
+        ]
+        icons = {COVERED: "✅", WEAK: "⚠️", UNCOVERED: "❌"}
+        for row, (item, status) in enumerate(zip(self.requirements, self.status)):
+            text = item.text if len(item.text) <= 80 else item.text[:77] + "..."
+            cases = ", ".join(self.covering_cases(row)) or "-"
+            lines.append(f"| {item.req_id} | {item.section} | {text} | "
+                         f"{icons[status]} {status} | {cases} |")
+        return "\n".join(lines) + "\n"
+
+class TraceabilityEngine:
+    """
+    Requirement-to-test traceability
+    An explicit requirement reference counts as full coverage; otherwise the
+    TF-IDF cosine similarity of requirement and test case text is used
+    """
+
+    def __init__(self, strong: Optional[float] = None, weak: Optional[float] = None,
+                 n_features: int = 2 ** 18):
+        """
+        Initialize the engine
+
+        Args:
+            strong: Similarity at which a requirement counts as covered
+            weak: Similarity at which a test case counts as related
+            n_features: Size of the hashed feature space
+        """
+        self.strong = config.TRACE_STRONG_THRESHOLD if strong is None else strong
+        self.weak = config.TRACE_WEAK_THRESHOLD if weak is None else weak
+        self.vectorizer = HashedNgramVectorizer(n_features)
+
+    def coverage(self, requirements: Union[str, List[RequirementItem]],
+                 test_cases: Union[str, List[Dict[str, Any]]]) -> CoverageMatrix:
+        """
+        Build the coverage matrix
+
+        Args:
+            requirements: Requirement document or parsed items (ids are assigned if missing)
+            test_cases: Generated suite text or a list of test case dictionaries
+
+        Returns:
+            Coverage matrix
+        """
+        items = parse_requirements(requirements) if isinstance(requirements, str) else requirements
+        if any(not item.req_id for item in items):
+            items = diff_requirements([], items).items
+        cases = extract_test_cases(test_cases) if isinstance(test_cases, str) else test_cases
+        case_ids = [str(case.get("test_id") or f"#{index + 1}") for index, case in enumerate(cases)]
+
+        scores = np.zeros((len(items), len(cases)), dtype=np.float32)
+        if items and cases:
+            matrix = self.vectorizer.tfidf([item.text for item in items] +
+                                           [case_text(case) for case in cases])
+            scores = (matrix[:len(items)] @ matrix[len(items):].T).toarray().astype(np.float32)
+            rows = {item.req_id: row for row, item in enumerate(items)}
+            for column, case in enumerate(cases):
+                for reference in case_references(case):
+                    if reference in rows:
+                        scores[rows[reference], column] = 1.0
+
+        best = scores.max(axis=1) if len(cases) else np.zeros(len(items))
+        status = [COVERED if value >= self.strong else WEAK if value >= self.weak else UNCOVERED
+                  for value in best]
+        return CoverageMatrix(items, case_ids, scores, status, self.strong, self.weak)
@@ -4,9 +4,19 @@
 """
 import streamlit as st
 import json
-import time
+import uuid
+from datetime import datetime
+from langchain_core.messages import AIMessage, HumanMessage
+import config
+from cache import cached, get_cache
+from chat_store import MessageStore
+from llm import get_scheduler, route_stats, routing_signature
+from llm.endpoints import get_endpoint_pool
+from llm.transport import coalescing_rate
+from jobs import JobManager, QUEUED, RUNNING, DONE, FAILED, CANCELLED
 from test_engineer_agent import TestEngineerAgent
-from tools import FunctionalTestGenerator, DefectAnalyzer, APITestGenerator
+from tools.artifact_store import get_artifact_store
+from tools.document_ingest import ingest
 
 # 页面配置
 st.set_page_config(
@@ -51,17 +61,162 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# 初始化会话状态
-if 'agent' not in st.session_state:
-    try:
-        st.session_state.agent = TestEngineerAgent()
-        st.session_state.agent_ready = True
-    except Exception as e:
-        st.session_state.agent_ready = False
-        st.session_state.error_message = str(e)
+# 进程级共享组件：智能体核心（模型客户端、工具、执行器）每个进程只构建一次，
+# 所有会话共用；会话状态只保存对话内容
+@st.cache_resource(show_spinner=False)
+def get_agent():
+    """进程内共享、不含会话状态的智能体核心"""
+    return TestEngineerAgent()
+
+def get_tool(name):
+    """共享智能体持有的工具实例"""
+    return next(tool for tool in get_agent().tools if tool.name == name)
+
+# 工具结果按输入参数缓存在共享缓存中（同一主机的各进程或多台主机共用），
+# 重跑、重复点击以及其他工作进程上的相同请求不会再次调用LLM；缓存键包含模型路由配置，
+# 切换模型后不会返回旧模型的结果
+result_cache = cached("web_result", ttl=config.WEB_RESULT_CACHE_TTL, variant=routing_signature)
+
+@result_cache
+def cached_functional_tests(requirements, test_format, coverage_level, priority_focus):
+    """功能测试用例生成（按参数缓存）"""
+    return get_tool("functional_test_generator")._run(
+        requirements=requirements, test_format=test_format,
+        coverage_level=coverage_level, priority_focus=priority_focus)
+
+@result_cache
+def cached_functional_chunks(chunks, test_format, coverage_level, priority_focus):
+    """分段文档的功能测试用例生成（按参数缓存）"""
+    return get_tool("functional_test_generator").generate_from_chunks(
+        list(chunks), test_format=test_format,
+        coverage_level=coverage_level, priority_focus=priority_focus)
+
+@result_cache
+def cached_defect_analysis(defect_data, analysis_type, context):
+    """缺陷分析（按参数缓存）"""
+    return get_tool("defect_analyzer")._run(
+        defect_data=defect_data, analysis_type=analysis_type, context=context)
+
+@result_cache
+def cached_api_tests(api_specification, test_framework, coverage_type, output_format):
+    """API测试生成（按参数缓存）"""
+    return get_tool("api_test_generator")._run(
+        api_specification=api_specification, test_framework=test_framework,
+        coverage_type=coverage_type, output_format=output_format)
+
+@result_cache
+def cached_agent_answer(prompt):
+    """不依赖对话上下文的智能体请求（按参数缓存；失败时抛出异常，错误信息不会进入缓存）"""
+    return get_agent().answer(prompt, chat_history=[])
+
+try:
+    get_agent()
+    agent_error = None
+except Exception as e:
+    agent_error = str(e)
+
+# 生成任务在进程级后台执行器中运行，页面不被阻塞；任务归属于会话，
+# 重跑和切换模式后结果仍在任务面板中
+@st.cache_resource(show_spinner=False)
+def get_job_manager():
+    """进程内共享的后台任务执行器"""
+    return JobManager()
+
+# 对话正文按内容哈希在进程内只存一份（较大时压缩），并写入共享缓存；会话状态
+# 只保存正文的键；长时间空闲的会话释放其对话
+@st.cache_resource(show_spinner=False)
+def get_message_store():
+    """进程内共享的对话正文存储"""
+    return MessageStore(cache=get_cache())
+
+CHAT_JOB = "智能对话"
+STATUS_LABELS = {QUEUED: "⏳ 排队中", RUNNING: "🔄 运行中", DONE: "✅ 完成",
+                 FAILED: "❌ 失败", CANCELLED: "🚫 已取消"}
 
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+message_store = get_message_store()
+message_store.evict_idle()
+# 对话历史每轮保存（提问键, 回答键, 回答字数）；本进程缺少的正文从共享缓存取回，
+# 只有正文已从各处清除时才清空对话历史
+if st.session_state.chat_history and not message_store.restore(
+        st.session_state.session_id,
+        [key for user_key, ai_key, _ in st.session_state.chat_history for key in (user_key, ai_key)]):
+    st.session_state.chat_history = []
+    st.info("ℹ️ 会话空闲时间过长，对话历史已被清理")
+message_store.touch(st.session_state.session_id)
+
+def job_title(text, limit=40):
+    """任务面板中显示的输入摘要"""
+    line = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    return line if len(line) <= limit else line[:limit - 1] + "…"
+
+def submit_job(kind, title, fn, options=None, **kwargs):
+    """提交后台生成任务"""
+    get_job_manager().submit(st.session_state.session_id, kind, title, fn,
+                             options=options, **kwargs)
+    st.success("✅ 已提交后台任务，可在下方任务面板查看进度，期间可继续提交其他任务或切换模式")
+
+def collect_chat_answers():
+    """把已完成的对话任务按提交顺序移入对话历史"""
+    manager = get_job_manager()
+    for job in reversed(manager.jobs(st.session_state.session_id)):
+        if job.kind == CHAT_JOB and job.status == DONE:
+            st.session_state.chat_history.append((
+                message_store.put(st.session_state.session_id, job.options["prompt"]),
+                message_store.put(st.session_state.session_id, job.result),
+                len(job.result)
+            ))
+            manager.dismiss(job.job_id)
+
+def show_job(job):
+    """显示单个任务的状态、流式输出或结果"""
+    with st.expander(f"{STATUS_LABELS[job.status]} · {job.kind} · {job.title}", expanded=True):
+        if not job.finished:
+            st.caption(f"已运行 {job.elapsed:.0f} 秒" if job.status == RUNNING else "等待空闲执行槽...")
+            partial = job.partial
+            if partial:
+                st.code(partial[-4000:], language=None)
+            if job.status == QUEUED and st.button("取消", key=f"cancel_{job.job_id}"):
+                get_job_manager().cancel(job.job_id)
+                st.rerun()
+            return
+        if job.status == DONE:
+            st.caption(f"耗时 {job.elapsed:.1f} 秒")
+            language = job.options.get("language")
+            if language:
+                st.code(job.result, language=language)
+            else:
+                st.markdown(job.result)
+            extension = job.options.get("extension", "md")
+            st.download_button(
+                label="📥 下载结果",
+                data=job.result,
+                file_name=f"{job.options.get('file_prefix', 'result')}_{int(job.finished_at)}.{extension}",
+                mime="text/markdown" if extension == "md" else "text/plain",
+                key=f"download_{job.job_id}"
+            )
+        elif job.status == FAILED:
+            st.error(f"{job.kind}出错: {job.error}")
+        if st.button("移除", key=f"dismiss_{job.job_id}"):
+            get_job_manager().dismiss(job.job_id)
+            st.rerun()
+
+def job_panel(was_active):
+    """任务面板；有任务运行时定时刷新，全部结束后整页重跑以停止刷新"""
+    jobs = get_job_manager().jobs(st.session_state.session_id)
+    if was_active and not any(not job.finished for job in jobs):
+        st.rerun()
+    if jobs:
+        st.markdown("---")
+        st.subheader("📋 后台任务")
+        for job in jobs:
+            show_job(job)
+
+collect_chat_answers()
 
 # 主标题
 st.markdown('<h1 class="main-header">🧪 测试工程师智能助手</h1>', unsafe_allow_html=True)
@@ -72,18 +227,39 @@ with st.sidebar:
     
     mode = st.selectbox(
         "选择工作模式",
-        ["智能对话模式", "功能测试生成", "缺陷分析", "API测试生成", "测试策略规划"]
+        ["智能对话模式", "功能测试生成", "缺陷分析", "API测试生成", "测试策略规划", "产物库检索"]
     )
     
     st.markdown("---")
     
     # 系统状态
-    if st.session_state.agent_ready:
+    if agent_error is None:
         st.success("✅ 系统已就绪")
     else:
         st.error("❌ 系统初始化失败")
-        if 'error_message' in st.session_state:
-            st.error(f"错误信息: {st.session_state.error_message}")
+        st.error(f"错误信息: {agent_error}")
+    
+    # LLM调用的调度与合并情况（进程级）
+    with st.expander("📈 LLM调用统计"):
+        scheduler_stats = get_scheduler().stats()
+        st.caption(f"进行中：交互 {scheduler_stats['running']['interactive']} / "
+                   f"批量 {scheduler_stats['running']['batch']}（上限 {scheduler_stats['concurrency']}）")
+        st.caption(f"排队中：交互 {scheduler_stats['waiting']['interactive']} / "
+                   f"批量 {scheduler_stats['waiting']['batch']}")
+        rate = coalescing_rate()
+        st.caption(f"相同请求合并率：{rate:.1%}" if rate is not None else "相同请求合并率：-")
+        states = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}
+        for entry in get_endpoint_pool().stats():
+            st.caption(f"{states[entry['state']]} {entry['endpoint']}：进行中 {entry['outstanding']}，"
+                       f"请求 {entry['requests']}，失败 {entry['failures']}")
+        cache_stats = get_cache().stats()
+        hit_rate = f"{cache_stats['hit_rate']:.1%}" if cache_stats["hit_rate"] is not None else "-"
+        st.caption(f"🗄️ 共享缓存（{cache_stats['backend']}）：命中率 {hit_rate}，"
+                   f"命中 {cache_stats['hits']}，未命中 {cache_stats['misses']}，错误 {cache_stats['errors']}")
+        for entry in route_stats():
+            latency = f"{entry['p50_seconds']:.1f}s" if entry["p50_seconds"] is not None else "-"
+            quality = f"{entry['quality']:.0%}" if entry["quality"] is not None else "-"
+            st.caption(f"🧭 {entry['route']}：调用 {entry['calls']:.0f}，P50 {latency}，质量 {quality}")
     
     st.markdown("---")
     
@@ -99,28 +275,69 @@ with st.sidebar:
         **API测试生成**: 生成API测试代码
         
         **测试策略规划**: 制定全面的测试策略
+        
+        **产物库检索**: 搜索历史生成的测试用例和测试代码
         """)
     
+    # 本会话的对话内存占用
+    usage = message_store.session_usage(st.session_state.session_id)
+    st.caption(f"💾 本会话对话：{usage['messages']} 条消息，{usage['bytes'] / 1024:.1f} KB"
+               f"（实际存储 {usage['stored_bytes'] / 1024:.1f} KB）")
+    
     # 清除历史按钮
     if st.button("🗑️ 清除对话历史"):
+        message_store.release(st.session_state.session_id)
         st.session_state.chat_history = []
         st.rerun()
 
 # 主内容区域
-if not st.session_state.agent_ready:
+if agent_error is not None:
     st.error("系统初始化失败，请检查配置后重新启动应用。")
     st.stop()
 
+DOCUMENT_TYPES = ["md", "markdown", "txt", "docx", "pdf", "html", "htm", "json", "yaml", "yml"]
+
+def upload_document(label, key):
+    """上传需求/规范文档，解析为章节树并可选择章节；返回 (文档, 选中的章节标题)"""
+    uploaded = st.file_uploader(label, type=DOCUMENT_TYPES, key=key)
+    if uploaded is None:
+        return None, None
+    try:
+        document = ingest(uploaded, name=uploaded.name)
+    except Exception as e:
+        st.error(f"文档解析失败: {str(e)}")
+        return None, None
+    titles = [child.title for child in document.root.children]
+    sections = st.multiselect("只使用以下章节（留空为全部）", titles, key=f"{key}_sections")
+    chunks = document.chunks(titles=sections or None)
+    st.caption(f"📄 {document.source}（{document.format}），共 {len(chunks)} 段")
+    with st.expander("文档大纲"):
+        st.text(document.outline())
+    return document, sections or None
+
 # 根据选择的模式显示不同界面
 if mode == "智能对话模式":
     st.header("💬 智能对话模式")
     st.markdown("与AI助手自由对话，系统会自动选择合适的工具来处理您的请求。")
     
-    # 显示对话历史
-    for i, (user_msg, ai_msg) in enumerate(st.session_state.chat_history):
+    # 分页显示对话历史，只渲染当前页；过长的回答默认折叠为摘要
+    turns = st.session_state.chat_history
+    page_size = config.WEB_CHAT_PAGE_SIZE
+    pages = max(1, -(-len(turns) // page_size))
+    page = pages
+    if pages > 1:
+        page = st.number_input(f"对话页（共 {pages} 页，{len(turns)} 轮对话）",
+                               min_value=1, max_value=pages, value=pages)
+    for i in range((page - 1) * page_size, min(page * page_size, len(turns))):
+        user_key, ai_key, length = turns[i]
         with st.container():
-            st.markdown(f"**👤 用户**: {user_msg}")
-            st.markdown(f"**🤖 AI助手**: {ai_msg}")
+            st.markdown(f"**👤 用户**: {message_store.get(user_key)}")
+            if length > config.WEB_CHAT_COLLAPSE_CHARS and not st.toggle(
+                    f"展开完整回答（{length} 字）", key=f"expand_{i}_{ai_key}"):
+                st.markdown(f"**🤖 AI助手**: "
+                            f"{message_store.preview(ai_key, config.WEB_CHAT_COLLAPSE_CHARS)}")
+            else:
+                st.markdown(f"**🤖 AI助手**: {message_store.get(ai_key)}")
             st.markdown("---")
     
     # 用户输入
@@ -134,13 +351,13 @@ if mode == "智能对话模式":
     with col1:
         if st.button("🚀 发送", type="primary"):
             if user_input.strip():
-                with st.spinner("AI正在思考中..."):
-                    try:
-                        response = st.session_state.agent.process_request(user_input)
-                        st.session_state.chat_history.append((user_input, response))
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"处理请求时出错: {str(e)}")
+                history = []
+                for user_key, ai_key, _ in st.session_state.chat_history:
+                    history += [HumanMessage(content=message_store.get(user_key)),
+                                AIMessage(content=message_store.get(ai_key))]
+                submit_job(CHAT_JOB, job_title(user_input), get_agent().process_request,
+                           options={"prompt": user_input, "file_prefix": "answer"},
+                           user_input=user_input, chat_history=history)
 
 elif mode == "功能测试生成":
     st.header("🧪 功能测试用例生成")
@@ -161,6 +378,8 @@ elif mode == "功能测试生成":
 - 用户可以通过邮箱重置密码
 - 提供"记住我"功能"""
         )
+        document, sections = upload_document("或上传需求文档（Markdown/DOCX/PDF/HTML）",
+                                             "functional_document")
     
     with col2:
         test_format = st.selectbox(
@@ -181,33 +400,55 @@ elif mode == "功能测试生成":
             ["high", "medium", "low", "all"],
             help="选择重点关注的优先级"
         )
+        
+        incremental = st.checkbox(
+            "增量生成",
+            help="只为新增或修改的需求生成用例，未变化需求的用例保持原有编号"
+        )
+        fill_gaps = st.checkbox(
+            "仅补齐覆盖缺口",
+            help="计算需求覆盖矩阵，只为未覆盖或弱覆盖的需求生成用例"
+        )
+        suite_id = st.text_input("用例集名称", value="default",
+                                 disabled=not (incremental or fill_gaps))
+    
+    existing_tests = ""
+    if fill_gaps:
+        existing_tests = st.text_area(
+            "已有测试用例（JSON，留空则使用已保存的用例集）",
+            height=150
+        )
     
     if st.button("🎯 生成测试用例", type="primary"):
-        if requirements.strip():
-            with st.spinner("正在生成测试用例..."):
-                try:
-                    generator = FunctionalTestGenerator()
-                    result = generator._run(
-                        requirements=requirements,
-                        test_format=test_format,
-                        coverage_level=coverage_level,
-                        priority_focus=priority_focus
-                    )
-                    
-                    st.success("✅ 测试用例生成完成！")
-                    st.markdown("### 生成的测试用例")
-                    st.markdown(result)
-                    
-                    # 提供下载功能
-                    st.download_button(
-                        label="📥 下载测试用例",
-                        data=result,
-                        file_name=f"test_cases_{int(time.time())}.md",
-                        mime="text/markdown"
-                    )
-                    
-                except Exception as e:
-                    st.error(f"生成测试用例时出错: {str(e)}")
+        if requirements.strip() or document is not None:
+            title = document.source if document is not None else job_title(requirements)
+            options = {"file_prefix": "test_cases"}
+            if incremental or fill_gaps:
+                # 依赖已保存的用例集状态，不缓存
+                submit_job(
+                    "功能测试生成", title, get_tool("functional_test_generator")._run, options,
+                    requirements=document.to_markdown(sections) if document is not None
+                    else requirements,
+                    test_format=test_format,
+                    coverage_level=coverage_level,
+                    priority_focus=priority_focus,
+                    incremental=incremental,
+                    suite_id=suite_id,
+                    fill_gaps=fill_gaps,
+                    existing_tests=existing_tests
+                )
+            elif document is not None:
+                submit_job(
+                    "功能测试生成", title, cached_functional_chunks, options,
+                    chunks=tuple(document.chunks(titles=sections)), test_format=test_format,
+                    coverage_level=coverage_level, priority_focus=priority_focus
+                )
+            else:
+                submit_job(
+                    "功能测试生成", title, cached_functional_tests, options,
+                    requirements=requirements, test_format=test_format,
+                    coverage_level=coverage_level, priority_focus=priority_focus
+                )
         else:
             st.warning("请输入功能需求描述")
 
@@ -248,29 +489,9 @@ elif mode == "缺陷分析":
     
     if st.button("🔍 开始分析", type="primary"):
         if defect_data.strip():
-            with st.spinner("正在分析缺陷..."):
-                try:
-                    analyzer = DefectAnalyzer()
-                    result = analyzer._run(
-                        defect_data=defect_data,
-                        analysis_type=analysis_type,
-                        context=context
-                    )
-                    
-                    st.success("✅ 缺陷分析完成！")
-                    st.markdown("### 分析结果")
-                    st.markdown(result)
-                    
-                    # 提供下载功能
-                    st.download_button(
-                        label="📥 下载分析报告",
-                        data=result,
-                        file_name=f"defect_analysis_{int(time.time())}.md",
-                        mime="text/markdown"
-                    )
-                    
-                except Exception as e:
-                    st.error(f"分析缺陷时出错: {str(e)}")
+            submit_job("缺陷分析", job_title(defect_data), cached_defect_analysis,
+                       {"file_prefix": "defect_analysis"},
+                       defect_data=defect_data, analysis_type=analysis_type, context=context)
         else:
             st.warning("请输入缺陷信息")
 
@@ -293,6 +514,13 @@ DELETE /api/users/{id} (删除用户)
 认证：需要Bearer token
 用户字段：id, email, name, role, created_at"""
         )
+        api_document, api_sections = upload_document("或上传API文档（OpenAPI/Markdown/DOCX/PDF/HTML）",
+                                                     "api_document")
+        if api_document is not None:
+            if api_document.spec is not None and not api_sections:
+                api_specification = json.dumps(api_document.spec, ensure_ascii=False)
+            else:
+                api_specification = api_document.to_markdown(api_sections)
     
     with col2:
         test_framework = st.selectbox(
@@ -316,35 +544,15 @@ DELETE /api/users/{id} (删除用户)
     
     if st.button("⚡ 生成API测试", type="primary"):
         if api_specification.strip():
-            with st.spinner("正在生成API测试..."):
-                try:
-                    generator = APITestGenerator()
-                    result = generator._run(
-                        api_specification=api_specification,
-                        test_framework=test_framework,
-                        coverage_type=coverage_type,
-                        output_format=output_format
-                    )
-                    
-                    st.success("✅ API测试生成完成！")
-                    st.markdown("### 生成的API测试")
-                    
-                    if output_format == "python":
-                        st.code(result, language="python")
-                    else:
-                        st.markdown(result)
-                    
-                    # 提供下载功能
-                    file_extension = "py" if output_format == "python" else "md"
-                    st.download_button(
-                        label="📥 下载测试代码",
-                        data=result,
-                        file_name=f"api_tests_{int(time.time())}.{file_extension}",
-                        mime="text/plain"
-                    )
-                    
-                except Exception as e:
-                    st.error(f"生成API测试时出错: {str(e)}")
+            options = {"file_prefix": "api_tests"}
+            if output_format == "python":
+                options.update(language="python", extension="py")
+            submit_job("API测试生成",
+                       api_document.source if api_document is not None
+                       else job_title(api_specification),
+                       cached_api_tests, options,
+                       api_specification=api_specification, test_framework=test_framework,
+                       coverage_type=coverage_type, output_format=output_format)
         else:
             st.warning("请输入API规范描述")
 
@@ -393,9 +601,7 @@ elif mode == "测试策略规划":
     
     if st.button("📊 生成测试策略", type="primary"):
         if project_requirements.strip():
-            with st.spinner("正在制定测试策略..."):
-                try:
-                    strategy_prompt = f"""
+            strategy_prompt = f"""
                     为以下项目制定全面的测试策略：
                     
                     项目需求：{project_requirements}
@@ -414,26 +620,52 @@ elif mode == "测试策略规划":
                     {"10. 安全测试策略" if include_security else ""}
                     {"11. 自动化测试建议" if include_automation else ""}
                     """
-                    
-                    result = st.session_state.agent.process_request(strategy_prompt)
-                    
-                    st.success("✅ 测试策略生成完成！")
-                    st.markdown("### 测试策略")
-                    st.markdown(result)
-                    
-                    # 提供下载功能
-                    st.download_button(
-                        label="📥 下载测试策略",
-                        data=result,
-                        file_name=f"test_strategy_{int(time.time())}.md",
-                        mime="text/markdown"
-                    )
-                    
-                except Exception as e:
-                    st.error(f"生成测试策略时出错: {str(e)}")
+            submit_job("测试策略规划", job_title(project_requirements), cached_agent_answer,
+                       {"file_prefix": "test_strategy"}, prompt=strategy_prompt)
         else:
             st.warning("请输入项目需求")
 
+elif mode == "产物库检索":
+    st.header("🗄️ 产物库检索")
+    st.markdown("所有生成结果都会自动保存，可按需求、测试名称和测试步骤进行全文检索。")
+    
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        query = st.text_input("搜索关键词", placeholder="例如：login password lockout")
+    
+    with col2:
+        tool_filter = st.selectbox(
+            "来源",
+            ["全部", "functional_test_generator", "api_test_generator", "agent"]
+        )
+    
+    store = get_artifact_store()
+    hits = store.search(query, tool=None if tool_filter == "全部" else tool_filter, limit=30)
+    st.caption(f"共 {store.count()} 条产物，匹配 {len(hits)} 条")
+    
+    for hit in hits:
+        created = datetime.fromtimestamp(hit.created_at).strftime("%Y-%m-%d %H:%M")
+        with st.expander(f"#{hit.artifact_id} · {hit.tool} · {hit.output_format or '-'} · "
+                         f"{hit.coverage or '-'} · {created}"):
+            st.markdown(hit.snippet)
+            artifact = store.get(hit.artifact_id)
+            st.markdown("**输入**")
+            st.text(artifact.input_text[:2000])
+            st.markdown("**生成结果**")
+            st.markdown(artifact.content)
+            st.download_button(
+                label="📥 下载",
+                data=artifact.content,
+                file_name=f"artifact_{artifact.artifact_id}.md",
+                mime="text/markdown",
+                key=f"download_artifact_{artifact.artifact_id}"
+            )
+
+# 任务面板：所有模式共用，显示本会话的后台任务
+active = any(not job.finished for job in get_job_manager().jobs(st.session_state.session_id))
+st.fragment(run_every=config.WEB_JOB_POLL_SECONDS if active else None)(job_panel)(active)
+
 # 页脚
 st.markdown("---")
 st.markdown(